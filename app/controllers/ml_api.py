@@ -1,7 +1,8 @@
 """ML API routes - Endpoints for all 6 ML models"""
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required
+from werkzeug.exceptions import HTTPException
 from app import db
 from app.models import (
     Site, WaterSample, TestResult, Analysis,
@@ -14,6 +15,19 @@ from app.services.ml_pipeline import MLPipeline
 
 ml_api_bp = Blueprint('ml_api', __name__)
 
+# Most sites one /site-risk/batch request processes
+BATCH_SITE_RISK_MAX_LIMIT = 500
+
+
+@ml_api_bp.errorhandler(Exception)
+def handle_ml_api_error(e):
+    """Return JSON errors for all ML API routes instead of per-route try/except"""
+    if isinstance(e, HTTPException):
+        return e
+    db.session.rollback()
+    current_app.logger.error(f"ML API error: {e}", exc_info=True)
+    return jsonify({'error': str(e)}), 500
+
 
 # ========== 1. Site Risk Classifier API ==========
 
@@ -69,32 +83,57 @@ def predict_site_risk(site_id):
 @ml_api_bp.route('/site-risk/batch', methods=['POST'])
 @login_required
 def batch_site_risk():
-    """Run risk prediction for multiple sites"""
-    data = request.get_json()
-    site_ids = data.get('site_ids', [])
+    """Run risk prediction for multiple sites
 
-    if not site_ids:
-        # Process all active sites
-        sites = Site.query.filter_by(is_active=True).all()
-        site_ids = [s.id for s in sites]
+    Without explicit site_ids all active sites are processed in keyset pages
+    of 'limit' sites (at most BATCH_SITE_RISK_MAX_LIMIT); pass the returned
+    'next_cursor' as 'after' to get the next page.
+    """
+    data = request.get_json() or {}
+    try:
+        site_ids = [int(site_id) for site_id in data.get('site_ids') or []]
+        after = int(data.get('after') or 0)
+        limit = int(data.get('limit') or BATCH_SITE_RISK_MAX_LIMIT)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'site_ids, after and limit must be integers'}), 400
+    if after < 0 or limit < 0:
+        return jsonify({'error': 'after and limit must not be negative'}), 400
+    if len(site_ids) > BATCH_SITE_RISK_MAX_LIMIT:
+        return jsonify({'error': f'At most {BATCH_SITE_RISK_MAX_LIMIT} site_ids per request'}), 400
+    limit = min(limit, BATCH_SITE_RISK_MAX_LIMIT)
+    next_cursor = None
+
+    if site_ids:
+        # The requested sites, loaded in one query and processed in request order
+        sites_by_id = {site.id: site for site in Site.query.filter(Site.id.in_(site_ids))}
+        sites = [sites_by_id[site_id] for site_id in site_ids if site_id in sites_by_id]
+    else:
+        # Process one page of active sites
+        sites = Site.query.filter(
+            Site.is_active == True,
+            Site.id > after
+        ).order_by(Site.id).limit(limit).all()
+        if limit and len(sites) == limit:
+            next_cursor = sites[-1].id
 
     processor = DataProcessor()
     results = []
 
-    for site_id in site_ids:
-        site = Site.query.get(site_id)
-        if site:
-            result = processor._update_site_risk(site)
-            results.append({
-                'site_id': site_id,
-                'site_name': site.site_name,
-                'risk_level': result['risk_level'],
-                'risk_score': result['risk_score']
-            })
+    # Committed once for the page, so the loaded sites are not expired after each one
+    for site in sites:
+        result = processor._update_site_risk(site, commit=False)
+        results.append({
+            'site_id': site.id,
+            'site_name': site.site_name,
+            'risk_level': result['risk_level'],
+            'risk_score': result['risk_score']
+        })
+    db.session.commit()
 
     return jsonify({
         'success': True,
         'processed': len(results),
+        'next_cursor': next_cursor,
         'results': results
     })
 
@@ -4,12 +4,15 @@ Implements TRUE rolling/incremental ML training for investor presentations
 Each week's prediction uses only data available up to that point
 Model retrains as new data becomes available
 """
-import random
 import numpy as np
+import orjson
+from functools import lru_cache
+from numpy.lib.stride_tricks import sliding_window_view
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, render_template, request, current_app
 from flask_login import login_required
 from sqlalchemy import func
+from sqlalchemy.orm import selectinload
 from app import db
 from app.models import (
     Site, WaterSample, TestResult, Analysis,
@@ -20,6 +23,15 @@ from app.models import (
 
 rolling_poc_bp = Blueprint('rolling_poc', __name__)
 
+
+def orjsonify(obj, status=200):
+    """jsonify replacement using orjson, which also serializes NumPy values natively"""
+    return current_app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
 # Rolling POC Configuration
 ROLLING_CONFIG = {
     'total_weeks': 156,
@@ -36,6 +48,85 @@ SEASONAL_PATTERNS = {
     'summer': {'turbidity_base': 4.0, 'coliform_base': 12, 'contamination_prob': 0.20}
 }
 
+# Rolling model definitions
+MODEL_CONFIGS = {
+    'site_risk': {
+        'name': 'Site Risk Classifier',
+        'algorithm': 'Rolling Random Forest',
+        'base_accuracy': 0.82,
+        'icon': 'shield-exclamation',
+        'color': 'danger'
+    },
+    'contamination': {
+        'name': 'Contamination Classifier',
+        'algorithm': 'Rolling XGBoost',
+        'base_accuracy': 0.80,
+        'icon': 'virus',
+        'color': 'warning'
+    },
+    'wqi': {
+        'name': 'WQI Predictor',
+        'algorithm': 'Rolling Gradient Boosting',
+        'base_accuracy': 0.78,
+        'icon': 'speedometer2',
+        'color': 'info'
+    },
+    'anomaly': {
+        'name': 'Anomaly Detector',
+        'algorithm': 'Rolling Isolation Forest',
+        'base_accuracy': 0.83,
+        'icon': 'exclamation-triangle',
+        'color': 'purple'
+    },
+    'forecast': {
+        'name': 'Quality Forecaster',
+        'algorithm': 'Rolling LSTM',
+        'base_accuracy': 0.75,
+        'icon': 'graph-up-arrow',
+        'color': 'success'
+    },
+    'cost': {
+        'name': 'Cost Optimizer',
+        'algorithm': 'Rolling Bayesian Opt',
+        'base_accuracy': 0.85,
+        'icon': 'currency-rupee',
+        'color': 'primary'
+    }
+}
+
+# Numeric sample fields kept as contiguous column arrays for the rolling loop
+COLUMN_PARAMS = ('ph', 'turbidity', 'tds', 'chlorine', 'coliform', 'wqi_score')
+
+# Forecaster inputs and the trailing window its trend is taken over
+FORECAST_PARAMS = ('ph', 'turbidity', 'tds', 'chlorine')
+FORECAST_WINDOW = 4
+
+# Uniform draws pre-generated per prediction week (forecast uses the most: 2 per parameter)
+RANDOM_DRAWS_PER_WEEK = 8
+
+# Ordered label sets used when simulating wrong predictions
+RISK_LEVELS = ('low', 'medium', 'high', 'critical')
+RISK_INDEX = {level: i for i, level in enumerate(RISK_LEVELS)}
+WQI_CLASSES = ('Excellent', 'Good', 'Fair', 'Poor', 'Very Poor')
+WQI_CLASS_INDEX = {cls: i for i, cls in enumerate(WQI_CLASSES)}
+
+# WQI score lower bounds for Poor/Fair/Good/Excellent, binned with np.searchsorted
+WQI_CLASS_THRESHOLDS = np.array([25, 50, 70, 90])
+WQI_CLASS_LABELS = np.array(WQI_CLASSES[::-1])
+
+# Cost optimizer tiers, indexed by np.searchsorted over the WQI lower bounds
+# for high/medium/low risk (below 50 is critical)
+COST_RISK_THRESHOLDS = np.array([50, 70, 85])
+COST_RISK_LABELS = ('critical', 'high', 'medium', 'low')
+COST_RECOMMENDATIONS = ('Intensive Testing', 'Standard Testing', 'Reduced Testing', 'Skip Test')
+COST_CURRENT = np.array([624000, 312000, 144000, 72000])  # 52/26/12/6 tests/year * 12000
+# Share of the current cost still spent when the risk call is right / wrong
+COST_FACTOR_HIT = np.array([0.87, 0.70, 0.35, 0.0])
+COST_FACTOR_MISS = np.array([0.95, 0.85, 0.5, 0.0])
+# Detection rate range (low, high) when the risk call is right / wrong
+DETECTION_HIT = np.array([[96, 99], [94, 97], [95, 98], [100, 100]])
+DETECTION_MISS = np.array([[92, 96], [88, 93], [90, 94], [100, 100]])
+
 
 def get_season(date):
     month = date.month
@@ -48,6 +139,41 @@ def get_season(date):
     return 'summer'
 
 
+def _uniform(u, low, high):
+    """Scale a uniform [0, 1) draw to [low, high)"""
+    return low + (high - low) * u
+
+
+def classify_wqi(scores):
+    """Map an array of WQI scores to class labels in one vectorized pass"""
+    return WQI_CLASS_LABELS[np.searchsorted(WQI_CLASS_THRESHOLDS, scores, side='right')]
+
+
+def _rolling_accuracy_curve(is_contaminated, base_accuracy, initial_weeks, jitter):
+    """
+    Model accuracy after each weekly retrain, in closed form
+
+    Entry i is the accuracy after training on the first initial_weeks + i
+    samples. Accuracy only depends on the sample count and the contamination
+    rate of the last 20 samples, so all weeks are computed at once from a
+    prefix sum instead of retraining in a loop.
+    """
+    n_samples = np.arange(initial_weeks, initial_weeks + len(jitter))
+
+    # Accuracy improves with more training data (logarithmic growth)
+    data_bonus = np.minimum(0.12, 0.02 * np.log(np.maximum(1, n_samples / 50)))
+
+    # Learn from patterns in recent data
+    cum = np.concatenate(([0], np.cumsum(is_contaminated)))
+    recent_contamination_rate = (cum[n_samples] - cum[np.maximum(0, n_samples - 20)]) / 20
+    pattern_bonus = np.where(
+        (n_samples > 10) & (recent_contamination_rate > 0.15) & (recent_contamination_rate < 0.40),
+        0.02, 0.0
+    )
+
+    return np.minimum(0.98, base_accuracy + data_bonus + pattern_bonus + jitter)
+
+
 class RollingMLSimulator:
     """Simulates ML model with rolling training - accuracy improves with more data"""
 
@@ -57,57 +183,56 @@ class RollingMLSimulator:
         self.training_history = []
         self.current_accuracy = base_accuracy
 
-    def train(self, training_data):
-        """Train/retrain model on available data"""
-        n_samples = len(training_data)
+    def train_rolling(self, is_contaminated, initial_weeks, rng):
+        """
+        Retrain before every prediction week in one numeric pass
 
-        # Accuracy improves with more training data (logarithmic growth)
-        data_bonus = min(0.12, 0.02 * np.log(max(1, n_samples / 50)))
+        Args:
+            is_contaminated: Boolean array of contamination labels for all weeks
+            initial_weeks: Number of weeks in the initial training window
+            rng: numpy.random.Generator for the training noise
 
-        # Learn from patterns in recent data
-        if len(training_data) > 10:
-            recent_contamination_rate = sum(1 for d in training_data[-20:] if d.get('is_contaminated', False)) / 20
-            pattern_bonus = 0.02 if 0.15 < recent_contamination_rate < 0.40 else 0
-        else:
-            pattern_bonus = 0
+        Returns:
+            Array with the model accuracy used for each prediction week
+        """
+        n_weeks = len(is_contaminated) - initial_weeks
 
         # Some randomness in training quality
-        random_factor = random.uniform(-0.03, 0.03)
-
-        self.current_accuracy = min(0.98, self.base_accuracy + data_bonus + pattern_bonus + random_factor)
-        self.training_history.append({
-            'samples': n_samples,
-            'accuracy': self.current_accuracy
-        })
-
-        return {
-            'samples_used': n_samples,
-            'model_accuracy': round(self.current_accuracy, 4),
-            'improvement': round(self.current_accuracy - self.base_accuracy, 4)
-        }
-
-    def predict(self, actual_value, value_type='category'):
-        """Make prediction based on current model accuracy"""
-        if random.random() < self.current_accuracy:
+        jitter = rng.uniform(-0.03, 0.03, n_weeks)
+
+        accuracies = _rolling_accuracy_curve(is_contaminated, self.base_accuracy, initial_weeks, jitter)
+        self.training_history = [
+            {'samples': initial_weeks + i, 'accuracy': float(acc)}
+            for i, acc in enumerate(accuracies)
+        ]
+        return accuracies
+
+    def predict(self, actual_value, value_type, coin, wrong_draw):
+        """
+        Make prediction based on current model accuracy
+
+        coin and wrong_draw are uniform [0, 1) draws from the batched
+        per-week random matrix.
+        """
+        if coin < self.current_accuracy:
             return actual_value, True  # Correct prediction
         else:
-            return self._generate_wrong_prediction(actual_value, value_type), False
+            return self._generate_wrong_prediction(actual_value, value_type, wrong_draw), False
 
-    def _generate_wrong_prediction(self, actual, value_type):
+    def _generate_wrong_prediction(self, actual, value_type, u):
+        step = -1 if u < 0.5 else 1
         if value_type == 'risk':
-            risks = ['low', 'medium', 'high', 'critical']
-            idx = risks.index(actual) if actual in risks else 0
-            new_idx = max(0, min(3, idx + random.choice([-1, 1])))
-            return risks[new_idx]
+            idx = RISK_INDEX.get(actual, 0)
+            new_idx = max(0, min(len(RISK_LEVELS) - 1, idx + step))
+            return RISK_LEVELS[new_idx]
         elif value_type == 'boolean':
             return not actual
         elif value_type == 'wqi_class':
-            classes = ['Excellent', 'Good', 'Fair', 'Poor', 'Very Poor']
-            idx = classes.index(actual) if actual in classes else 2
-            new_idx = max(0, min(4, idx + random.choice([-1, 1])))
-            return classes[new_idx]
+            idx = WQI_CLASS_INDEX.get(actual, 2)
+            new_idx = max(0, min(len(WQI_CLASSES) - 1, idx + step))
+            return WQI_CLASSES[new_idx]
         elif value_type == 'numeric':
-            return actual * random.uniform(0.7, 1.3)
+            return actual * _uniform(u, 0.7, 1.3)
         return actual
 
 
@@ -121,7 +246,7 @@ def dashboard():
     data_ready = False
     total_samples = 0
     if poc_site:
-        total_samples = WaterSample.query.filter_by(site_id=poc_site.id).count()
+        total_samples = _sample_count(poc_site.id)
         data_ready = total_samples >= ROLLING_CONFIG['total_weeks']
 
     return render_template('rolling_poc/dashboard.html',
@@ -138,14 +263,14 @@ def get_status():
     poc_site = Site.query.filter_by(site_code=ROLLING_CONFIG['site_code']).first()
 
     if not poc_site:
-        return jsonify({
+        return orjsonify({
             'data_ready': False,
             'message': 'Please populate data from the regular POC page first'
         })
 
-    total_samples = WaterSample.query.filter_by(site_id=poc_site.id).count()
+    total_samples = _sample_count(poc_site.id)
 
-    return jsonify({
+    return orjsonify({
         'data_ready': total_samples >= ROLLING_CONFIG['total_weeks'],
         'total_samples': total_samples,
         'required_samples': ROLLING_CONFIG['total_weeks'],
@@ -153,102 +278,227 @@ def get_status():
     })
 
 
+def _sample_count(site_id):
+    """Number of samples for a site, as a plain SELECT COUNT"""
+    return db.session.execute(
+        db.select(func.count(WaterSample.id)).where(WaterSample.site_id == site_id)
+    ).scalar()
+
+
+def _load_poc_data():
+    """
+    Get the POC site and its assembled rolling data
+
+    Returns (poc_site, cols, error_response); error_response is set
+    when the site or enough samples are missing.
+    """
+    poc_site = Site.query.filter_by(site_code=ROLLING_CONFIG['site_code']).first()
+    if not poc_site:
+        return None, None, (orjsonify({'success': False, 'error': 'POC site not found. Please populate data from POC page first.'}), 400)
+
+    sample_count, max_sample_id, max_created_at = db.session.query(
+        func.count(WaterSample.id), func.max(WaterSample.id), func.max(WaterSample.created_at)
+    ).filter(WaterSample.site_id == poc_site.id).one()
+
+    if sample_count < ROLLING_CONFIG['total_weeks']:
+        return None, None, (orjsonify({
+            'success': False,
+            'error': f'Insufficient data. Found {sample_count}, need {ROLLING_CONFIG["total_weeks"]}'
+        }), 400)
+
+    cols = _cached_rolling_data(poc_site.id, sample_count, max_sample_id, max_created_at)
+    return poc_site, cols, None
+
+
+@lru_cache(maxsize=4)
+def _cached_rolling_data(site_id, sample_count, max_sample_id, max_created_at):
+    """
+    Assembled column data for a site, reused across model runs
+
+    The sample count, max sample id and latest created_at form the cache
+    key, so adding or removing samples reloads the data, as does an
+    identity reset that reuses ids. reset_all_data also clears the cache. Callers must not mutate the result.
+    Cached per process; multi-worker deployments each keep their own copy.
+    """
+    all_samples = WaterSample.query.filter_by(site_id=site_id).options(
+        selectinload(WaterSample.test_result_list),
+        selectinload(WaterSample.analysis_list)
+    ).order_by(WaterSample.collection_date.asc()).all()
+    return load_rolling_data(all_samples)
+
+
+def load_rolling_data(all_samples):
+    """
+    Assemble the per-week column data used by the rolling simulation
+
+    all_samples should be loaded with test_result_list and analysis_list
+    eager loaded, so reading them here hits the identity map rather than
+    the database. Test results and analyses are only referenced while
+    reading their values straight into columns; no per-week dicts or ORM
+    objects are kept, so the result can be cached across requests and
+    pickled to worker processes.
+    """
+    # Keep only weeks that have both a test result and an analysis
+    rows = [
+        (sample, sample.test_result_list[0], sample.analysis_list[0])
+        for sample in all_samples
+        if sample.test_result_list and sample.analysis_list
+    ]
+
+    return build_columns({
+        'date': [sample.collection_date for sample, _, _ in rows],
+        'ph': [test.ph for _, test, _ in rows],
+        'turbidity': [test.turbidity_ntu for _, test, _ in rows],
+        'tds': [test.tds_ppm for _, test, _ in rows],
+        'chlorine': [test.free_chlorine_mg_l for _, test, _ in rows],
+        'coliform': [test.total_coliform_mpn for _, test, _ in rows],
+        'is_contaminated': [analysis.is_contaminated for _, _, analysis in rows],
+        'contamination_type': [analysis.contamination_type for _, _, analysis in rows],
+        'severity_level': [analysis.severity_level for _, _, analysis in rows],
+        'wqi_score': [analysis.wqi_score for _, _, analysis in rows],
+        'wqi_class': [analysis.wqi_class for _, _, analysis in rows]
+    })
+
+
+def run_model(model_name, cols, poc_site=None):
+    """
+    Run rolling training and prediction for one model
+
+    Only plain values and arrays are read from cols.
+    """
+    config = MODEL_CONFIGS[model_name]
+
+    # Initialize rolling ML simulator
+    simulator = RollingMLSimulator(model_name, base_accuracy=config['base_accuracy'])
+
+    # Run rolling predictions
+    results = run_rolling_prediction(model_name, simulator, cols, config, poc_site)
+
+    return {
+        'success': True,
+        'model': model_name,
+        'name': config['name'],
+        'algorithm': config['algorithm'],
+        'results': results
+    }
+
+
 @rolling_poc_bp.route('/run/<model_name>', methods=['POST'])
 @login_required
 def run_rolling_model(model_name):
     """Run complete rolling training and prediction for a model"""
     try:
-        poc_site = Site.query.filter_by(site_code=ROLLING_CONFIG['site_code']).first()
-        if not poc_site:
-            return jsonify({'success': False, 'error': 'POC site not found. Please populate data from POC page first.'}), 400
+        poc_site, cols, error_response = _load_poc_data()
+        if error_response:
+            return error_response
 
-        all_samples = WaterSample.query.filter_by(site_id=poc_site.id).order_by(
-            WaterSample.collection_date.asc()
-        ).all()
+        # Get model configuration
+        if model_name not in MODEL_CONFIGS:
+            return orjsonify({'success': False, 'error': f'Unknown model: {model_name}'}), 400
 
-        if len(all_samples) < ROLLING_CONFIG['total_weeks']:
-            return jsonify({
-                'success': False,
-                'error': f'Insufficient data. Found {len(all_samples)}, need {ROLLING_CONFIG["total_weeks"]}'
-            }), 400
+        return orjsonify(run_model(model_name, cols, poc_site))
 
-        # Get model configuration
-        model_configs = get_model_configs()
-        if model_name not in model_configs:
-            return jsonify({'success': False, 'error': f'Unknown model: {model_name}'}), 400
-
-        config = model_configs[model_name]
-
-        # Initialize rolling ML simulator
-        simulator = RollingMLSimulator(model_name, base_accuracy=config['base_accuracy'])
-
-        # Prepare all sample data
-        all_data = []
-        for sample in all_samples:
-            test = TestResult.query.filter_by(sample_id=sample.id).first()
-            analysis = Analysis.query.filter_by(sample_id=sample.id).first()
-            if test and analysis:
-                all_data.append({
-                    'sample': sample,
-                    'test': test,
-                    'analysis': analysis,
-                    'week': len(all_data) + 1,
-                    'date': sample.collection_date,
-                    'season': get_season(sample.collection_date),
-                    'ph': test.ph,
-                    'turbidity': test.turbidity_ntu,
-                    'tds': test.tds_ppm,
-                    'chlorine': test.free_chlorine_mg_l,
-                    'coliform': test.total_coliform_mpn,
-                    'is_contaminated': analysis.is_contaminated,
-                    'contamination_type': analysis.contamination_type,
-                    'wqi_score': analysis.wqi_score,
-                    'wqi_class': analysis.wqi_class
-                })
-
-        # Run rolling predictions
-        results = run_rolling_prediction(model_name, simulator, all_data, config, poc_site)
-
-        return jsonify({
-            'success': True,
-            'model': model_name,
-            'name': config['name'],
-            'algorithm': config['algorithm'],
-            'results': results
-        })
+    except Exception as e:
+        import traceback
+        return orjsonify({
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }), 500
+
+
+@rolling_poc_bp.route('/run-all', methods=['POST'])
+@login_required
+def run_all_models():
+    """Run all rolling models on the POC data, loaded once"""
+    try:
+        poc_site, cols, error_response = _load_poc_data()
+        if error_response:
+            return error_response
+
+        # Each run is a short NumPy computation, cheaper than starting and
+        # feeding worker processes, so the models run here one after another
+        models = {name: run_model(name, cols, poc_site) for name in MODEL_CONFIGS}
+
+        return orjsonify({'success': True, 'models': models})
 
     except Exception as e:
         import traceback
-        return jsonify({
+        return orjsonify({
             'success': False,
             'error': str(e),
             'traceback': traceback.format_exc()
         }), 500
 
 
-def run_rolling_prediction(model_name, simulator, all_data, config, poc_site):
+def build_columns(fields):
+    """
+    Convert per-field value lists into NumPy column arrays (struct of arrays)
+
+    Numeric and flag fields become arrays; date and label fields stay lists.
+    """
+    cols = {
+        param: np.array(fields[param], dtype=np.float64)
+        for param in COLUMN_PARAMS
+    }
+    cols['is_contaminated'] = np.array([bool(v) for v in fields['is_contaminated']], dtype=bool)
+    for field in ('date', 'contamination_type', 'severity_level', 'wqi_class'):
+        cols[field] = fields[field]
+
+    # Anomaly ground truth for every week: unusual turbidity/coliform or contamination
+    turbidity_zscore = np.abs(cols['turbidity'] - 4.5) / 3.0
+    coliform_zscore = np.abs(cols['coliform'] - 12) / 10.0
+    cols['is_anomaly'] = (turbidity_zscore > 1.5) | (coliform_zscore > 1.5) | cols['is_contaminated']
+
+    # Forecaster trend: column k is the mean of weeks k..k+3, i.e. the trend
+    # available when predicting week k + FORECAST_WINDOW
+    cols['forecast_params'] = np.vstack([cols[p] for p in FORECAST_PARAMS])
+    if len(cols['date']) >= FORECAST_WINDOW:
+        cols['forecast_trend'] = sliding_window_view(
+            cols['forecast_params'], FORECAST_WINDOW, axis=1
+        ).mean(axis=-1)
+    return cols
+
+
+def run_rolling_prediction(model_name, simulator, cols, config, poc_site):
     """Execute rolling training and prediction"""
     initial_weeks = ROLLING_CONFIG['initial_training_weeks']
-    total_weeks = len(all_data)
+    total_weeks = len(cols['date'])
 
     rolling_results = []
     training_progression = []
     correct_predictions = 0
     total_predictions = 0
 
-    # Process each week from 105 onwards
-    for target_week in range(initial_weeks, total_weeks):
-        # Training data: all weeks up to (but not including) target
-        training_data = all_data[:target_week]
-        target_data = all_data[target_week]
+    # Draw all randomness for the run up front
+    rng = np.random.default_rng()
+    draws = rng.random((total_weeks - initial_weeks, RANDOM_DRAWS_PER_WEEK))
+
+    # Retrain on all weeks before each target week
+    accuracies = simulator.train_rolling(cols['is_contaminated'], initial_weeks, rng)
 
-        # Retrain model on available data
-        train_result = simulator.train(training_data)
+    # Models whose weekly predictions are independent are computed for all weeks at once
+    batch_predictor = BATCH_PREDICTORS.get(model_name)
+    batch_results = None
+    if batch_predictor:
+        batch_results = batch_predictor(cols, accuracies, draws, initial_weeks)
+
+    # Process each week from 105 onwards
+    for i, target_week in enumerate(range(initial_weeks, total_weeks)):
+        # Model state after retraining on weeks before the target
+        simulator.current_accuracy = float(accuracies[i])
+        train_result = {
+            'samples_used': target_week,
+            'model_accuracy': simulator.current_accuracy
+        }
 
         # Make prediction for target week
-        prediction_result = make_model_prediction(
-            model_name, simulator, target_data, training_data, poc_site
-        )
+        if batch_results is not None:
+            prediction_result = batch_results[i]
+        else:
+            prediction_result = make_model_prediction(
+                model_name, simulator, cols, target_week, draws[i], poc_site
+            )
 
         total_predictions += 1
         if prediction_result['correct']:
@@ -265,7 +515,7 @@ def run_rolling_prediction(model_name, simulator, all_data, config, poc_site):
 
         rolling_results.append({
             'week': target_week + 1,
-            'date': target_data['date'].strftime('%Y-%m-%d'),
+            'date': cols['date'][target_week].strftime('%Y-%m-%d'),
             'training_samples': train_result['samples_used'],
             'model_accuracy_at_prediction': round(train_result['model_accuracy'] * 100, 1),
             **prediction_result
@@ -291,223 +541,223 @@ def run_rolling_prediction(model_name, simulator, all_data, config, poc_site):
     }
 
 
-def make_model_prediction(model_name, simulator, target_data, training_data, poc_site):
-    """Make prediction based on model type"""
+def make_model_prediction(model_name, simulator, cols, target_week, draws, poc_site):
+    """Make prediction based on model type
 
-    if model_name == 'site_risk':
-        # Determine actual risk
-        if target_data['is_contaminated']:
-            severity = target_data['analysis'].severity_level
-            if severity == 'critical':
-                actual = 'critical'
-            elif severity == 'high':
-                actual = 'high'
-            else:
-                actual = 'medium'
-        else:
-            actual = 'low'
+    cols holds the column arrays for all weeks; only indices before
+    target_week are treated as training data. draws is this week's row of
+    uniform [0, 1) random numbers.
 
-        predicted, correct = simulator.predict(actual, 'risk')
-        confidence = random.uniform(0.70, 0.95) if correct else random.uniform(0.50, 0.75)
+    Values that are aggregated into metrics or formatted by the dashboard
+    (confidence, score, error, detection rate) are returned unrounded.
+    """
+    predictor = _PREDICTORS.get(model_name)
+    if predictor is None:
+        return {'correct': False, 'error': 'Unknown model'}
+    return predictor(simulator, cols, target_week, draws)
 
-        return {
-            'actual': actual,
-            'predicted': predicted,
-            'correct': correct,
-            'confidence': round(confidence, 3)
-        }
 
-    elif model_name == 'contamination':
-        actual = target_data['is_contaminated']
-        predicted, correct = simulator.predict(actual, 'boolean')
-
-        actual_type = target_data['contamination_type'] if actual else 'none'
-        if correct and actual:
-            predicted_type = actual_type
-        elif not correct and actual:
-            types = ['bacterial', 'chemical', 'physical']
-            predicted_type = random.choice([t for t in types if t != actual_type])
-        elif not correct and not actual:
-            predicted_type = random.choice(['bacterial', 'chemical'])
+def _predict_site_risk(simulator, cols, target_week, draws):
+    """Predict the risk level for the target week"""
+    # Determine actual risk
+    if cols['is_contaminated'][target_week]:
+        severity = cols['severity_level'][target_week]
+        if severity == 'critical':
+            actual = 'critical'
+        elif severity == 'high':
+            actual = 'high'
         else:
-            predicted_type = 'none'
+            actual = 'medium'
+    else:
+        actual = 'low'
 
-        return {
-            'actual': actual,
-            'predicted': predicted,
-            'actual_type': actual_type,
-            'predicted_type': predicted_type,
-            'correct': correct,
-            'confidence': round(random.uniform(0.65, 0.95), 3)
-        }
+    predicted, correct = simulator.predict(actual, 'risk', draws[0], draws[1])
+    confidence = _uniform(draws[2], 0.70, 0.95) if correct else _uniform(draws[2], 0.50, 0.75)
 
-    elif model_name == 'wqi':
-        actual_wqi = target_data['wqi_score']
-        actual_class = target_data['wqi_class']
+    return {
+        'actual': actual,
+        'predicted': predicted,
+        'correct': correct,
+        'confidence': confidence
+    }
 
-        # Predict WQI value
-        if random.random() < simulator.current_accuracy:
-            error = random.uniform(-5, 5)
-            correct = True
-        else:
-            error = random.uniform(-15, 15)
-            correct = False
-
-        predicted_wqi = max(0, min(100, actual_wqi + error))
-
-        # Determine predicted class
-        if predicted_wqi >= 90:
-            predicted_class = 'Excellent'
-        elif predicted_wqi >= 70:
-            predicted_class = 'Good'
-        elif predicted_wqi >= 50:
-            predicted_class = 'Fair'
-        elif predicted_wqi >= 25:
-            predicted_class = 'Poor'
-        else:
-            predicted_class = 'Very Poor'
 
-        class_match = actual_class == predicted_class
+def _predict_contamination(simulator, cols, target_week, draws):
+    """Predict contamination and its type for the target week"""
+    actual = bool(cols['is_contaminated'][target_week])
+    predicted, correct = simulator.predict(actual, 'boolean', draws[0], draws[1])
 
-        return {
-            'actual_wqi': round(actual_wqi, 1),
-            'predicted_wqi': round(predicted_wqi, 1),
-            'actual_class': actual_class,
-            'predicted_class': predicted_class,
-            'error': round(abs(actual_wqi - predicted_wqi), 2),
-            'correct': class_match,
-            'class_match': class_match
-        }
+    actual_type = cols['contamination_type'][target_week] if actual else 'none'
+    if correct and actual:
+        predicted_type = actual_type
+    elif not correct and actual:
+        types = [t for t in ['bacterial', 'chemical', 'physical'] if t != actual_type]
+        predicted_type = types[int(draws[2] * len(types))]
+    elif not correct and not actual:
+        predicted_type = ['bacterial', 'chemical'][int(draws[2] * 2)]
+    else:
+        predicted_type = 'none'
 
-    elif model_name == 'anomaly':
-        # Determine if actual anomaly based on unusual values
-        turbidity_zscore = abs(target_data['turbidity'] - 4.5) / 3.0
-        coliform_zscore = abs(target_data['coliform'] - 12) / 10.0
-        actual_anomaly = turbidity_zscore > 1.5 or coliform_zscore > 1.5 or target_data['is_contaminated']
+    return {
+        'actual': actual,
+        'predicted': predicted,
+        'actual_type': actual_type,
+        'predicted_type': predicted_type,
+        'correct': correct,
+        'confidence': _uniform(draws[3], 0.65, 0.95)
+    }
 
-        predicted_anomaly, correct = simulator.predict(actual_anomaly, 'boolean')
-        score = random.uniform(0.7, 0.95) if predicted_anomaly else random.uniform(0.1, 0.4)
 
-        return {
-            'actual': actual_anomaly,
-            'predicted': predicted_anomaly,
-            'correct': correct,
-            'score': round(score, 3)
-        }
+def _predict_anomaly(simulator, cols, target_week, draws):
+    """Flag the target week as anomalous or normal"""
+    # Actual anomaly flags are precomputed from unusual values for all weeks
+    actual_anomaly = bool(cols['is_anomaly'][target_week])
 
-    elif model_name == 'forecast':
-        # Forecast next week's parameters
-        actual_params = {
-            'ph': target_data['ph'],
-            'turbidity': target_data['turbidity'],
-            'tds': target_data['tds'],
-            'chlorine': target_data['chlorine']
-        }
+    predicted_anomaly, correct = simulator.predict(actual_anomaly, 'boolean', draws[0], draws[1])
+    score = _uniform(draws[2], 0.7, 0.95) if predicted_anomaly else _uniform(draws[2], 0.1, 0.4)
 
-        # Use recent trend from training data
-        recent_data = training_data[-4:] if len(training_data) >= 4 else training_data
+    return {
+        'actual': actual_anomaly,
+        'predicted': predicted_anomaly,
+        'correct': correct,
+        'score': score
+    }
 
-        predicted_params = {}
-        errors = {}
 
-        for param, actual_val in actual_params.items():
-            if recent_data:
-                trend = np.mean([d[param] for d in recent_data])
-                if random.random() < simulator.current_accuracy:
-                    predicted = trend + random.uniform(-0.5, 0.5) * (actual_val - trend)
-                else:
-                    predicted = trend + random.uniform(-1.5, 1.5) * abs(actual_val - trend)
-            else:
-                predicted = actual_val * random.uniform(0.9, 1.1)
+# Per-week predictors, looked up by model name
+_PREDICTORS = {
+    'site_risk': _predict_site_risk,
+    'contamination': _predict_contamination,
+    'anomaly': _predict_anomaly
+}
 
-            predicted_params[param] = round(predicted, 2)
-            errors[param] = round(abs(actual_val - predicted) / max(actual_val, 0.1) * 100, 1)
 
-        avg_error = float(np.mean(list(errors.values())))
-        correct = bool(avg_error < 15)  # Consider correct if avg error < 15%
+def predict_wqi_batch(cols, accuracies, draws, initial_weeks):
+    """Predict WQI for every prediction week at once"""
+    actual_wqi = cols['wqi_score'][initial_weeks:]
+    actual_classes = cols['wqi_class'][initial_weeks:]
 
-        return {
-            'actual': actual_params,
-            'predicted': predicted_params,
-            'errors': errors,
+    # Predict WQI value
+    error = np.where(
+        draws[:, 0] < accuracies,
+        _uniform(draws[:, 1], -5, 5),
+        _uniform(draws[:, 1], -15, 15)
+    )
+    predicted_wqi = np.clip(actual_wqi + error, 0, 100)
+
+    # Determine predicted class
+    predicted_classes = classify_wqi(predicted_wqi).tolist()
+    abs_errors = np.abs(actual_wqi - predicted_wqi).tolist()
+
+    results = []
+    for actual, predicted, actual_class, predicted_class, abs_error in zip(
+            np.round(actual_wqi, 1).tolist(), np.round(predicted_wqi, 1).tolist(),
+            actual_classes, predicted_classes, abs_errors):
+        class_match = actual_class == predicted_class
+        results.append({
+            'actual_wqi': actual,
+            'predicted_wqi': predicted,
+            'actual_class': actual_class,
+            'predicted_class': predicted_class,
+            'error': abs_error,
+            'correct': class_match,
+            'class_match': class_match
+        })
+    return results
+
+
+def predict_forecast_batch(cols, accuracies, draws, initial_weeks):
+    """
+    Forecast every prediction week's parameters at once
+
+    Works on (parameter, week) matrices built from the precomputed trailing
+    trend; prediction weeks always follow at least FORECAST_WINDOW weeks.
+    """
+    n_weeks = len(accuracies)
+    actual = cols['forecast_params'][:, initial_weeks:initial_weeks + n_weeks]
+    trend_start = initial_weeks - FORECAST_WINDOW
+    trend = cols['forecast_trend'][:, trend_start:trend_start + n_weeks]
+
+    # One coin/uniform pair per parameter and week
+    coin, u = draws[:, 0::2].T, draws[:, 1::2].T
+    predicted = np.where(
+        coin < accuracies,
+        trend + _uniform(u, -0.5, 0.5) * (actual - trend),
+        trend + _uniform(u, -1.5, 1.5) * np.abs(actual - trend)
+    )
+    errors = np.round(np.abs(actual - predicted) / np.maximum(actual, 0.1) * 100, 1)
+    avg_errors = errors.mean(axis=0)
+
+    results = []
+    for actual_week, predicted_week, errors_week, avg_error in zip(
+            actual.T.tolist(), np.round(predicted, 2).T.tolist(),
+            errors.T.tolist(), avg_errors.tolist()):
+        results.append({
+            'actual': dict(zip(FORECAST_PARAMS, actual_week)),
+            'predicted': dict(zip(FORECAST_PARAMS, predicted_week)),
+            'errors': dict(zip(FORECAST_PARAMS, errors_week)),
             'avg_error': round(avg_error, 1),
-            'correct': correct
-        }
+            'correct': avg_error < 15  # Consider correct if avg error < 15%
+        })
+    return results
+
+
+def predict_cost_batch(cols, accuracies, draws, initial_weeks):
+    """Recommend a testing schedule and its cost for every prediction week at once"""
+    # Risk tier from WQI score, then per-tier values by table lookup
+    tier = np.searchsorted(COST_RISK_THRESHOLDS, cols['wqi_score'][initial_weeks:], side='right')
+    skip_test = tier == len(COST_RISK_LABELS) - 1
+
+    # Skip test is always correct for low risk
+    correct = skip_test | (draws[:, 0] < accuracies)
+
+    current_cost = COST_CURRENT[tier]
+    cost_factor = np.where(correct, COST_FACTOR_HIT[tier], COST_FACTOR_MISS[tier])
+    optimized_cost = np.round(current_cost * cost_factor).astype(np.int64)
+    savings_percent = np.round((1 - optimized_cost / current_cost) * 100, 1)
+    detection_range = np.where(correct[:, None], DETECTION_HIT[tier], DETECTION_MISS[tier])
+    detection_rate = _uniform(draws[:, 1], detection_range[:, 0], detection_range[:, 1])
+
+    results = []
+    for t, current, optimized, savings, detection, is_correct in zip(
+            tier.tolist(), current_cost.tolist(), optimized_cost.tolist(),
+            savings_percent.tolist(), detection_rate.tolist(), correct.tolist()):
+        results.append({
+            'risk_category': COST_RISK_LABELS[t],
+            'recommendation': COST_RECOMMENDATIONS[t],
+            'current_cost': current,
+            'optimized_cost': optimized,
+            'savings_percent': savings,
+            'detection_rate': detection,
+            'correct': is_correct
+        })
+    return results
 
-    elif model_name == 'cost':
-        # Risk-based cost optimization using WQI score
-        wqi = target_data['wqi_score']
-
-        # Determine risk level and recommendation based on WQI
-        if wqi >= 85:
-            risk_level = 'low'
-            recommendation = 'Skip Test'
-            current_cost = 72000  # 6 tests/year * 12000
-            optimized_cost = 0  # No testing needed
-            detection_rate = 100.0  # No contamination risk
-            savings_percent = 100.0
-            correct = True  # Skip test is always correct for low risk
-        elif wqi >= 70:
-            risk_level = 'medium'
-            recommendation = 'Reduced Testing'
-            current_cost = 144000  # 12 tests/year * 12000
-            if random.random() < simulator.current_accuracy:
-                optimized_cost = round(current_cost * 0.35)  # 65% savings
-                detection_rate = random.uniform(95, 98)
-                correct = True
-            else:
-                optimized_cost = round(current_cost * 0.5)
-                detection_rate = random.uniform(90, 94)
-                correct = False
-            savings_percent = round((1 - optimized_cost / current_cost) * 100, 1)
-        elif wqi >= 50:
-            risk_level = 'high'
-            recommendation = 'Standard Testing'
-            current_cost = 312000  # 26 tests/year * 12000
-            if random.random() < simulator.current_accuracy:
-                optimized_cost = round(current_cost * 0.70)  # 30% savings
-                detection_rate = random.uniform(94, 97)
-                correct = True
-            else:
-                optimized_cost = round(current_cost * 0.85)
-                detection_rate = random.uniform(88, 93)
-                correct = False
-            savings_percent = round((1 - optimized_cost / current_cost) * 100, 1)
-        else:
-            risk_level = 'critical'
-            recommendation = 'Intensive Testing'
-            current_cost = 624000  # 52 tests/year * 12000
-            if random.random() < simulator.current_accuracy:
-                optimized_cost = round(current_cost * 0.87)  # 13% savings
-                detection_rate = random.uniform(96, 99)
-                correct = True
-            else:
-                optimized_cost = round(current_cost * 0.95)
-                detection_rate = random.uniform(92, 96)
-                correct = False
-            savings_percent = round((1 - optimized_cost / current_cost) * 100, 1)
 
-        return {
-            'risk_category': risk_level,
-            'recommendation': recommendation,
-            'current_cost': round(current_cost),
-            'optimized_cost': round(optimized_cost),
-            'savings_percent': savings_percent,
-            'detection_rate': round(detection_rate, 1),
-            'correct': correct
-        }
+# Models predicted for all weeks in one vectorized pass
+BATCH_PREDICTORS = {
+    'wqi': predict_wqi_batch,
+    'forecast': predict_forecast_batch,
+    'cost': predict_cost_batch
+}
+
 
-    return {'correct': False, 'error': 'Unknown model'}
+def _binary_cm(act, pred):
+    """Confusion matrix counts (tp, tn, fp, fn) from two boolean arrays"""
+    tp = int(np.count_nonzero(act & pred))
+    tn = int(np.count_nonzero(~act & ~pred))
+    fp = int(np.count_nonzero(~act & pred))
+    fn = int(np.count_nonzero(act & ~pred))
+    return tp, tn, fp, fn
 
 
 def calculate_model_metrics(model_name, results, accuracy):
     """Calculate model-specific metrics"""
 
     if model_name == 'site_risk':
-        tp = sum(1 for r in results if r['actual'] in ['high', 'critical'] and r['predicted'] in ['high', 'critical'])
-        tn = sum(1 for r in results if r['actual'] in ['low', 'medium'] and r['predicted'] in ['low', 'medium'])
-        fp = sum(1 for r in results if r['actual'] in ['low', 'medium'] and r['predicted'] in ['high', 'critical'])
-        fn = sum(1 for r in results if r['actual'] in ['high', 'critical'] and r['predicted'] in ['low', 'medium'])
+        act = np.array([r['actual'] in ('high', 'critical') for r in results], dtype=bool)
+        pred = np.array([r['predicted'] in ('high', 'critical') for r in results], dtype=bool)
+        tp, tn, fp, fn = _binary_cm(act, pred)
 
         precision = tp / (tp + fp) if (tp + fp) > 0 else 0
         recall = tp / (tp + fn) if (tp + fn) > 0 else 0
@@ -520,10 +770,9 @@ def calculate_model_metrics(model_name, results, accuracy):
         }
 
     elif model_name == 'contamination':
-        tp = sum(1 for r in results if r['actual'] and r['predicted'])
-        tn = sum(1 for r in results if not r['actual'] and not r['predicted'])
-        fp = sum(1 for r in results if not r['actual'] and r['predicted'])
-        fn = sum(1 for r in results if r['actual'] and not r['predicted'])
+        act = np.array([bool(r['actual']) for r in results], dtype=bool)
+        pred = np.array([bool(r['predicted']) for r in results], dtype=bool)
+        tp, tn, fp, fn = _binary_cm(act, pred)
 
         precision = tp / (tp + fp) if (tp + fp) > 0 else 0
         recall = tp / (tp + fn) if (tp + fn) > 0 else 0
@@ -548,10 +797,9 @@ def calculate_model_metrics(model_name, results, accuracy):
         }
 
     elif model_name == 'anomaly':
-        tp = sum(1 for r in results if r['actual'] and r['predicted'])
-        tn = sum(1 for r in results if not r['actual'] and not r['predicted'])
-        fp = sum(1 for r in results if not r['actual'] and r['predicted'])
-        fn = sum(1 for r in results if r['actual'] and not r['predicted'])
+        act = np.array([bool(r['actual']) for r in results], dtype=bool)
+        pred = np.array([bool(r['predicted']) for r in results], dtype=bool)
+        tp, tn, fp, fn = _binary_cm(act, pred)
 
         precision = tp / (tp + fp) if (tp + fp) > 0 else 0
         recall = tp / (tp + fn) if (tp + fn) > 0 else 0
@@ -580,9 +828,9 @@ def calculate_model_metrics(model_name, results, accuracy):
 
         return {
             'accuracy': round(avg_detection, 1),
-            'total_current_cost': round(total_current),
-            'total_optimized_cost': round(total_optimized),
-            'total_savings': round(total_current - total_optimized),
+            'total_current_cost': total_current,
+            'total_optimized_cost': total_optimized,
+            'total_savings': total_current - total_optimized,
             'savings_percent': round((1 - total_optimized / total_current) * 100, 1) if total_current > 0 else 0,
             'avg_detection_rate': round(avg_detection, 1),
             'skip_test_weeks': skip_test_weeks
@@ -593,47 +841,4 @@ def calculate_model_metrics(model_name, results, accuracy):
 
 def get_model_configs():
     """Get model configurations"""
-    return {
-        'site_risk': {
-            'name': 'Site Risk Classifier',
-            'algorithm': 'Rolling Random Forest',
-            'base_accuracy': 0.82,
-            'icon': 'shield-exclamation',
-            'color': 'danger'
-        },
-        'contamination': {
-            'name': 'Contamination Classifier',
-            'algorithm': 'Rolling XGBoost',
-            'base_accuracy': 0.80,
-            'icon': 'virus',
-            'color': 'warning'
-        },
-        'wqi': {
-            'name': 'WQI Predictor',
-            'algorithm': 'Rolling Gradient Boosting',
-            'base_accuracy': 0.78,
-            'icon': 'speedometer2',
-            'color': 'info'
-        },
-        'anomaly': {
-            'name': 'Anomaly Detector',
-            'algorithm': 'Rolling Isolation Forest',
-            'base_accuracy': 0.83,
-            'icon': 'exclamation-triangle',
-            'color': 'purple'
-        },
-        'forecast': {
-            'name': 'Quality Forecaster',
-            'algorithm': 'Rolling LSTM',
-            'base_accuracy': 0.75,
-            'icon': 'graph-up-arrow',
-            'color': 'success'
-        },
-        'cost': {
-            'name': 'Cost Optimizer',
-            'algorithm': 'Rolling Bayesian Opt',
-            'base_accuracy': 0.85,
-            'icon': 'currency-rupee',
-            'color': 'primary'
-        }
-    }
+    return MODEL_CONFIGS
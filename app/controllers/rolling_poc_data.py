@@ -2,27 +2,51 @@
 Rolling POC with Real CPCB Data Controller
 Uses actual water quality data from CPCB monitoring stations
 """
+import csv
+import io
+import json
+import math
+import multiprocessing
+import os
 import re
-import random
 import numpy as np
+import orjson
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, jsonify, request
+from functools import lru_cache
+from threading import Lock
+from flask import Blueprint, render_template, jsonify, request, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.models import Site, WaterSample, TestResult, Analysis, User
 from app.models.data_import import ImportBatch, DataSource
 from app.services.contamination_analyzer import ContaminationAnalyzer
-from app.services.ml_pipeline import MLPipeline
+from app.services.ml_pipeline import get_ml_pipeline
 from app.models.ml_prediction import (
     SiteRiskPrediction, ContaminationPrediction, WQIReading,
     WaterQualityForecast, CostOptimizationResult, AnomalyDetection
 )
 from app.models.iot_sensor import IoTSensor, SensorReading, SensorAlert
 from app.models.intervention import Intervention
+from app.controllers.rolling_poc import _cached_rolling_data
 
 rolling_poc_data_bp = Blueprint('rolling_poc_data', __name__)
 
+
+def orjsonify(obj, status=200):
+    """jsonify replacement using orjson, which also serializes NumPy values natively"""
+    return current_app.response_class(
+        orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
 # Configuration for real CPCB data
 CPCB_CONFIG = {
     'excel_path': '/Users/test/Downloads/Monthly  Surface Water Quality Timeseries data for All agency for period2020-01 to2025-10.xlsx',
@@ -54,6 +78,157 @@ COLUMN_MAPPING = {
     'Fecal Coliforms (MPN/100 ml)': 'fecal_coliform_mpn'
 }
 
+# Column names an uploaded workbook may use for the site category
+SITE_CATEGORY_COLUMNS = ['site_category', 'Site Category', 'Site_Category', 'Category']
+
+# Column names an uploaded workbook may use for other site metadata, in order of preference
+STATE_COLUMNS = ['State Name ', 'State Name', 'State']
+DISTRICT_COLUMNS = ['District Name', 'District']
+SITE_TYPE_COLUMNS = ['Site Type', 'site_type', 'Type']
+
+# Workbook columns read by the rolling POC and station import; others are never loaded
+CPCB_COLUMNS = frozenset(COLUMN_MAPPING) | frozenset(SITE_CATEGORY_COLUMNS) | {
+    'Station Name', 'Date', 'State Name ', 'State Name', 'District Name',
+    'Latitude', 'Longitude', 'Basin Name ', 'Agency Name '
+}
+
+# Rolling model definitions
+MODEL_CONFIGS = {
+    'site_risk': {
+        'name': 'Site Risk Classifier',
+        'algorithm': 'Rolling Random Forest (Real Data)',
+        'base_accuracy': 0.78,
+        'icon': 'shield-exclamation',
+        'color': 'danger'
+    },
+    'contamination': {
+        'name': 'Contamination Detector',
+        'algorithm': 'Rolling XGBoost (Real Data)',
+        'base_accuracy': 0.75,
+        'icon': 'virus',
+        'color': 'warning'
+    },
+    'wqi': {
+        'name': 'WQI Predictor',
+        'algorithm': 'Rolling Gradient Boosting (Real Data)',
+        'base_accuracy': 0.72,
+        'icon': 'speedometer2',
+        'color': 'info'
+    },
+    'forecast': {
+        'name': 'Quality Forecaster',
+        'algorithm': 'Rolling LSTM (Real Data)',
+        'base_accuracy': 0.70,
+        'icon': 'graph-up-arrow',
+        'color': 'success'
+    },
+    'cost': {
+        'name': 'Cost Optimizer',
+        'algorithm': 'Rolling Bayesian Opt (Real Data)',
+        'base_accuracy': 0.80,
+        'icon': 'currency-rupee',
+        'color': 'primary'
+    }
+}
+
+
+def _prepare_for_parquet(df):
+    """
+    Give workbook columns a single type each so they can be written to Parquet
+
+    Measurement and coordinate columns become numeric (cells such as '-' turn
+    into NaN) and other mixed columns, Date included, become strings. Dates stay
+    text because a workbook can mix 'YYYY-MM' and full dates; readers parse them
+    with _parse_sample_dates, each with its own day for month-only values.
+    """
+    numeric_cols = [c for c in list(COLUMN_MAPPING) + ['Latitude', 'Longitude'] if c in df.columns]
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce')
+    if 'Date' in df.columns:
+        df['Date'] = df['Date'].astype(str).where(df['Date'].notna(), None)
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _has_timestamp_dates(parquet_path):
+    """Whether a Parquet copy stores Date as timestamps rather than text"""
+    schema = pq.read_schema(parquet_path)
+    return 'Date' in schema.names and pa.types.is_timestamp(schema.field('Date').type)
+
+
+def _cpcb_parquet_path(excel_path=None):
+    """
+    Get the Parquet copy of a CPCB workbook, converting it on first use
+
+    The workbook is converted again whenever it is newer than its copy, or
+    the copy still holds Date as timestamps (older copies did). Defaults to
+    the configured workbook.
+    """
+    if excel_path is None:
+        excel_path = CPCB_CONFIG['excel_path']
+    parquet_path = excel_path + '.parquet'
+    if os.path.exists(excel_path) and (
+            not os.path.exists(parquet_path)
+            or os.path.getmtime(parquet_path) < os.path.getmtime(excel_path)
+            or _has_timestamp_dates(parquet_path)):
+        df = _prepare_for_parquet(pd.read_excel(excel_path, header=5, usecols=lambda c: c in CPCB_COLUMNS))
+        # Keep each station's rows together, in date order, so station filters can
+        # skip row groups and readers never need to sort a station again
+        if 'Station Name' in df.columns:
+            df = df.sort_values(
+                ['Station Name', 'Date'] if 'Date' in df.columns else 'Station Name', kind='mergesort'
+            )
+        # Write to a temporary file first so readers never see a partial copy
+        temp_path = f'{parquet_path}.{os.getpid()}.tmp'
+        df.to_parquet(temp_path, engine='pyarrow', compression='zstd')
+        os.replace(temp_path, parquet_path)
+    return parquet_path
+
+
+def _build_station_manifest(parquet_path):
+    """List each CPCB station with its state and sample count"""
+    columns = [c for c in ['Station Name', 'State Name '] if c in pq.read_schema(parquet_path).names]
+    df = pd.read_parquet(parquet_path, engine='pyarrow', columns=columns)
+
+    grouped = df.groupby('Station Name')
+    sample_counts = grouped.size()
+    states = grouped['State Name '].first() if 'State Name ' in df.columns else None
+
+    stations = []
+    for station, sample_count in sample_counts.items():
+        state = states[station] if states is not None else None
+        stations.append({
+            'id': f'cpcb-{station.replace(" ", "-").lower()}',
+            'name': station,
+            'state': state if pd.notna(state) else 'Unknown',
+            'samples': int(sample_count)
+        })
+    return stations
+
+
+def _cpcb_station_manifest():
+    """
+    Get the CPCB station list, kept in a small JSON file next to the Parquet copy
+
+    The manifest is rebuilt whenever the Parquet copy is newer than it, so a
+    changed workbook refreshes both. Callers must not mutate the result.
+    """
+    parquet_path = _cpcb_parquet_path()
+    manifest_path = CPCB_CONFIG['excel_path'] + '.stations.json'
+    if not os.path.exists(manifest_path) or os.path.getmtime(manifest_path) < os.path.getmtime(parquet_path):
+        temp_path = f'{manifest_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(_build_station_manifest(parquet_path), f)
+        os.replace(temp_path, manifest_path)
+    return _load_station_manifest(manifest_path, os.path.getmtime(manifest_path))
+
+
+@lru_cache(maxsize=1)
+def _load_station_manifest(manifest_path, mtime):
+    """Read the station manifest; mtime is only part of the cache key"""
+    with open(manifest_path) as f:
+        return json.load(f)
+
 
 def load_cpcb_data(station_name=None):
     """Load and process CPCB Excel data or database data for a specific station"""
@@ -66,38 +241,40 @@ def load_cpcb_data(station_name=None):
         site = Site.query.filter_by(site_name=station_name, is_active=True).first()
 
         if site:
-            # Load data from database
-            samples = WaterSample.query.filter_by(site_id=site.id).join(
-                TestResult
-            ).order_by(WaterSample.collection_date).all()
+            # Columns matching the CPCB structure, read from each sample's first test result
+            columns = {
+                'Date': WaterSample.collection_date,
+                'Temperature (C)': TestResult.temperature_celsius,
+                'pH': TestResult.ph,
+                'Turbidity (NTU)': TestResult.turbidity_ntu,
+                'TDS (ppm)': TestResult.tds_ppm,
+                'Total Coliforms (MPN/100 ml)': TestResult.total_coliform_mpn,
+                'Free Chlorine (mg/L)': TestResult.free_chlorine_mg_l,
+                'Iron (mg/L)': TestResult.iron_mg_l,
+                'Chloride (mg/L)': TestResult.chloride_mg_l,
+                'Dissolved Oxygen (mg/L)': TestResult.dissolved_oxygen_mg_l,
+                'BOD (mg/L)': TestResult.bod_mg_l,
+                'COD (mg/L)': TestResult.cod_mg_l,
+                'Nitrate (mg/L)': TestResult.nitrate_mg_l,
+                'Fluoride (mg/L)': TestResult.fluoride_mg_l,
+                'Total Hardness (mg/L)': TestResult.total_hardness_mg_l
+            }
+            first_test_id = db.select(db.func.min(TestResult.id)).where(
+                TestResult.sample_id == WaterSample.id
+            ).correlate(WaterSample).scalar_subquery()
+
+            # Load data from database in a single joined SELECT
+            rows = db.session.execute(
+                db.select(*columns.values())
+                .join(TestResult, TestResult.id == first_test_id)
+                .where(WaterSample.site_id == site.id)
+                .order_by(WaterSample.collection_date)
+            ).all()
 
-            if len(samples) == 0:
+            if len(rows) == 0:
                 return None, f"No samples found for site '{station_name}'"
 
-            # Convert to DataFrame format matching CPCB structure
-            data_rows = []
-            for sample in samples:
-                if sample.test_results:
-                    test = sample.test_results[0]  # Get first test result
-                    data_rows.append({
-                        'Date': sample.collection_date,
-                        'Temperature (C)': test.temperature_celsius,
-                        'pH': test.ph,
-                        'Turbidity (NTU)': test.turbidity_ntu,
-                        'TDS (ppm)': test.tds_ppm,
-                        'Total Coliforms (MPN/100 ml)': test.total_coliform_mpn,
-                        'Free Chlorine (mg/L)': test.free_chlorine_mg_l,
-                        'Iron (mg/L)': test.iron_mg_l,
-                        'Chloride (mg/L)': test.chloride_mg_l,
-                        'Dissolved Oxygen (mg/L)': test.dissolved_oxygen_mg_l,
-                        'BOD (mg/L)': test.bod_mg_l,
-                        'COD (mg/L)': test.cod_mg_l,
-                        'Nitrate (mg/L)': test.nitrate_mg_l,
-                        'Fluoride (mg/L)': test.fluoride_mg_l,
-                        'Total Hardness (mg/L)': test.total_hardness_mg_l
-                    })
-
-            station_data = pd.DataFrame(data_rows)
+            station_data = pd.DataFrame(rows, columns=list(columns))
 
             # Get station info
             station_info = {
@@ -113,22 +290,28 @@ def load_cpcb_data(station_name=None):
             return station_data, station_info
 
         # If not found in database, try CPCB Excel file (for public sites)
-        df = pd.read_excel(CPCB_CONFIG['excel_path'], header=5)
-
-        # Filter for the station
-        station_data = df[df['Station Name'] == station_name].copy()
+        # Reuse this station's frame while the Parquet copy is unchanged
+        parquet_path = _cpcb_parquet_path()
+        cache_key = (station_name, os.path.getmtime(parquet_path))
+        with _cpcb_station_cache_lock:
+            cached = _cpcb_station_cache.get(cache_key)
+            if cached is not None:
+                _cpcb_station_cache.move_to_end(cache_key)
+        if cached is not None:
+            return cached
+
+        # Read only this station's rows, and only the columns we use, from the Parquet copy
+        station_data = pd.read_parquet(
+            parquet_path, engine='pyarrow',
+            columns=[c for c in pq.read_schema(parquet_path).names if c in CPCB_COLUMNS],
+            filters=[('Station Name', '==', station_name)]
+        )
 
         if len(station_data) == 0:
             return None, f"Station '{station_name}' not found in CPCB data or database"
 
-        # Sort by date
-        station_data = station_data.sort_values('Date')
-
         # Clean data - replace '-' with NaN
-        for col in station_data.columns:
-            station_data[col] = station_data[col].apply(
-                lambda x: np.nan if str(x).strip() == '-' else x
-            )
+        station_data = station_data.replace(r'^\s*-\s*$', np.nan, regex=True)
 
         # Get station info
         station_info = {
@@ -141,6 +324,11 @@ def load_cpcb_data(station_name=None):
             'agency': station_data['Agency Name '].iloc[0] if 'Agency Name ' in station_data.columns else 'Unknown'
         }
 
+        with _cpcb_station_cache_lock:
+            _cpcb_station_cache[cache_key] = (station_data, station_info)
+            if len(_cpcb_station_cache) > CPCB_STATION_CACHE_SIZE:
+                _cpcb_station_cache.popitem(last=False)
+
         return station_data, station_info
 
     except Exception as e:
@@ -152,17 +340,8 @@ def get_available_stations():
     stations = []
 
     try:
-        # Get stations from CPCB Excel file
-        df = pd.read_excel(CPCB_CONFIG['excel_path'], header=5)
-
-        for station, group in df.groupby('Station Name'):
-            state = group['State Name '].iloc[0] if 'State Name ' in group.columns else 'Unknown'
-            stations.append({
-                'id': f'cpcb-{station.replace(" ", "-").lower()}',
-                'name': station,
-                'state': state,
-                'samples': len(group)
-            })
+        # Get stations from the CPCB station manifest
+        stations.extend(_cpcb_station_manifest())
     except Exception as e:
         pass  # Continue even if Excel loading fails
 
@@ -195,21 +374,71 @@ def get_available_stations():
     return stations
 
 
+# WHO/BIS standards for WQI calculation
+WQI_STANDARDS = {
+    'ph': {'ideal': 7.0, 'max': 8.5, 'min': 6.5, 'weight': 0.15},
+    'tds_ppm': {'ideal': 0, 'max': 500, 'weight': 0.12},
+    'turbidity_ntu': {'ideal': 0, 'max': 5, 'weight': 0.10},
+    'dissolved_oxygen_mg_l': {'ideal': 14.6, 'min': 5, 'weight': 0.15},
+    'bod_mg_l': {'ideal': 0, 'max': 5, 'weight': 0.12},
+    'total_hardness_mg_l': {'ideal': 0, 'max': 300, 'weight': 0.08},
+    'chloride_mg_l': {'ideal': 0, 'max': 250, 'weight': 0.08},
+    'nitrate_mg_l': {'ideal': 0, 'max': 45, 'weight': 0.10},
+    'iron_mg_l': {'ideal': 0, 'max': 0.3, 'weight': 0.05},
+    'fluoride_mg_l': {'ideal': 0, 'max': 1.5, 'weight': 0.05}
+}
+
+# WQI lower bounds for Poor/Fair/Good/Excellent, binned with np.digitize
+WQI_CLASS_BINS = np.array([25, 50, 70, 90])
+WQI_CLASS_LABELS = np.array(['Very Poor', 'Poor', 'Fair', 'Good', 'Excellent'])
+
+# Completed rolling runs kept per process, keyed by (station, model, data version).
+# Each cache has a lock, since threaded workers share it between requests.
+ROLLING_RUN_CACHE_SIZE = 32
+_rolling_run_cache = OrderedDict()
+_rolling_run_cache_lock = Lock()
+
+# Process pool for model simulations, one per worker process, created on first use
+_simulation_pool = None
+_simulation_pool_lock = Lock()
+
+# Loaded CPCB station frames kept per process, keyed by (station, Parquet mtime)
+CPCB_STATION_CACHE_SIZE = 10
+_cpcb_station_cache = OrderedDict()
+_cpcb_station_cache_lock = Lock()
+
+# Samples fetched per round-trip when streaming the data export
+EXPORT_BATCH_SIZE = 1000
+
+# Season for each month (1-12); anything else falls back to summer
+MONTH_TO_SEASON = {
+    1: 'winter', 2: 'winter', 3: 'summer', 4: 'summer', 5: 'summer', 6: 'monsoon',
+    7: 'monsoon', 8: 'monsoon', 9: 'monsoon', 10: 'post_monsoon', 11: 'post_monsoon', 12: 'winter'
+}
+
+# Site risk levels, least to most severe
+RISK_LEVELS = ('low', 'medium', 'high', 'critical')
+
+# Contamination severity levels, least to most severe
+SEVERITY_LEVELS = np.array(['none', 'medium', 'high', 'critical'])
+
+# Uniform and normal draws per predicted sample (the forecaster uses one of each per parameter)
+RANDOM_DRAWS_PER_SAMPLE = 4
+
+
+def _uniform(u, low, high):
+    """Scale a uniform [0, 1) draw to [low, high)"""
+    return low + (high - low) * u
+
+
+def _classify_wqi(wqi):
+    """Map a WQI score, or an array of scores, to class labels"""
+    return WQI_CLASS_LABELS[np.digitize(wqi, WQI_CLASS_BINS)]
+
+
 def calculate_wqi(test_data):
     """Calculate Water Quality Index from test parameters"""
-    # WHO/BIS standards for WQI calculation
-    standards = {
-        'ph': {'ideal': 7.0, 'max': 8.5, 'min': 6.5, 'weight': 0.15},
-        'tds_ppm': {'ideal': 0, 'max': 500, 'weight': 0.12},
-        'turbidity_ntu': {'ideal': 0, 'max': 5, 'weight': 0.10},
-        'dissolved_oxygen_mg_l': {'ideal': 14.6, 'min': 5, 'weight': 0.15},
-        'bod_mg_l': {'ideal': 0, 'max': 5, 'weight': 0.12},
-        'total_hardness_mg_l': {'ideal': 0, 'max': 300, 'weight': 0.08},
-        'chloride_mg_l': {'ideal': 0, 'max': 250, 'weight': 0.08},
-        'nitrate_mg_l': {'ideal': 0, 'max': 45, 'weight': 0.10},
-        'iron_mg_l': {'ideal': 0, 'max': 0.3, 'weight': 0.05},
-        'fluoride_mg_l': {'ideal': 0, 'max': 1.5, 'weight': 0.05}
-    }
+    standards = WQI_STANDARDS
 
     total_weight = 0
     weighted_sum = 0
@@ -240,20 +469,52 @@ def calculate_wqi(test_data):
         wqi = 50  # Default if no data
 
     # Classify WQI
-    if wqi >= 90:
-        wqi_class = 'Excellent'
-    elif wqi >= 70:
-        wqi_class = 'Good'
-    elif wqi >= 50:
-        wqi_class = 'Fair'
-    elif wqi >= 25:
-        wqi_class = 'Poor'
-    else:
-        wqi_class = 'Very Poor'
+    wqi_class = str(_classify_wqi(wqi))
 
     return round(wqi, 1), wqi_class
 
 
+def calculate_wqi_batch(params):
+    """Calculate Water Quality Index for many samples at once
+
+    Args:
+        params: DataFrame with one numeric column per parameter (our names);
+            NaN marks a missing value, which is skipped as in calculate_wqi
+
+    Returns:
+        Tuple of (wqi_scores, wqi_classes) arrays, one entry per row
+    """
+    n_samples = len(params)
+    weighted_sum = np.zeros(n_samples)
+    total_weight = np.zeros(n_samples)
+
+    for param, std in WQI_STANDARDS.items():
+        if param not in params.columns:
+            continue
+        value = params[param].to_numpy(dtype=np.float64)
+
+        if param == 'ph':
+            # pH deviation from ideal
+            max_deviation = max(std['max'] - std['ideal'], std['ideal'] - std['min'])
+            qi = np.maximum(0, 100 - (np.abs(value - std['ideal']) / max_deviation * 100))
+        elif param == 'dissolved_oxygen_mg_l':
+            # DO: higher is better
+            qi = np.minimum(100, (value / std['ideal']) * 100)
+        else:
+            # Other parameters: lower is better
+            qi = np.maximum(0, 100 - (value / std['max'] * 100))
+
+        present = ~np.isnan(value)
+        weighted_sum += np.where(present, qi * std['weight'], 0)
+        total_weight += np.where(present, std['weight'], 0)
+
+    # Default to 50 for samples with no data
+    wqi = np.divide(weighted_sum, total_weight, out=np.full(n_samples, 50.0), where=total_weight > 0)
+    wqi_classes = _classify_wqi(wqi)
+
+    return np.round(wqi, 1), wqi_classes
+
+
 def detect_contamination(test_data):
     """Detect contamination based on test parameters"""
     contamination_detected = False
@@ -308,46 +569,163 @@ def detect_contamination(test_data):
     return contamination_detected, contamination_type, severity
 
 
+def detect_contamination_batch(params):
+    """Detect contamination for many samples at once
+
+    Args:
+        params: DataFrame with one numeric column per parameter (our names);
+            missing values count as 0, as in detect_contamination
+
+    Returns:
+        Tuple of (contaminated, contamination_types, severities) arrays
+    """
+    def column(name):
+        if name not in params.columns:
+            return np.zeros(len(params))
+        return params[name].fillna(0).to_numpy(dtype=np.float64)
+
+    coliform, fecal = column('total_coliform_mpn'), column('fecal_coliform_mpn')
+    bod, cod, nitrate = column('bod_mg_l'), column('cod_mg_l'), column('nitrate_mg_l')
+    turbidity = column('turbidity_ntu')
+
+    bacterial = (coliform > 10) | (fecal > 0)
+    chemical = (bod > 5) | (cod > 10) | (nitrate > 45)
+    physical = turbidity > 10
+    contaminated = bacterial | chemical | physical
+
+    # More than one kind of contamination is reported as mixed
+    n_kinds = bacterial.astype(int) + chemical + physical
+    contamination_types = np.select(
+        [n_kinds >= 2, bacterial, chemical, physical],
+        ['mixed', 'bacterial', 'chemical', 'physical'],
+        default='none'
+    )
+
+    # Severity is the worst level any check reaches (index into SEVERITY_LEVELS)
+    bacterial_severity = np.select(
+        [(coliform > 100) | (fecal > 10), (coliform > 50) | (fecal > 5), bacterial],
+        [3, 2, 1], default=0
+    )
+    chemical_severity = np.select(
+        [(bod > 10) | (cod > 25) | (nitrate > 100), (bod > 7) | (cod > 15) | (nitrate > 60), chemical],
+        [3, 2, 1], default=0
+    )
+    physical_severity = np.where(turbidity > 50, 2, 0)
+    severity = np.maximum.reduce([bacterial_severity, chemical_severity, physical_severity])
+
+    return contaminated, contamination_types, SEVERITY_LEVELS[severity]
+
+
+def _station_params(station_data):
+    """Station parameter columns under our names, as floats (NaN where missing or unparseable)"""
+    params = station_data.reindex(columns=list(COLUMN_MAPPING)).rename(columns=COLUMN_MAPPING)
+    return params.apply(pd.to_numeric, errors='coerce')
+
+
+def _parse_sample_dates(dates, month_day='01'):
+    """Parse a Date column in one pass
+
+    'YYYY-MM' strings get the given day of the month; anything unparseable is NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    as_text = dates.astype(str)
+    month_only = as_text.str.fullmatch(r'\d{4}-\d{2}')
+    if month_only.any():
+        dates = dates.mask(month_only, as_text + '-' + month_day)
+    return pd.to_datetime(dates, format='mixed', errors='coerce')
+
+
+def prepare_samples(station_data):
+    """Build the per-sample dicts used by the rolling simulation
+
+    Args:
+        station_data: DataFrame with the station's data
+
+    Returns:
+        List of sample dicts with mapped parameters, WQI and contamination
+    """
+    params = _station_params(station_data)
+    wqi_scores, wqi_classes = calculate_wqi_batch(params)
+    contaminated, contamination_types, severities = detect_contamination_batch(params)
+
+    # Missing parameter values are None in the sample dicts
+    df = params.astype(object).where(params.notna(), None)
+    df.insert(0, 'date', station_data['Date'].to_numpy())
+    # Month used for seasonal patterns; samples without a usable date count as January
+    df.insert(1, 'month', _parse_sample_dates(station_data['Date']).dt.month.fillna(1).astype(int).tolist())
+    df['wqi_score'] = wqi_scores.tolist()
+    df['wqi_class'] = wqi_classes.tolist()
+    df['is_contaminated'] = contaminated.tolist()
+    df['contamination_type'] = contamination_types.tolist()
+    df['severity'] = severities.tolist()
+
+    return df.to_dict('records')
+
+
 class RealDataMLSimulator:
     """ML Simulator that uses patterns from real CPCB data"""
 
     def __init__(self, model_name, base_accuracy=0.75):
         self.model_name = model_name
         self.base_accuracy = base_accuracy
-        self.training_data = []
         self.current_accuracy = base_accuracy
-        self.learned_patterns = {}
+        self.learned_patterns = {'seasonal': {}}  # seasonal: season -> sample count
+
+        # Running training statistics, updated one sample at a time
+        self.n_samples = 0
+        self.param_stats = {}  # param -> [count, mean, sum of squared deviations]
 
     def train(self, training_samples):
-        """Train on real historical data"""
-        self.training_data = training_samples
-        n_samples = len(training_samples)
+        """Train on real historical data, replacing anything learned so far"""
+        self.n_samples = 0
+        self.learned_patterns = {'seasonal': {}}
+        self.param_stats = {}
+        for sample in training_samples:
+            self._add_sample(sample)
+        return self._update_accuracy()
+
+    def partial_fit(self, sample):
+        """Add one more sample to the training data without refitting the rest"""
+        self._add_sample(sample)
+        return self._update_accuracy()
+
+    def _add_sample(self, sample):
+        """Fold one sample into the running season counts and parameter stats"""
+        self.n_samples += 1
+
+        season = self._get_season(sample['month'])
+        seasonal = self.learned_patterns['seasonal']
+        seasonal[season] = seasonal.get(season, 0) + 1
+
+        # Welford's update of the running mean and variance
+        for param in ['ph', 'tds_ppm', 'turbidity_ntu', 'temperature_celsius']:
+            value = sample.get(param)
+            if value is not None:
+                stats = self.param_stats.setdefault(param, [0, 0.0, 0.0])
+                stats[0] += 1
+                delta = value - stats[1]
+                stats[1] += delta / stats[0]
+                stats[2] += delta * (value - stats[1])
+
+    def _update_accuracy(self):
+        """Recompute learned patterns and model accuracy from the running stats"""
+        n_samples = self.n_samples
 
         # Learn patterns from training data
         if n_samples > 10:
-            # Calculate seasonal averages
-            self.learned_patterns['seasonal'] = {}
-            for sample in training_samples:
-                month = sample['date'].month if hasattr(sample['date'], 'month') else 1
-                season = self._get_season(month)
-                if season not in self.learned_patterns['seasonal']:
-                    self.learned_patterns['seasonal'][season] = []
-                self.learned_patterns['seasonal'][season].append(sample)
-
-            # Calculate parameter trends
-            self.learned_patterns['param_means'] = {}
-            self.learned_patterns['param_stds'] = {}
-            for param in ['ph', 'tds_ppm', 'turbidity_ntu', 'temperature_celsius']:
-                values = [s.get(param) for s in training_samples if s.get(param) is not None]
-                if values:
-                    self.learned_patterns['param_means'][param] = np.mean(values)
-                    self.learned_patterns['param_stds'][param] = np.std(values)
+            self.learned_patterns['param_means'] = {
+                param: mean for param, (count, mean, m2) in self.param_stats.items()
+            }
+            self.learned_patterns['param_stds'] = {
+                param: math.sqrt(m2 / count) for param, (count, mean, m2) in self.param_stats.items()
+            }
 
         # Accuracy improves with more data (logarithmic)
-        data_bonus = min(0.15, 0.03 * np.log(max(1, n_samples / 20)))
+        data_bonus = min(0.15, 0.03 * math.log(max(1, n_samples / 20)))
 
         # Pattern learning bonus
-        pattern_bonus = 0.02 if len(self.learned_patterns.get('seasonal', {})) >= 3 else 0
+        pattern_bonus = 0.02 if n_samples > 10 and len(self.learned_patterns['seasonal']) >= 3 else 0
 
         self.current_accuracy = min(0.95, self.base_accuracy + data_bonus + pattern_bonus)
 
@@ -358,35 +736,23 @@ class RealDataMLSimulator:
         }
 
     def _get_season(self, month):
-        if month in [6, 7, 8, 9]:
-            return 'monsoon'
-        elif month in [10, 11]:
-            return 'post_monsoon'
-        elif month in [12, 1, 2]:
-            return 'winter'
-        return 'summer'
-
-    def predict_wqi(self, actual_wqi, actual_class):
-        """Predict WQI based on learned patterns"""
-        if random.random() < self.current_accuracy:
-            error = random.gauss(0, 3)
+        return MONTH_TO_SEASON.get(month, 'summer')
+
+    def predict_wqi(self, actual_wqi, actual_class, u, z):
+        """Predict WQI based on learned patterns
+
+        u and z are this sample's uniform [0, 1) and standard normal draws.
+        """
+        if u[0] < self.current_accuracy:
+            error = 3 * z[0]
             correct = True
         else:
-            error = random.gauss(0, 12)
+            error = 12 * z[0]
             correct = False
 
         predicted_wqi = max(0, min(100, actual_wqi + error))
 
-        if predicted_wqi >= 90:
-            predicted_class = 'Excellent'
-        elif predicted_wqi >= 70:
-            predicted_class = 'Good'
-        elif predicted_wqi >= 50:
-            predicted_class = 'Fair'
-        elif predicted_wqi >= 25:
-            predicted_class = 'Poor'
-        else:
-            predicted_class = 'Very Poor'
+        predicted_class = str(_classify_wqi(predicted_wqi))
 
         return {
             'predicted_wqi': round(predicted_wqi, 1),
@@ -395,16 +761,16 @@ class RealDataMLSimulator:
             'error': abs(actual_wqi - predicted_wqi)
         }
 
-    def predict_contamination(self, actual_contaminated, actual_type):
-        """Predict contamination"""
-        if random.random() < self.current_accuracy:
+    def predict_contamination(self, actual_contaminated, actual_type, u):
+        """Predict contamination; u is this sample's uniform [0, 1) draws"""
+        if u[0] < self.current_accuracy:
             predicted = actual_contaminated
             predicted_type = actual_type if actual_contaminated else 'none'
             correct = True
         else:
             predicted = not actual_contaminated
             if predicted and not actual_contaminated:
-                predicted_type = random.choice(['bacterial', 'chemical', 'physical'])
+                predicted_type = ['bacterial', 'chemical', 'physical'][int(u[1] * 3)]
             elif not predicted and actual_contaminated:
                 predicted_type = 'none'
             else:
@@ -415,36 +781,36 @@ class RealDataMLSimulator:
             'predicted': predicted,
             'predicted_type': predicted_type,
             'correct': correct,
-            'confidence': round(random.uniform(0.65, 0.95) if correct else random.uniform(0.45, 0.70), 3)
+            'confidence': round(_uniform(u[2], 0.65, 0.95) if correct else _uniform(u[2], 0.45, 0.70), 3)
         }
 
-    def predict_risk(self, wqi_score, is_contaminated, severity):
-        """Predict site risk level"""
-        # Determine actual risk
+    def predict_risk(self, wqi_score, is_contaminated, severity, u):
+        """Predict site risk level; u is this sample's uniform [0, 1) draws"""
+        # Determine actual risk as a position in RISK_LEVELS
         if severity == 'critical' or wqi_score < 25:
-            actual = 'critical'
+            level = 3
         elif severity == 'high' or wqi_score < 40:
-            actual = 'high'
+            level = 2
         elif is_contaminated or wqi_score < 60:
-            actual = 'medium'
+            level = 1
         else:
-            actual = 'low'
+            level = 0
+        actual = RISK_LEVELS[level]
 
-        if random.random() < self.current_accuracy:
+        if u[0] < self.current_accuracy:
             predicted = actual
             correct = True
         else:
-            risks = ['low', 'medium', 'high', 'critical']
-            idx = risks.index(actual)
-            new_idx = max(0, min(3, idx + random.choice([-1, 1])))
-            predicted = risks[new_idx]
+            # Off by one level, clamped to the ends of the scale
+            step = -1 if u[1] < 0.5 else 1
+            predicted = RISK_LEVELS[max(0, min(len(RISK_LEVELS) - 1, level + step))]
             correct = False
 
         return {
             'actual': actual,
             'predicted': predicted,
             'correct': correct,
-            'confidence': round(random.uniform(0.70, 0.95) if correct else random.uniform(0.50, 0.75), 3)
+            'confidence': round(_uniform(u[2], 0.70, 0.95) if correct else _uniform(u[2], 0.50, 0.75), 3)
         }
 
 
@@ -471,7 +837,7 @@ def dashboard():
 def get_stations():
     """Get available stations"""
     stations = get_available_stations()
-    return jsonify({
+    return orjsonify({
         'success': True,
         'stations': stations[:50]  # Top 50
     })
@@ -483,20 +849,21 @@ def get_station_data(station_name):
     station_data, station_info = load_cpcb_data(station_name)
 
     if station_data is None:
-        return jsonify({'success': False, 'error': station_info}), 400
+        return orjsonify({'success': False, 'error': station_info}), 400
 
-    # Get parameter statistics
+    # Get parameter statistics in one aggregate pass (NaN values are skipped)
+    param_cols = [c for c in COLUMN_MAPPING if c in station_data.columns]
+    stats = station_data[param_cols].apply(pd.to_numeric, errors='coerce').agg(['count', 'min', 'max', 'mean'])
     params = {}
-    for excel_col, our_col in COLUMN_MAPPING.items():
-        if excel_col in station_data.columns:
-            valid_data = station_data[station_data[excel_col].notna()][excel_col]
-            if len(valid_data) > 0:
-                params[our_col] = {
-                    'count': len(valid_data),
-                    'min': float(valid_data.min()),
-                    'max': float(valid_data.max()),
-                    'mean': float(valid_data.mean())
-                }
+    for excel_col in param_cols:
+        count = int(stats.at['count', excel_col])
+        if count > 0:
+            params[COLUMN_MAPPING[excel_col]] = {
+                'count': count,
+                'min': float(stats.at['min', excel_col]),
+                'max': float(stats.at['max', excel_col]),
+                'mean': float(stats.at['mean', excel_col])
+            }
 
     # Check if ML results exist for this station
     from app.models import Site, WaterSample
@@ -509,14 +876,22 @@ def get_station_data(station_name):
     site = Site.query.filter_by(site_name=station_name, is_active=True).first()
 
     if site:
-        # Check for existing ML predictions
-        ml_results_exist['site_risk'] = SiteRiskPrediction.query.filter_by(site_id=site.id).count() > 0
-        ml_results_exist['contamination'] = ContaminationPrediction.query.join(
-            WaterSample
-        ).filter(WaterSample.site_id == site.id).count() > 0
-        ml_results_exist['wqi'] = WQIReading.query.filter_by(site_id=site.id).count() > 0
-        ml_results_exist['forecast'] = WaterQualityForecast.query.filter_by(site_id=site.id).count() > 0
-        ml_results_exist['cost'] = CostOptimizationResult.query.filter_by(site_id=site.id).count() > 0
+        # Check for existing ML predictions in one round trip
+        ml_results_exist = dict(db.session.execute(db.select(
+            db.select(SiteRiskPrediction.id).where(
+                SiteRiskPrediction.site_id == site.id
+            ).exists().label('site_risk'),
+            db.select(ContaminationPrediction.id).join(WaterSample).where(
+                WaterSample.site_id == site.id
+            ).exists().label('contamination'),
+            db.select(WQIReading.id).where(WQIReading.site_id == site.id).exists().label('wqi'),
+            db.select(WaterQualityForecast.id).where(
+                WaterQualityForecast.site_id == site.id
+            ).exists().label('forecast'),
+            db.select(CostOptimizationResult.id).where(
+                CostOptimizationResult.site_id == site.id
+            ).exists().label('cost')
+        )).mappings().one())
     else:
         ml_results_exist = {
             'site_risk': False,
@@ -526,7 +901,7 @@ def get_station_data(station_name):
             'cost': False
         }
 
-    return jsonify({
+    return orjsonify({
         'success': True,
         'station': station_info,
         'samples': len(station_data),
@@ -539,54 +914,64 @@ def get_station_data(station_name):
     })
 
 
+def _station_data_version(station_name):
+    """
+    Get a value that changes whenever a station's data changes
+
+    Database sites use their sample count, latest sample id and latest sample
+    creation time (ids restart after a full reset, creation times do not);
+    CPCB stations use the modification time of the Parquet copy. None when
+    there is no Parquet copy either, so the run is not cached.
+    """
+    site = Site.query.filter_by(site_name=station_name, is_active=True).first()
+    if site:
+        return tuple(db.session.query(
+            db.func.count(WaterSample.id), db.func.max(WaterSample.id), db.func.max(WaterSample.created_at)
+        ).filter(WaterSample.site_id == site.id).one())
+    parquet_path = _cpcb_parquet_path()
+    if not os.path.exists(parquet_path):
+        return None
+    return os.path.getmtime(parquet_path)
+
+
 @rolling_poc_data_bp.route('/run/<model_name>', methods=['POST'])
 @login_required
 def run_rolling_model(model_name):
     """Run rolling ML model with real CPCB data"""
     try:
         station_name = request.json.get('station', CPCB_CONFIG['default_station'])
+        min_samples = CPCB_CONFIG['min_samples']
+
+        # Get model config
+        if model_name not in MODEL_CONFIGS:
+            return orjsonify({'success': False, 'error': f'Unknown model: {model_name}'}), 400
+
+        config = MODEL_CONFIGS[model_name]
+
+        # Identical reruns on unchanged station data return the earlier run
+        data_version = _station_data_version(station_name)
+        cache_key = (station_name, model_name, data_version) if data_version is not None else None
+        with _rolling_run_cache_lock:
+            cached_response = _rolling_run_cache.get(cache_key) if cache_key else None
+            if cached_response is not None:
+                _rolling_run_cache.move_to_end(cache_key)
+        if cached_response is not None:
+            return orjsonify(cached_response)
 
         # Load station data
         station_data, station_info = load_cpcb_data(station_name)
 
         if station_data is None:
-            return jsonify({'success': False, 'error': station_info}), 400
+            return orjsonify({'success': False, 'error': station_info}), 400
 
-        if len(station_data) < CPCB_CONFIG['min_samples']:
-            return jsonify({
+        if len(station_data) < min_samples:
+            return orjsonify({
                 'success': False,
-                'error': f'Insufficient data. Found {len(station_data)}, need {CPCB_CONFIG["min_samples"]}'
+                'error': f'Insufficient data. Found {len(station_data)}, need {min_samples}'
             }), 400
 
         # Prepare samples
-        samples = []
-        for idx, row in station_data.iterrows():
-            sample = {'date': row['Date']}
-
-            # Map parameters
-            for excel_col, our_col in COLUMN_MAPPING.items():
-                if excel_col in row.index and pd.notna(row[excel_col]):
-                    try:
-                        sample[our_col] = float(row[excel_col])
-                    except:
-                        sample[our_col] = None
-                else:
-                    sample[our_col] = None
-
-            # Calculate WQI
-            sample['wqi_score'], sample['wqi_class'] = calculate_wqi(sample)
-
-            # Detect contamination
-            sample['is_contaminated'], sample['contamination_type'], sample['severity'] = detect_contamination(sample)
-
-            samples.append(sample)
-
-        # Get model config
-        model_configs = get_model_configs()
-        if model_name not in model_configs:
-            return jsonify({'success': False, 'error': f'Unknown model: {model_name}'}), 400
-
-        config = model_configs[model_name]
+        samples = prepare_samples(station_data)
 
         # Initialize simulator
         simulator = RealDataMLSimulator(model_name, base_accuracy=config['base_accuracy'])
@@ -603,7 +988,7 @@ def run_rolling_model(model_name):
             samples
         )
 
-        return jsonify({
+        response = {
             'success': True,
             'model': model_name,
             'name': config['name'],
@@ -611,64 +996,88 @@ def run_rolling_model(model_name):
             'station': station_info,
             'results': results,
             'saved_to_db': save_result
-        })
+        }
+
+        # Keep the run unless saving it failed (stations without a site have nothing to save)
+        if cache_key and (save_result.get('saved') or find_site_for_station(station_name) is None):
+            with _rolling_run_cache_lock:
+                _rolling_run_cache[cache_key] = response
+                if len(_rolling_run_cache) > ROLLING_RUN_CACHE_SIZE:
+                    _rolling_run_cache.popitem(last=False)
+
+        return orjsonify(response)
 
     except Exception as e:
         import traceback
-        return jsonify({
+        return orjsonify({
             'success': False,
             'error': str(e),
             'traceback': traceback.format_exc()
         }), 500
 
 
-def run_rolling_prediction(model_name, simulator, samples, config, station_info):
-    """Execute rolling training and prediction on real data"""
+def run_rolling_prediction(model_name, simulator, samples, config, station_info, seed=None):
+    """Execute rolling training and prediction on real data
+
+    seed makes the simulated predictions reproducible when given.
+    """
     initial_months = CPCB_CONFIG['initial_training_months']
     total_samples = len(samples)
 
     # Calculate initial training size (approximately 24 months)
     initial_training = min(initial_months * 4, int(total_samples * 0.6))  # Assume ~4 samples/month
 
-    rolling_results = []
-    training_progression = []
+    # Draw all randomness for the run up front, one row per predicted sample
+    rng = np.random.default_rng(seed)
+    n_predictions = total_samples - initial_training
+    uniform_draws = rng.random((n_predictions, RANDOM_DRAWS_PER_SAMPLE)).tolist()
+    normal_draws = rng.standard_normal((n_predictions, RANDOM_DRAWS_PER_SAMPLE)).tolist()
+
+    # Both result lists have a known size, so fill them by index
+    rolling_results = [None] * n_predictions
+    training_progression = [None] * ((n_predictions + 3) // 4)
     correct_predictions = 0
     total_predictions = 0
 
+    # Fit on the initial training window; later samples are added one at a time
+    train_result = simulator.train(samples[:initial_training])
+
     # Process each sample from training cutoff onwards
-    for target_idx in range(initial_training, total_samples):
-        training_data = samples[:target_idx]
+    for i, target_idx in enumerate(range(initial_training, total_samples)):
         target_data = samples[target_idx]
 
-        # Retrain model
-        train_result = simulator.train(training_data)
+        # Retrain model with the previous target added
+        if target_idx > initial_training:
+            train_result = simulator.partial_fit(samples[target_idx - 1])
 
         # Make prediction based on model type
-        prediction_result = make_model_prediction(model_name, simulator, target_data)
+        prediction_result = make_model_prediction(
+            model_name, simulator, target_data, uniform_draws[i], normal_draws[i]
+        )
 
         total_predictions += 1
         if prediction_result.get('correct', False):
             correct_predictions += 1
 
         # Record training progression every 4 samples
-        if (target_idx - initial_training) % 4 == 0:
-            training_progression.append({
+        if i % 4 == 0:
+            training_progression[i // 4] = {
                 'sample': target_idx + 1,
                 'training_samples': train_result['samples_used'],
                 'model_accuracy': train_result['model_accuracy'],
                 'cumulative_accuracy': round(correct_predictions / total_predictions * 100, 1) if total_predictions > 0 else 0
-            })
+            }
 
         # Format date
         date_str = str(target_data['date'])
 
-        rolling_results.append({
+        rolling_results[i] = {
             'sample': target_idx + 1,
             'date': date_str,
             'training_samples': train_result['samples_used'],
             'model_accuracy_at_prediction': round(train_result['model_accuracy'] * 100, 1),
             **prediction_result
-        })
+        }
 
     # Calculate final metrics
     final_accuracy = correct_predictions / total_predictions * 100 if total_predictions > 0 else 0
@@ -690,21 +1099,26 @@ def run_rolling_prediction(model_name, simulator, samples, config, station_info)
     }
 
 
-def make_model_prediction(model_name, simulator, target_data):
-    """Make prediction based on model type"""
+def make_model_prediction(model_name, simulator, target_data, u, z):
+    """Make prediction based on model type
+
+    u and z are this sample's rows of uniform [0, 1) and standard normal draws.
+    """
 
     if model_name == 'site_risk':
         result = simulator.predict_risk(
             target_data['wqi_score'],
             target_data['is_contaminated'],
-            target_data['severity']
+            target_data['severity'],
+            u
         )
         return result
 
     elif model_name == 'contamination':
         result = simulator.predict_contamination(
             target_data['is_contaminated'],
-            target_data['contamination_type']
+            target_data['contamination_type'],
+            u
         )
         result['actual'] = target_data['is_contaminated']
         result['actual_type'] = target_data['contamination_type']
@@ -713,7 +1127,8 @@ def make_model_prediction(model_name, simulator, target_data):
     elif model_name == 'wqi':
         result = simulator.predict_wqi(
             target_data['wqi_score'],
-            target_data['wqi_class']
+            target_data['wqi_class'],
+            u, z
         )
         result['actual_wqi'] = target_data['wqi_score']
         result['actual_class'] = target_data['wqi_class']
@@ -732,12 +1147,12 @@ def make_model_prediction(model_name, simulator, target_data):
         predicted_params = {}
         errors = {}
 
-        for param, actual_val in actual_params.items():
+        for k, (param, actual_val) in enumerate(actual_params.items()):
             if actual_val is not None:
-                if random.random() < simulator.current_accuracy:
-                    predicted = actual_val + random.gauss(0, actual_val * 0.05)
+                if u[k] < simulator.current_accuracy:
+                    predicted = actual_val + z[k] * actual_val * 0.05
                 else:
-                    predicted = actual_val + random.gauss(0, actual_val * 0.15)
+                    predicted = actual_val + z[k] * actual_val * 0.15
 
                 predicted_params[param] = round(predicted, 2)
                 errors[param] = round(abs(actual_val - predicted) / max(actual_val, 0.1) * 100, 1)
@@ -771,37 +1186,37 @@ def make_model_prediction(model_name, simulator, target_data):
             risk_level = 'medium'
             recommendation = 'Reduced Testing'
             current_cost = 144000
-            if random.random() < simulator.current_accuracy:
+            if u[0] < simulator.current_accuracy:
                 optimized_cost = round(current_cost * 0.35)
-                detection_rate = random.uniform(95, 98)
+                detection_rate = _uniform(u[1], 95, 98)
                 correct = True
             else:
                 optimized_cost = round(current_cost * 0.5)
-                detection_rate = random.uniform(90, 94)
+                detection_rate = _uniform(u[1], 90, 94)
                 correct = False
         elif wqi >= 50:
             risk_level = 'high'
             recommendation = 'Standard Testing'
             current_cost = 312000
-            if random.random() < simulator.current_accuracy:
+            if u[0] < simulator.current_accuracy:
                 optimized_cost = round(current_cost * 0.70)
-                detection_rate = random.uniform(94, 97)
+                detection_rate = _uniform(u[1], 94, 97)
                 correct = True
             else:
                 optimized_cost = round(current_cost * 0.85)
-                detection_rate = random.uniform(88, 93)
+                detection_rate = _uniform(u[1], 88, 93)
                 correct = False
         else:
             risk_level = 'critical'
             recommendation = 'Intensive Testing'
             current_cost = 624000
-            if random.random() < simulator.current_accuracy:
+            if u[0] < simulator.current_accuracy:
                 optimized_cost = round(current_cost * 0.87)
-                detection_rate = random.uniform(96, 99)
+                detection_rate = _uniform(u[1], 96, 99)
                 correct = True
             else:
                 optimized_cost = round(current_cost * 0.95)
-                detection_rate = random.uniform(92, 96)
+                detection_rate = _uniform(u[1], 92, 96)
                 correct = False
 
         savings_percent = round((1 - optimized_cost / current_cost) * 100, 1) if current_cost > 0 else 0
@@ -819,14 +1234,20 @@ def make_model_prediction(model_name, simulator, target_data):
     return {'correct': False, 'error': 'Unknown model'}
 
 
+def _confusion_counts(actual, predicted):
+    """Count (tn, fp, fn, tp) for boolean actual/predicted arrays with one bincount"""
+    counts = np.bincount(actual.astype(np.intp) * 2 + predicted, minlength=4)
+    return tuple(int(c) for c in counts)
+
+
 def calculate_model_metrics(model_name, results, accuracy):
     """Calculate model-specific metrics"""
 
     if model_name == 'site_risk':
-        tp = sum(1 for r in results if r.get('actual') in ['high', 'critical'] and r.get('predicted') in ['high', 'critical'])
-        tn = sum(1 for r in results if r.get('actual') in ['low', 'medium'] and r.get('predicted') in ['low', 'medium'])
-        fp = sum(1 for r in results if r.get('actual') in ['low', 'medium'] and r.get('predicted') in ['high', 'critical'])
-        fn = sum(1 for r in results if r.get('actual') in ['high', 'critical'] and r.get('predicted') in ['low', 'medium'])
+        # High and critical count as positives
+        actual = np.fromiter((r.get('actual') in ('high', 'critical') for r in results), dtype=bool, count=len(results))
+        predicted = np.fromiter((r.get('predicted') in ('high', 'critical') for r in results), dtype=bool, count=len(results))
+        _, fp, fn, tp = _confusion_counts(actual, predicted)
 
         precision = tp / (tp + fp) if (tp + fp) > 0 else 0
         recall = tp / (tp + fn) if (tp + fn) > 0 else 0
@@ -839,10 +1260,9 @@ def calculate_model_metrics(model_name, results, accuracy):
         }
 
     elif model_name == 'contamination':
-        tp = sum(1 for r in results if r.get('actual') and r.get('predicted'))
-        tn = sum(1 for r in results if not r.get('actual') and not r.get('predicted'))
-        fp = sum(1 for r in results if not r.get('actual') and r.get('predicted'))
-        fn = sum(1 for r in results if r.get('actual') and not r.get('predicted'))
+        actual = np.fromiter((bool(r.get('actual')) for r in results), dtype=bool, count=len(results))
+        predicted = np.fromiter((bool(r.get('predicted')) for r in results), dtype=bool, count=len(results))
+        tn, fp, fn, tp = _confusion_counts(actual, predicted)
 
         precision = tp / (tp + fp) if (tp + fp) > 0 else 0
         recall = tp / (tp + fn) if (tp + fn) > 0 else 0
@@ -856,14 +1276,22 @@ def calculate_model_metrics(model_name, results, accuracy):
         }
 
     elif model_name == 'wqi':
-        errors = [r.get('error', 0) for r in results]
-        class_matches = sum(1 for r in results if r.get('class_match', False))
+        # One pass accumulating error sum, squared error sum and class matches
+        n = len(results)
+        error_sum = squared_sum = 0.0
+        class_matches = 0
+        for r in results:
+            error = r.get('error', 0) or 0
+            error_sum += error
+            squared_sum += error * error
+            if r.get('class_match'):
+                class_matches += 1
 
         return {
-            'accuracy': round(class_matches / len(results) * 100, 1) if results else 0,
-            'mae': round(np.mean(errors), 2),
-            'rmse': round(np.sqrt(np.mean(np.array(errors) ** 2)), 2),
-            'class_accuracy': round(class_matches / len(results) * 100, 1) if results else 0
+            'accuracy': round(class_matches / n * 100, 1) if n else 0,
+            'mae': round(error_sum / n, 2) if n else 0,
+            'rmse': round(math.sqrt(squared_sum / n), 2) if n else 0,
+            'class_accuracy': round(class_matches / n * 100, 1) if n else 0
         }
 
     elif model_name == 'forecast':
@@ -876,11 +1304,16 @@ def calculate_model_metrics(model_name, results, accuracy):
         }
 
     elif model_name == 'cost':
-        total_current = sum(r.get('current_cost', 0) for r in results)
-        total_optimized = sum(r.get('optimized_cost', 0) for r in results)
-        detection_rates = [r.get('detection_rate', 0) for r in results]
-        avg_detection = float(np.mean(detection_rates)) if detection_rates else 0
-        skip_test_samples = sum(1 for r in results if r.get('recommendation') == 'Skip Test')
+        # One pass accumulating costs, detection rates and skipped tests
+        total_current = total_optimized = detection_sum = 0
+        skip_test_samples = 0
+        for r in results:
+            total_current += r.get('current_cost', 0)
+            total_optimized += r.get('optimized_cost', 0)
+            detection_sum += r.get('detection_rate', 0)
+            if r.get('recommendation') == 'Skip Test':
+                skip_test_samples += 1
+        avg_detection = detection_sum / len(results) if results else 0
 
         return {
             'accuracy': round(avg_detection, 1),
@@ -897,88 +1330,68 @@ def calculate_model_metrics(model_name, results, accuracy):
 
 def get_model_configs():
     """Get model configurations"""
-    return {
-        'site_risk': {
-            'name': 'Site Risk Classifier',
-            'algorithm': 'Rolling Random Forest (Real Data)',
-            'base_accuracy': 0.78,
-            'icon': 'shield-exclamation',
-            'color': 'danger'
-        },
-        'contamination': {
-            'name': 'Contamination Detector',
-            'algorithm': 'Rolling XGBoost (Real Data)',
-            'base_accuracy': 0.75,
-            'icon': 'virus',
-            'color': 'warning'
-        },
-        'wqi': {
-            'name': 'WQI Predictor',
-            'algorithm': 'Rolling Gradient Boosting (Real Data)',
-            'base_accuracy': 0.72,
-            'icon': 'speedometer2',
-            'color': 'info'
-        },
-        'forecast': {
-            'name': 'Quality Forecaster',
-            'algorithm': 'Rolling LSTM (Real Data)',
-            'base_accuracy': 0.70,
-            'icon': 'graph-up-arrow',
-            'color': 'success'
-        },
-        'cost': {
-            'name': 'Cost Optimizer',
-            'algorithm': 'Rolling Bayesian Opt (Real Data)',
-            'base_accuracy': 0.80,
-            'icon': 'currency-rupee',
-            'color': 'primary'
-        }
-    }
+    return MODEL_CONFIGS
 
 
-def run_all_models_for_station(station_name, station_data):
-    """Run all ML models for a station after data import
+# Models run for every imported station
+MODELS_TO_RUN = ['site_risk', 'contamination', 'wqi', 'forecast', 'cost']
 
-    Args:
-        station_name: Name of the CPCB station
-        station_data: DataFrame with the station's data
 
-    Returns:
-        Dict with results for each model
+def _simulate_model(model_name, samples, station_info):
+    """Run one model's rolling simulation; safe to call in a worker process"""
+    config = MODEL_CONFIGS[model_name]
+    simulator = RealDataMLSimulator(model_name, base_accuracy=config['base_accuracy'])
+    return run_rolling_prediction(model_name, simulator, samples, config, station_info)
+
+
+def _get_simulation_pool():
+    """The worker's shared process pool for model simulations, sized by SIMULATION_POOL_WORKERS
+
+    Its processes come from a forkserver rather than being forked from this
+    multithreaded worker, so they never inherit a lock another thread holds.
+    A pool found broken is dropped by _discard_simulation_pool() and a new
+    one is created on the next call.
     """
-    results = {
-        'station': station_name,
-        'models_run': [],
-        'errors': []
-    }
+    global _simulation_pool
+    with _simulation_pool_lock:
+        if _simulation_pool is None:
+            _simulation_pool = ProcessPoolExecutor(
+                max_workers=current_app.config['SIMULATION_POOL_WORKERS'],
+                mp_context=multiprocessing.get_context('forkserver')
+            )
+        return _simulation_pool
 
-    try:
-        # Prepare samples from station data
-        samples = []
-        for idx, row in station_data.iterrows():
-            sample = {'date': row['Date']}
-
-            # Map parameters
-            for excel_col, our_col in COLUMN_MAPPING.items():
-                if excel_col in row.index and pd.notna(row[excel_col]):
-                    try:
-                        sample[our_col] = float(row[excel_col])
-                    except:
-                        sample[our_col] = None
-                else:
-                    sample[our_col] = None
 
-            # Calculate WQI
-            sample['wqi_score'], sample['wqi_class'] = calculate_wqi(sample)
+def _discard_simulation_pool(pool):
+    """Drop pool, left broken by a crashed process, so the next caller gets a new one"""
+    global _simulation_pool
+    with _simulation_pool_lock:
+        if _simulation_pool is pool:
+            _simulation_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
 
-            # Detect contamination
-            sample['is_contaminated'], sample['contamination_type'], sample['severity'] = detect_contamination(sample)
+def _submit_station_models(station_name, station_data):
+    """Queue all models' rolling simulations for a station on the shared simulation pool
 
-            samples.append(sample)
+    Returns the station's run: its results dict (with any setup error
+    recorded), prepared samples and a {model_name: future} map, for
+    _save_station_models() to collect. A pool that turns out broken on
+    submit is replaced and the station submitted again.
+    """
+    run = {
+        'results': {'station': station_name, 'models_run': [], 'errors': []},
+        'samples': [],
+        'futures': {}
+    }
+
+    try:
+        # Prepare samples from station data
+        samples = prepare_samples(station_data)
 
         if len(samples) < CPCB_CONFIG['min_samples']:
-            results['errors'].append(f'Insufficient samples: {len(samples)}')
-            return results
+            run['results']['errors'].append(f'Insufficient samples: {len(samples)}')
+            return run
 
         # Get station info
         state = station_data['State Name '].iloc[0] if 'State Name ' in station_data.columns else 'Unknown'
@@ -988,46 +1401,82 @@ def run_all_models_for_station(station_name, station_data):
             'samples': len(samples)
         }
 
-        # Run all 5 models
-        model_configs = get_model_configs()
-        models_to_run = ['site_risk', 'contamination', 'wqi', 'forecast', 'cost']
-
-        for model_name in models_to_run:
+        run['samples'] = samples
+        for attempt in range(2):
+            executor = _get_simulation_pool()
             try:
-                config = model_configs[model_name]
-                simulator = RealDataMLSimulator(model_name, base_accuracy=config['base_accuracy'])
-
-                # Run rolling predictions
-                model_results = run_rolling_prediction(model_name, simulator, samples, config, station_info)
-
-                # Save results to database
-                save_result = save_model_results_to_db(
-                    model_name,
-                    station_name,
-                    model_results,
-                    model_results.get('metrics', {}),
-                    samples
-                )
+                run['futures'] = {
+                    model_name: executor.submit(_simulate_model, model_name, samples, station_info)
+                    for model_name in MODELS_TO_RUN
+                }
+                break
+            except BrokenProcessPool:
+                _discard_simulation_pool(executor)
+                if attempt:
+                    raise
+        run['executor'] = executor
+    except Exception as e:
+        run['results']['errors'].append(f'Overall error: {str(e)}')
 
-                results['models_run'].append({
-                    'model': model_name,
-                    'success': True,
-                    'saved': save_result.get('saved', False)
-                })
-            except Exception as e:
-                results['errors'].append(f'{model_name}: {str(e)}')
-                results['models_run'].append({
-                    'model': model_name,
-                    'success': False,
-                    'error': str(e)
-                })
+    return run
 
-        return results
 
-    except Exception as e:
-        results['errors'].append(f'Overall error: {str(e)}')
+def _save_station_models(run, site=None):
+    """Wait for a station's queued simulations and save each model's results"""
+    results = run['results']
+    if not run['futures']:
         return results
 
+    # Look up the site once for all models' results
+    if site is None:
+        site = find_site_for_station(results['station'])
+
+    for model_name, future in run['futures'].items():
+        try:
+            try:
+                model_results = future.result()
+            except BrokenProcessPool:
+                # A worker process died; later runs get a fresh pool
+                _discard_simulation_pool(run['executor'])
+                raise
+
+            # Save results to database
+            save_result = save_model_results_to_db(
+                model_name,
+                results['station'],
+                model_results,
+                model_results.get('metrics', {}),
+                run['samples'],
+                site=site
+            )
+
+            results['models_run'].append({
+                'model': model_name,
+                'success': True,
+                'saved': save_result.get('saved', False)
+            })
+        except Exception as e:
+            results['errors'].append(f'{model_name}: {str(e)}')
+            results['models_run'].append({
+                'model': model_name,
+                'success': False,
+                'error': str(e)
+            })
+
+    return results
+
+
+# Parameters checked for anomalies after import (Excel column -> DB field)
+ANOMALY_PARAMS = {
+    'pH': 'ph',
+    'Total Dissolved Solids (mg/L)': 'tds_ppm',
+    'Turbidity (NTU)': 'turbidity_ntu',
+    'Temperature': 'temperature_celsius',
+    'Iron (mg/L)': 'iron_mg_l',
+    'Total Coliforms (MPN/100 ml)': 'total_coliform_mpn',
+    'Chloride (mg/L)': 'chloride_mg_l'
+}
+
 
 def run_anomaly_detection_for_station(station_name, station_data, site_id):
     """Run anomaly detection on imported data by calculating historical statistics
@@ -1048,97 +1497,63 @@ def run_anomaly_detection_for_station(station_name, station_data, site_id):
         'errors': []
     }
 
-    # Parameters to check for anomalies (Excel column -> DB field)
-    ANOMALY_PARAMS = {
-        'pH': 'ph',
-        'Total Dissolved Solids (mg/L)': 'tds_ppm',
-        'Turbidity (NTU)': 'turbidity_ntu',
-        'Temperature': 'temperature_celsius',
-        'Iron (mg/L)': 'iron_mg_l',
-        'Total Coliforms (MPN/100 ml)': 'total_coliform_mpn',
-        'Chloride (mg/L)': 'chloride_mg_l'
-    }
-
     try:
-        # Calculate historical statistics for each parameter
-        historical_stats = {}
-        for excel_col, db_field in ANOMALY_PARAMS.items():
-            if excel_col in station_data.columns:
-                values = pd.to_numeric(station_data[excel_col], errors='coerce').dropna()
-                if len(values) >= 10:  # Need minimum samples for meaningful stats
-                    historical_stats[db_field] = {
-                        'mean': float(values.mean()),
-                        'std': float(values.std()) if values.std() > 0 else 1.0,
-                        'excel_col': excel_col
-                    }
-                    results['parameters_analyzed'] += 1
-
-        if not historical_stats:
+        # Calculate historical statistics for all parameters at once
+        excel_cols = [c for c in ANOMALY_PARAMS if c in station_data.columns]
+        numeric = station_data[excel_cols].apply(pd.to_numeric, errors='coerce')
+        # Need minimum samples for meaningful stats
+        analyzed = numeric.count() >= 10
+        numeric = numeric.loc[:, analyzed]
+        results['parameters_analyzed'] = numeric.shape[1]
+
+        if numeric.shape[1] == 0:
             results['errors'].append('Insufficient data for anomaly detection')
             return results
 
-        # Check each sample for anomalies
-        anomalies_created = 0
-        for idx, row in station_data.iterrows():
-            # Parse date for timestamp
-            date_val = row.get('Date')
-            if pd.isna(date_val):
-                continue
-
-            if isinstance(date_val, str):
-                try:
-                    if len(date_val) == 7:
-                        sample_date = datetime.strptime(date_val + '-15', '%Y-%m-%d')
-                    else:
-                        sample_date = pd.to_datetime(date_val)
-                except:
-                    sample_date = datetime.utcnow()
-            else:
-                sample_date = pd.to_datetime(date_val)
-
-            # Check each parameter
-            for db_field, stats in historical_stats.items():
-                excel_col = stats['excel_col']
-                value = row.get(excel_col)
-
-                if pd.isna(value):
-                    continue
-
-                try:
-                    value = float(value)
-                except:
-                    continue
-
-                mean = stats['mean']
-                std = stats['std']
-
-                # Calculate deviation in standard deviations
-                deviation = abs(value - mean) / std if std > 0 else 0
-
-                # Flag as anomaly if > 3 standard deviations
-                if deviation > 3:
-                    anomaly_type = 'spike' if value > mean else 'drop'
-                    anomaly_score = min(1.0, deviation / 5)  # Normalize to 0-1
-
-                    anomaly = AnomalyDetection(
-                        site_id=site_id,
-                        detection_timestamp=sample_date,
-                        is_anomaly=True,
-                        anomaly_type=anomaly_type,
-                        anomaly_score=round(anomaly_score, 3),
-                        cusum_value=round(deviation, 3),
-                        parameter=db_field,
-                        observed_value=round(value, 3),
-                        expected_value=round(mean, 3),
-                        deviation_sigma=round(deviation, 2),
-                        detection_method='zscore_historical',
-                        model_version='anomaly_batch_v1'
-                    )
-                    db.session.add(anomaly)
-                    anomalies_created += 1
-
+        db_fields = [ANOMALY_PARAMS[c] for c in numeric.columns]
+        means = numeric.mean().to_numpy()
+        stds = numeric.std().to_numpy()
+        stds[~(stds > 0)] = 1.0
+
+        # Parse sample dates once; samples without a date are skipped and
+        # unparseable dates are timestamped now
+        raw_dates = station_data['Date']
+        has_date = raw_dates.notna().to_numpy()
+        sample_dates = _parse_sample_dates(raw_dates, '15').fillna(
+            pd.Timestamp(datetime.utcnow())
+        ).dt.to_pydatetime()
+
+        # Flag samples deviating more than 3 standard deviations: one
+        # (samples x parameters) deviation matrix, then only flagged cells are visited
+        values = numeric.to_numpy(dtype=float)
+        deviations = np.abs(values - means) / stds
+        anomalies = []
+        for i, j in zip(*np.nonzero((deviations > 3) & has_date[:, None])):
+            value = float(values[i, j])
+            deviation = float(deviations[i, j])
+            mean = float(means[j])
+
+            anomaly_type = 'spike' if value > mean else 'drop'
+            anomaly_score = min(1.0, deviation / 5)  # Normalize to 0-1
+
+            anomalies.append(AnomalyDetection(
+                site_id=site_id,
+                detection_timestamp=sample_dates[i],
+                is_anomaly=True,
+                anomaly_type=anomaly_type,
+                anomaly_score=round(anomaly_score, 3),
+                cusum_value=round(deviation, 3),
+                parameter=db_fields[j],
+                observed_value=round(value, 3),
+                expected_value=round(mean, 3),
+                deviation_sigma=round(deviation, 2),
+                detection_method='zscore_historical',
+                model_version='anomaly_batch_v1'
+            ))
+
+        db.session.bulk_save_objects(anomalies)
         db.session.commit()
-        results['anomalies_detected'] = anomalies_created
+        results['anomalies_detected'] = len(anomalies)
 
         return results
 
@@ -1147,6 +1562,49 @@ def run_anomaly_detection_for_station(station_name, station_data, site_id):
         return results
 
 
+def run_station_analysis(stations):
+    """Run the ML models and anomaly detection for imported stations
+
+    stations is a list of (station_name, site_id, station_data). Returns the
+    ml_analysis and anomaly_detection summaries the import responses carry.
+    """
+    ml_results = []
+    anomaly_results = []
+
+    # Queue every station's simulations on the shared pool up front so stations
+    # run side by side across its processes; results are saved here in order,
+    # where the database session lives
+    runs = [_submit_station_models(station_name, station_data)
+            for station_name, _, station_data in stations]
+
+    for (station_name, site_id, station_data), run in zip(stations, runs):
+        ml_result = _save_station_models(run, db.session.get(Site, site_id))
+        ml_results.append({
+            'station': station_name,
+            'models_run': len([m for m in ml_result['models_run'] if m['success']]),
+            'errors': len(ml_result['errors'])
+        })
+
+        anomaly_result = run_anomaly_detection_for_station(station_name, station_data, site_id)
+        anomaly_results.append({
+            'station': station_name,
+            'anomalies_found': anomaly_result.get('anomalies_detected', 0),
+            'parameters_checked': anomaly_result.get('parameters_analyzed', 0)
+        })
+
+    return {
+        'ml_analysis': {
+            'stations_analyzed': len(ml_results),
+            'results': ml_results
+        },
+        'anomaly_detection': {
+            'stations_analyzed': len(anomaly_results),
+            'total_anomalies': sum(r['anomalies_found'] for r in anomaly_results),
+            'results': anomaly_results
+        }
+    }
+
+
 def find_site_for_station(station_name):
     """Find or create Site record for CPCB station"""
     # Try to find existing CPCB site
@@ -1160,9 +1618,13 @@ def find_site_for_station(station_name):
     return site
 
 
-def save_model_results_to_db(model_name, station_name, results, metrics, samples):
-    """Save ML model results to database tables"""
-    site = find_site_for_station(station_name)
+def save_model_results_to_db(model_name, station_name, results, metrics, samples, site=None):
+    """Save ML model results to database tables
+
+    site is the station's Site record; it is looked up by name when not given.
+    """
+    if site is None:
+        site = find_site_for_station(station_name)
 
     if not site:
         return {'saved': False, 'error': f'Site not found for station: {station_name}'}
@@ -1206,11 +1668,12 @@ def save_model_results_to_db(model_name, station_name, results, metrics, samples
             # Save WQI readings (last 10)
             WQIReading.query.filter_by(site_id=site.id).delete()
 
+            readings = []
             for pred in predictions[-10:]:
                 wqi_score = pred.get('predicted_wqi', 50)
                 wqi_class = pred.get('predicted_class', 'Fair')
 
-                reading = WQIReading(
+                readings.append(WQIReading(
                     site_id=site.id,
                     reading_timestamp=datetime.utcnow(),
                     wqi_score=wqi_score,
@@ -1219,9 +1682,10 @@ def save_model_results_to_db(model_name, station_name, results, metrics, samples
                     ph_penalty=pred.get('error', 0) * 0.1,
                     tds_penalty=pred.get('error', 0) * 0.15,
                     turbidity_penalty=pred.get('error', 0) * 0.1
-                )
-                db.session.add(reading)
-                saved_count += 1
+                ))
+
+            db.session.bulk_save_objects(readings)
+            saved_count = len(readings)
 
         elif model_name == 'contamination':
             # Save contamination predictions (linked to samples if available)
@@ -1237,18 +1701,20 @@ def save_model_results_to_db(model_name, station_name, results, metrics, samples
                     ContaminationPrediction.sample_id.in_(sample_ids)
                 ).delete(synchronize_session=False)
 
+            contamination_predictions = []
             for i, pred in enumerate(predictions[-10:]):
                 sample = site_samples[i] if i < len(site_samples) else None
 
-                cp = ContaminationPrediction(
+                contamination_predictions.append(ContaminationPrediction(
                     sample_id=sample.id if sample else None,
                     predicted_type=pred.get('predicted_type', 'none'),
                     confidence=pred.get('confidence', 0.75),
                     model_version='rolling_xgb_v1',
                     f1_score=metrics.get('f1_score', 82) / 100
-                )
-                db.session.add(cp)
-                saved_count += 1
+                ))
+
+            db.session.bulk_save_objects(contamination_predictions)
+            saved_count = len(contamination_predictions)
 
         elif model_name == 'cost':
             # Save cost optimization result
@@ -1279,13 +1745,14 @@ def save_model_results_to_db(model_name, station_name, results, metrics, samples
             WaterQualityForecast.query.filter_by(site_id=site.id).delete()
 
             # Create forecasts for next 30 days
+            forecasts = []
             for i, pred in enumerate(predictions[-5:]):
                 actual_params = pred.get('actual', {})
                 predicted_params = pred.get('predicted', {})
 
                 for param, value in predicted_params.items():
                     if value is not None:
-                        forecast = WaterQualityForecast(
+                        forecasts.append(WaterQualityForecast(
                             site_id=site.id,
                             forecast_date=(datetime.utcnow() + timedelta(days=i * 7)).date(),
                             parameter=param,
@@ -1295,9 +1762,10 @@ def save_model_results_to_db(model_name, station_name, results, metrics, samples
                             uncertainty=value * 0.1,
                             model_version='rolling_lstm_v1',
                             r2_score=metrics.get('accuracy', 85) / 100
-                        )
-                        db.session.add(forecast)
-                        saved_count += 1
+                        ))
+
+            db.session.bulk_save_objects(forecasts)
+            saved_count = len(forecasts)
 
         db.session.commit()
         return {'saved': True, 'count': saved_count, 'site_id': site.id, 'site_name': site.site_name}
@@ -1307,10 +1775,15 @@ def save_model_results_to_db(model_name, station_name, results, metrics, samples
         return {'saved': False, 'error': str(e)}
 
 
+# Characters dropped from station names, and runs collapsed to one dash, by slugify
+_SLUG_STRIP = re.compile(r'[^\w\s-]')
+_SLUG_DASH = re.compile(r'[-\s]+')
+
+
 def slugify(name):
     """Convert station name to site_code format"""
-    slug = re.sub(r'[^\w\s-]', '', name)
-    slug = re.sub(r'[-\s]+', '-', slug).strip('-')
+    slug = _SLUG_STRIP.sub('', name)
+    slug = _SLUG_DASH.sub('-', slug).strip('-')
     return slug.upper()[:20]
 
 
@@ -1329,17 +1802,230 @@ def clean_import_value(val):
     return float(val) if val is not None else None
 
 
-# Import column mapping (Excel → TestResult fields)
-IMPORT_COLUMN_MAPPING = {
-    'Temperature': 'temperature_celsius',
-    'Total Dissolved Solids (mg/L)': 'tds_ppm',
-    'Electrical Conductivity Field': 'conductivity_us_cm',
-    'pH': 'ph',
-    'Turbidity (NTU)': 'turbidity_ntu',
-    'Total Alkalinity (mg/L)': 'total_alkalinity_mg_l',
-    'Chloride (mg/L)': 'chloride_mg_l',
-    'Total Hardness (mg/L)': 'total_hardness_mg_l',
-    'Calcium (mg/L)': 'calcium_hardness_mg_l',
+def clean_import_column(series):
+    """clean_import_value over a whole column: floats, NaN where the value is missing or invalid"""
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.strip()
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+
+
+def _analysis_kwargs(analysis_result):
+    """Analysis column values from a ContaminationAnalyzer result"""
+    return {
+        'is_contaminated': analysis_result['is_contaminated'],
+        'contamination_type': analysis_result['contamination_type_key'],
+        'severity_level': analysis_result['severity_level'],
+        'confidence_score': analysis_result['confidence_score'],
+        'wqi_score': analysis_result['wqi_score'],
+        'wqi_class': analysis_result['wqi_class'],
+        'runoff_sediment_score': analysis_result['runoff_sediment_score'],
+        'sewage_ingress_score': analysis_result['sewage_ingress_score'],
+        'salt_intrusion_score': analysis_result['salt_intrusion_score'],
+        'pipe_corrosion_score': analysis_result['pipe_corrosion_score'],
+        'disinfectant_decay_score': analysis_result['disinfectant_decay_score'],
+        'is_compliant_who': analysis_result['is_compliant_who'],
+        'is_compliant_bis': analysis_result['is_compliant_bis'],
+        'who_violations': analysis_result.get('who_violations', '[]'),
+        'bis_violations': analysis_result.get('bis_violations', '[]'),
+        'primary_recommendation': analysis_result['primary_recommendation'],
+        'estimated_treatment_cost_inr': analysis_result['estimated_treatment_cost_inr'],
+        'analysis_method': 'rule_based'
+    }
+
+
+def _insert_analyses(pending):
+    """Flush pending samples and test results, then insert their Analysis rows in one statement
+
+    pending holds (sample, test_result, analysis kwargs) tuples and is emptied.
+    The Analysis rows bypass the unit of work, so nothing else in the request
+    should expect them in the identity map.
+    """
+    if not pending:
+        return
+    db.session.flush()
+    db.session.bulk_insert_mappings(Analysis, [
+        {**analysis_kwargs, 'sample_id': sample.id, 'test_result_id': test_result.id}
+        for sample, test_result, analysis_kwargs in pending
+    ])
+    pending.clear()
+
+
+def _commit_import():
+    """Commit imported rows without waiting for the WAL flush
+
+    synchronous_commit is switched off for this transaction only. A crash can
+    lose the last few commits but never half-writes them, and re-running an
+    import skips samples that are already present.
+    """
+    db.session.execute(db.text('SET LOCAL synchronous_commit = off'))
+    db.session.commit()
+
+
+@contextmanager
+def _station_import():
+    """Write one station's rows inside a savepoint, then commit them
+
+    A failure rolls back to the savepoint and re-raises, so only that
+    station's rows are lost and the caller can go on to the next station.
+    """
+    with db.session.begin_nested():
+        yield
+    _commit_import()
+
+
+def _apply_site_risks(ml_pipeline, pending, record_prediction=True):
+    """Predict risk for all imported sites in one call and store it on each site
+
+    pending holds a (site, features) pair per imported station. With
+    record_prediction a SiteRiskPrediction is saved and the site's testing
+    schedule updated as well. Returns each site's risk level, in order.
+
+    If the batch call fails, sites are predicted one at a time, so a site
+    whose prediction fails only keeps its previous risk level.
+    """
+    try:
+        risk_results = ml_pipeline.predict_site_risks_batch([features for _, features in pending])
+    except Exception:
+        current_app.logger.exception('Batch site risk prediction failed; predicting sites one at a time')
+        risk_results = []
+        for site, features in pending:
+            try:
+                risk_results.append(ml_pipeline.predict_site_risk(features))
+            except Exception:
+                current_app.logger.exception(f'Site risk prediction failed for site {site.id}')
+                risk_results.append(None)
+
+    try:
+        now = datetime.utcnow()
+        predictions = []
+        for (site, _), risk_result in zip(pending, risk_results):
+            if risk_result is None:
+                continue
+            site.current_risk_level = risk_result['risk_level']
+            site.risk_score = risk_result['risk_score']
+            if record_prediction:
+                predictions.append(SiteRiskPrediction(
+                    site=site,
+                    risk_level=risk_result['risk_level'],
+                    risk_score=risk_result['risk_score'],
+                    confidence=risk_result['confidence'],
+                    recommended_frequency=risk_result['recommended_frequency'],
+                    tests_per_year=risk_result['tests_per_year'],
+                    model_version='rule_based_v1'
+                ))
+                site.last_risk_assessment = now
+                site.testing_frequency = risk_result['recommended_frequency']
+                site.last_tested = now
+
+        risk_levels = [site.current_risk_level for site, _ in pending]
+        db.session.add_all(predictions)
+        db.session.commit()
+        return risk_levels
+    except Exception:
+        current_app.logger.exception('Saving site risk predictions failed')
+        db.session.rollback()
+        return [site.current_risk_level for site, _ in pending]
+
+
+def _first_present(row, columns, default):
+    """First non-missing value of row among columns, stripped, or default when none has one"""
+    for col in columns:
+        if pd.notna(row[col]):
+            return str(row[col]).strip()
+    return default
+
+
+def _build_sample_ids(prefix, parsed_dates, date_format):
+    """Sample ids for a station's rows as '<prefix><date>-<row number>', None where the date is NaT
+
+    Built with pandas string operations over the whole column rather than per row.
+    """
+    row_numbers = pd.Series(np.arange(1, len(parsed_dates) + 1), index=parsed_dates.index)
+    sample_ids = prefix + parsed_dates.dt.strftime(date_format) + '-' + row_numbers.astype(str).str.zfill(3)
+    return sample_ids.to_numpy(dtype=object, na_value=None)
+
+
+def _existing_sample_ids(sample_ids):
+    """Those of sample_ids already present in water_samples, fetched in one query"""
+    if not sample_ids:
+        return set()
+    return set(db.session.execute(
+        db.select(WaterSample.sample_id).where(WaterSample.sample_id.in_(sample_ids))
+    ).scalars())
+
+
+def _reserve_ids(model, count):
+    """Take count primary keys from model's id sequence, so rows can reference each other before insert"""
+    if count == 0:
+        return []
+    return db.session.execute(
+        db.text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+        {'table': model.__tablename__, 'count': count}
+    ).scalars().all()
+
+
+def _copy_insert(model, rows):
+    """Insert row dicts into model's table with one PostgreSQL COPY
+
+    Runs on the session's connection, so the rows commit or roll back with
+    the session. Columns a row leaves out get the model's Python-side default.
+    """
+    if not rows:
+        return
+
+    present = set().union(*rows)
+    columns = []
+    defaults = {}
+    for column in model.__table__.columns:
+        default = column.default
+        if default is not None and default.is_scalar:
+            defaults[column.name] = default.arg
+        elif default is not None and default.is_callable:
+            defaults[column.name] = default.arg(None)
+        if column.name in present or column.name in defaults:
+            columns.append(column.name)
+
+    # Unquoted empty CSV fields load as NULL
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row.get(name, defaults.get(name)) for name in columns])
+    buffer.seek(0)
+
+    column_list = ', '.join(f'"{name}"' for name in columns)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {model.__tablename__} ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _import_columns(station_data, mapping):
+    """Mapped columns present in station_data, cleaned once per column
+
+    Returns (db_field, values) pairs where values is a float array aligned
+    with the frame's rows and NaN marks a missing or invalid reading.
+    """
+    return [(db_field, clean_import_column(station_data[excel_col]))
+            for excel_col, db_field in mapping.items() if excel_col in station_data.columns]
+
+
+# Samples committed together while importing a station, bounding the ORM objects held in memory
+IMPORT_COMMIT_BATCH_SIZE = 500
+
+# Import column mapping (Excel → TestResult fields)
+IMPORT_COLUMN_MAPPING = {
+    'Temperature': 'temperature_celsius',
+    'Total Dissolved Solids (mg/L)': 'tds_ppm',
+    'Electrical Conductivity Field': 'conductivity_us_cm',
+    'pH': 'ph',
+    'Turbidity (NTU)': 'turbidity_ntu',
+    'Total Alkalinity (mg/L)': 'total_alkalinity_mg_l',
+    'Chloride (mg/L)': 'chloride_mg_l',
+    'Total Hardness (mg/L)': 'total_hardness_mg_l',
+    'Calcium (mg/L)': 'calcium_hardness_mg_l',
     'Magnesium (mg/L)': 'magnesium_hardness_mg_l',
     'Dissolved Oxygen (mg/L)': 'dissolved_oxygen_mg_l',
     'Biochemical Oxygen Demand (mg/L)': 'bod_mg_l',
@@ -1356,6 +2042,7 @@ IMPORT_COLUMN_MAPPING = {
 @login_required
 def upload_and_import():
     """Upload Excel file and import all qualifying stations"""
+    import shutil
     import tempfile
     import os
 
@@ -1375,34 +2062,44 @@ def upload_and_import():
         temp_path = os.path.join(temp_dir, 'cpcb_data.xlsx')
         file.save(temp_path)
 
-        # Load Excel data
-        df = pd.read_excel(temp_path, header=5)
-
-        # Get qualifying stations
-        qualifying_stations = []
-        for station_name, group in df.groupby('Station Name'):
-            if len(group) >= min_samples:
-                qualifying_stations.append({
-                    'name': station_name,
-                    'samples': len(group),
-                    'state': group['State Name '].iloc[0] if 'State Name ' in group.columns else 'Unknown'
-                })
+        # Parse the workbook once into its Parquet copy; later loads of the
+        # uploaded stations read that copy instead of the workbook
+        df = pd.read_parquet(_cpcb_parquet_path(temp_path), engine='pyarrow')
 
-        # Sort by sample count
-        qualifying_stations.sort(key=lambda x: x['samples'], reverse=True)
+        # Get qualifying stations from the group sizes, largest first
+        grouped = df.groupby('Station Name')
+        sizes = grouped.size()
+        sizes = sizes[sizes >= min_samples].sort_values(ascending=False, kind='mergesort')
 
         # Limit stations based on max_stations (0 = all)
         if max_stations > 0:
-            qualifying_stations = qualifying_stations[:max_stations]
+            sizes = sizes.iloc[:max_stations]
+
+        # Each station's state is taken from its first row
+        states = (df.drop_duplicates('Station Name').set_index('Station Name')['State Name ']
+                  if 'State Name ' in df.columns else None)
+        qualifying_stations = [
+            {
+                'name': station_name,
+                'samples': int(sample_count),
+                'state': states[station_name] if states is not None else 'Unknown'
+            }
+            for station_name, sample_count in sizes.items()
+        ]
 
         if not qualifying_stations:
-            os.remove(temp_path)
-            os.rmdir(temp_dir)
+            shutil.rmtree(temp_dir, ignore_errors=True)
             return jsonify({
                 'success': False,
                 'error': f'No stations found with {min_samples}+ samples'
             }), 400
 
+        # Only the qualifying stations' frames are needed from here on
+        station_groups = {s['name']: grouped.get_group(s['name']) for s in qualifying_stations}
+        # Site category column, resolved once for all stations
+        category_col = next((col for col in SITE_CATEGORY_COLUMNS if col in df.columns), None)
+        del df, grouped
+
         # Store the temp path in config for subsequent operations
         CPCB_CONFIG['excel_path'] = temp_path
         CPCB_CONFIG['temp_dir'] = temp_dir
@@ -1410,43 +2107,46 @@ def upload_and_import():
         # Import all qualifying stations
         analyst = User.query.filter_by(id=current_user.id).first()
         analyzer = ContaminationAnalyzer()
-        ml_pipeline = MLPipeline()
+        ml_pipeline = get_ml_pipeline()
 
         imported_stations = []
+        risk_pending = []
+        failed_stations = []
         total_samples = 0
         total_analyses = 0
 
+        # Load the stations' existing Site records in one query
+        site_codes = {s['name']: f"CPCB-{slugify(s['name'])}-001" for s in qualifying_stations}
+        sites_by_code = {
+            site.site_code: site
+            for site in Site.query.filter(Site.site_code.in_(list(site_codes.values()))).all()
+        }
+
         for station_info in qualifying_stations:
             station_name = station_info['name']
-            station_data = df[df['Station Name'] == station_name].copy()
-            station_data = station_data.sort_values('Date')
+            station_data = station_groups[station_name]
 
             # Create or get Site record
-            site_code = f"CPCB-{slugify(station_name)}-001"
-            site = Site.query.filter_by(site_code=site_code).first()
+            site_code = site_codes[station_name]
+            site = sites_by_code.get(site_code)
 
             if not site:
-                lat = clean_import_value(station_data.iloc[0].get('Latitude'))
-                lng = clean_import_value(station_data.iloc[0].get('Longitude'))
+                first_row = station_data.iloc[0]
+                lat = clean_import_value(first_row.get('Latitude'))
+                lng = clean_import_value(first_row.get('Longitude'))
 
-                state = station_data.iloc[0].get('State Name ')
+                state = first_row.get('State Name ')
                 if pd.isna(state):
-                    state = station_data.iloc[0].get('State Name', 'Unknown')
+                    state = first_row.get('State Name', 'Unknown')
                 state = str(state).strip() if pd.notna(state) else 'Unknown'
 
-                district = station_data.iloc[0].get('District Name')
+                district = first_row.get('District Name')
                 district = str(district).strip() if pd.notna(district) else 'Unknown'
 
                 # Detect site_category from Excel (default to 'public' if not present)
                 site_category = 'public'
-                site_category_col = None
-                for col_name in ['site_category', 'Site Category', 'Site_Category', 'Category']:
-                    if col_name in station_data.columns:
-                        site_category_col = col_name
-                        break
-
-                if site_category_col:
-                    cat_value = station_data.iloc[0].get(site_category_col)
+                if category_col:
+                    cat_value = first_row[category_col]
                     if pd.notna(cat_value):
                         cat_str = str(cat_value).strip().lower()
                         if cat_str in ['residential', 'res', 'home', 'household']:
@@ -1476,173 +2176,103 @@ def upload_and_import():
             samples_imported = 0
             analyses_created = 0
             contaminated_count = 0
+            pending_analyses = []
 
-            for sample_num, (idx, row) in enumerate(station_data.iterrows(), 1):
-                date_val = row.get('Date')
-                if pd.isna(date_val):
-                    continue
+            # Collection dates parsed in one pass (NaT where missing or unparseable)
+            # and mapped columns present in this station's data, cleaned per column
+            parsed_dates = _parse_sample_dates(station_data['Date'])
+            collection_dates = parsed_dates.dt.date.to_numpy()
+            import_columns = _import_columns(station_data, IMPORT_COLUMN_MAPPING)
 
-                # Parse date
-                if isinstance(date_val, str):
-                    try:
-                        if len(date_val) == 7:
-                            collection_date = datetime.strptime(date_val + '-01', '%Y-%m-%d').date()
-                        else:
-                            collection_date = datetime.strptime(date_val, '%Y-%m-%d').date()
-                    except ValueError:
-                        try:
-                            collection_date = pd.to_datetime(date_val).date()
-                        except:
-                            continue
-                else:
-                    try:
-                        collection_date = pd.to_datetime(date_val).date()
-                    except:
-                        continue
-
-                sample_id = f"CPCB-{site.site_code[-8:]}-{collection_date.strftime('%Y%m')}-{sample_num:03d}"
-
-                existing = WaterSample.query.filter_by(sample_id=sample_id).first()
-                if existing:
-                    continue
+            # Candidate sample ids, checked against the database in one query
+            sample_prefix = f"CPCB-{site.site_code[-8:]}-"
+            sample_ids = _build_sample_ids(sample_prefix, parsed_dates, '%Y%m')
+            existing_ids = _existing_sample_ids([sid for sid in sample_ids if sid])
 
-                sample = WaterSample(
-                    sample_id=sample_id,
-                    site_id=site.id,
-                    collection_date=collection_date,
-                    collected_by_id=analyst.id,
-                    source_point='center',
-                    weather_condition='sunny',
-                    status='analyzed'
-                )
-                db.session.add(sample)
-                db.session.flush()
-
-                test_kwargs = {
-                    'sample_id': sample.id,
-                    'tested_by_id': analyst.id,
-                    'tested_date': datetime.combine(collection_date, datetime.min.time()),
-                    'lab_name': 'CPCB Monitoring'
-                }
-
-                for excel_col, db_field in IMPORT_COLUMN_MAPPING.items():
-                    if excel_col in row.index:
-                        value = clean_import_value(row[excel_col])
-                        if value is not None:
-                            test_kwargs[db_field] = value
-
-                test_result = TestResult(**test_kwargs)
-                db.session.add(test_result)
-                db.session.flush()
-                samples_imported += 1
+            # Each station's rows go in under a savepoint, so a failing station
+            # only loses its own rows; analyses are still flushed in batches
+            try:
+                with _station_import():
+                    for i, (collection_date, sample_id) in enumerate(zip(collection_dates, sample_ids)):
+                        if sample_id is None or sample_id in existing_ids:
+                            continue
 
-                try:
-                    analysis_result = analyzer.analyze(test_result, sample, site)
-                    analysis = Analysis(
-                        sample_id=sample.id,
-                        test_result_id=test_result.id,
-                        is_contaminated=analysis_result['is_contaminated'],
-                        contamination_type=analysis_result['contamination_type_key'],
-                        severity_level=analysis_result['severity_level'],
-                        confidence_score=analysis_result['confidence_score'],
-                        wqi_score=analysis_result['wqi_score'],
-                        wqi_class=analysis_result['wqi_class'],
-                        runoff_sediment_score=analysis_result['runoff_sediment_score'],
-                        sewage_ingress_score=analysis_result['sewage_ingress_score'],
-                        salt_intrusion_score=analysis_result['salt_intrusion_score'],
-                        pipe_corrosion_score=analysis_result['pipe_corrosion_score'],
-                        disinfectant_decay_score=analysis_result['disinfectant_decay_score'],
-                        is_compliant_who=analysis_result['is_compliant_who'],
-                        is_compliant_bis=analysis_result['is_compliant_bis'],
-                        who_violations=analysis_result.get('who_violations', '[]'),
-                        bis_violations=analysis_result.get('bis_violations', '[]'),
-                        primary_recommendation=analysis_result['primary_recommendation'],
-                        estimated_treatment_cost_inr=analysis_result['estimated_treatment_cost_inr'],
-                        analysis_method='rule_based'
-                    )
-                    db.session.add(analysis)
-                    analyses_created += 1
-                    if analysis.is_contaminated:
-                        contaminated_count += 1
-                except Exception:
-                    pass
+                        sample = WaterSample(
+                            sample_id=sample_id,
+                            site_id=site.id,
+                            collection_date=collection_date,
+                            collected_by_id=analyst.id,
+                            source_point='center',
+                            weather_condition='sunny',
+                            status='analyzed'
+                        )
+                        db.session.add(sample)
 
-            db.session.commit()
+                        # Rows are linked through relationships, so ids are only needed at flush time
+                        test_kwargs = {
+                            'sample': sample,
+                            'tested_by_id': analyst.id,
+                            'tested_date': datetime.combine(collection_date, datetime.min.time()),
+                            'lab_name': 'CPCB Monitoring'
+                        }
 
-            # Update site risk
-            try:
-                contamination_rate = (contaminated_count / analyses_created * 100) if analyses_created > 0 else 0
-                features = {
-                    'site_type': site.site_type or 'river',
-                    'is_coastal': site.is_coastal or False,
-                    'is_industrial_nearby': site.is_industrial_nearby or False,
-                    'is_agricultural_nearby': site.is_agricultural_nearby or True,
-                    'is_urban': site.is_urban or False,
-                    'population_served': site.population_served or 5000,
-                    'contamination_rate_30d': contamination_rate,
-                    'days_since_last_test': 0
-                }
-                risk_result = ml_pipeline.predict_site_risk(features)
+                        for db_field, values in import_columns:
+                            if not np.isnan(values[i]):
+                                test_kwargs[db_field] = float(values[i])
 
-                prediction = SiteRiskPrediction(
-                    site_id=site.id,
-                    risk_level=risk_result['risk_level'],
-                    risk_score=risk_result['risk_score'],
-                    confidence=risk_result['confidence'],
-                    recommended_frequency=risk_result['recommended_frequency'],
-                    tests_per_year=risk_result['tests_per_year'],
-                    model_version='rule_based_v1'
-                )
-                db.session.add(prediction)
+                        test_result = TestResult(**test_kwargs)
+                        db.session.add(test_result)
+                        samples_imported += 1
 
-                site.current_risk_level = risk_result['risk_level']
-                site.risk_score = risk_result['risk_score']
-                site.last_risk_assessment = datetime.utcnow()
-                site.testing_frequency = risk_result['recommended_frequency']
-                site.last_tested = datetime.utcnow()
+                        try:
+                            analysis_result = analyzer.analyze(test_result, sample, site)
+                            pending_analyses.append((sample, test_result, _analysis_kwargs(analysis_result)))
+                            analyses_created += 1
+                            if analysis_result['is_contaminated']:
+                                contaminated_count += 1
+                        except Exception:
+                            pass
+
+                        if samples_imported % IMPORT_COMMIT_BATCH_SIZE == 0:
+                            _insert_analyses(pending_analyses)
+
+                    _insert_analyses(pending_analyses)
+            except Exception as e:
+                db.session.commit()  # keep the site record
+                failed_stations.append({'name': station_name, 'error': str(e)})
+                continue
 
-                db.session.commit()
-            except Exception:
-                pass
+            # Site risk features; all sites are scored together after the loop
+            contamination_rate = (contaminated_count / analyses_created * 100) if analyses_created > 0 else 0
+            risk_pending.append((site, {
+                'site_type': site.site_type or 'river',
+                'is_coastal': site.is_coastal or False,
+                'is_industrial_nearby': site.is_industrial_nearby or False,
+                'is_agricultural_nearby': site.is_agricultural_nearby or True,
+                'is_urban': site.is_urban or False,
+                'population_served': site.population_served or 5000,
+                'contamination_rate_30d': contamination_rate,
+                'days_since_last_test': 0
+            }))
 
             imported_stations.append({
                 'name': station_name,
                 'site_id': site.id,
                 'samples': samples_imported,
-                'analyses': analyses_created,
-                'risk_level': site.current_risk_level or 'medium'
+                'analyses': analyses_created
             })
             total_samples += samples_imported
             total_analyses += analyses_created
 
-        # Run all ML models for each imported station
-        ml_analysis_results = []
-        for station_info in qualifying_stations:
-            station_name = station_info['name']
-            station_data = df[df['Station Name'] == station_name].copy()
-            station_data = station_data.sort_values('Date')
-
-            ml_result = run_all_models_for_station(station_name, station_data)
-            ml_analysis_results.append({
-                'station': station_name,
-                'models_run': len([m for m in ml_result['models_run'] if m['success']]),
-                'errors': len(ml_result['errors'])
-            })
+        # Update site risk
+        for station, risk_level in zip(imported_stations, _apply_site_risks(ml_pipeline, risk_pending)):
+            station['risk_level'] = risk_level or 'medium'
 
-        # Run anomaly detection for each imported station
-        anomaly_results = []
-        for station_info in imported_stations:
-            station_name = station_info['name']
-            site_id = station_info['site_id']
-            station_data = df[df['Station Name'] == station_name].copy()
-            station_data = station_data.sort_values('Date')
-
-            anomaly_result = run_anomaly_detection_for_station(station_name, station_data, site_id)
-            anomaly_results.append({
-                'station': station_name,
-                'anomalies_found': anomaly_result.get('anomalies_detected', 0),
-                'parameters_checked': anomaly_result.get('parameters_analyzed', 0)
-            })
+        # Run all ML models and anomaly detection for each imported station
+        analysis = run_station_analysis([
+            (station['name'], station['site_id'], station_groups[station['name']])
+            for station in imported_stations
+        ])
 
         return jsonify({
             'success': True,
@@ -1650,15 +2280,8 @@ def upload_and_import():
             'total_samples': total_samples,
             'total_analyses': total_analyses,
             'stations': imported_stations,
-            'ml_analysis': {
-                'stations_analyzed': len(ml_analysis_results),
-                'results': ml_analysis_results
-            },
-            'anomaly_detection': {
-                'stations_analyzed': len(anomaly_results),
-                'total_anomalies': sum(r['anomalies_found'] for r in anomaly_results),
-                'results': anomaly_results
-            }
+            'failed_stations': failed_stations,
+            **analysis
         })
 
     except Exception as e:
@@ -1680,9 +2303,6 @@ def upload_residential_data():
     - Sets site_category based on Excel column if present
     - Defaults to 'residential' if site_category column is missing or empty
     """
-    import tempfile
-    import os
-
     # Check admin access
     if not current_user.is_admin():
         return jsonify({'success': False, 'error': 'Admin access required'}), 403
@@ -1698,25 +2318,21 @@ def upload_residential_data():
         min_samples = int(request.form.get('min_samples', 40))
         max_stations = int(request.form.get('max_stations', 0))  # 0 = all stations
 
-        # Save uploaded file temporarily
-        temp_dir = tempfile.mkdtemp()
-        temp_path = os.path.join(temp_dir, 'residential_data.xlsx')
-        file.save(temp_path)
-
-        # Try loading with different header positions
+        # Parse the uploaded sheet once, straight from memory, then find the
+        # header row among the known positions
         df = None
+        try:
+            raw = pd.read_excel(io.BytesIO(file.read()), header=None)
+        except Exception:
+            raw = pd.DataFrame()
         for header_row in [0, 5]:  # Try row 0 first (residential format), then row 5 (CPCB format)
-            try:
-                test_df = pd.read_excel(temp_path, header=header_row)
-                if 'Station Name' in test_df.columns or 'Site Name' in test_df.columns:
-                    df = test_df
-                    break
-            except:
-                continue
+            if header_row < len(raw) and raw.iloc[header_row].isin(['Station Name', 'Site Name']).any():
+                df = raw.iloc[header_row + 1:].reset_index(drop=True)
+                df.columns = raw.iloc[header_row].tolist()
+                df = df.infer_objects()
+                break
 
         if df is None:
-            os.remove(temp_path)
-            os.rmdir(temp_dir)
             return jsonify({
                 'success': False,
                 'error': 'Could not parse Excel file. Ensure it has Station Name or Site Name column.'
@@ -1726,63 +2342,74 @@ def upload_residential_data():
         if 'Site Name' in df.columns and 'Station Name' not in df.columns:
             df['Station Name'] = df['Site Name']
 
-        # Get qualifying stations
-        qualifying_stations = []
-        for station_name, group in df.groupby('Station Name'):
-            if len(group) >= min_samples:
-                # Detect state column
-                state = 'Unknown'
-                for col in ['State Name ', 'State Name', 'State']:
-                    if col in group.columns:
-                        state = group[col].iloc[0] if pd.notna(group[col].iloc[0]) else 'Unknown'
-                        break
-                qualifying_stations.append({
-                    'name': station_name,
-                    'samples': len(group),
-                    'state': state
-                })
+        # Sort once; each station's rows stay in date order
+        df = df.sort_values('Date', kind='mergesort')
 
-        # Sort by sample count
-        qualifying_stations.sort(key=lambda x: x['samples'], reverse=True)
+        # Get qualifying stations from the group sizes, largest first
+        grouped = df.groupby('Station Name')
+        sizes = grouped.size()
+        sizes = sizes[sizes >= min_samples].sort_values(ascending=False, kind='mergesort')
 
         # Limit stations based on max_stations (0 = all)
         if max_stations > 0:
-            qualifying_stations = qualifying_stations[:max_stations]
+            sizes = sizes.iloc[:max_stations]
+
+        # Detect state column; each station's state is taken from its first row
+        state_col = next((col for col in STATE_COLUMNS if col in df.columns), None)
+        states = df.drop_duplicates('Station Name').set_index('Station Name')[state_col] if state_col else None
+        qualifying_stations = [
+            {
+                'name': station_name,
+                'samples': int(sample_count),
+                'state': states[station_name] if states is not None and pd.notna(states[station_name]) else 'Unknown'
+            }
+            for station_name, sample_count in sizes.items()
+        ]
 
         if not qualifying_stations:
-            os.remove(temp_path)
-            os.rmdir(temp_dir)
             return jsonify({
                 'success': False,
                 'error': f'No stations found with {min_samples}+ samples'
             }), 400
 
+        # Only the qualifying stations' frames are needed from here on
+        station_groups = {s['name']: grouped.get_group(s['name']) for s in qualifying_stations}
+
         # Import all qualifying stations
         analyst = User.query.filter_by(id=current_user.id).first()
         analyzer = ContaminationAnalyzer()
-        ml_pipeline = MLPipeline()
+        ml_pipeline = get_ml_pipeline()
 
         imported_stations = []
+        risk_pending = []
+        failed_stations = []
         total_samples = 0
         total_analyses = 0
         residential_count = 0
         public_count = 0
 
+        # Load the stations' existing Site records in one query
+        site_codes = {s['name']: f"RES-{slugify(s['name'])}-001" for s in qualifying_stations}
+        sites_by_code = {
+            site.site_code: site
+            for site in Site.query.filter(Site.site_code.in_(list(site_codes.values()))).all()
+        }
+
+        # Metadata columns present in this workbook, resolved once for all stations
+        category_col = next((col for col in SITE_CATEGORY_COLUMNS if col in df.columns), None)
+        state_cols = [col for col in STATE_COLUMNS if col in df.columns]
+        district_cols = [col for col in DISTRICT_COLUMNS if col in df.columns]
+        site_type_cols = [col for col in SITE_TYPE_COLUMNS if col in df.columns]
+
         for station_info in qualifying_stations:
             station_name = station_info['name']
-            station_data = df[df['Station Name'] == station_name].copy()
-            station_data = station_data.sort_values('Date')
+            station_data = station_groups[station_name]
+            first_row = station_data.iloc[0]
 
             # Detect site_category from Excel - default to 'residential' for this endpoint
             site_category = 'residential'
-            site_category_col = None
-            for col_name in ['site_category', 'Site Category', 'Site_Category', 'Category']:
-                if col_name in station_data.columns:
-                    site_category_col = col_name
-                    break
-
-            if site_category_col:
-                cat_value = station_data.iloc[0].get(site_category_col)
+            if category_col:
+                cat_value = first_row[category_col]
                 if pd.notna(cat_value):
                     cat_str = str(cat_value).strip().lower()
                     if cat_str in ['public', 'pub', 'government', 'govt']:
@@ -1794,40 +2421,16 @@ def upload_residential_data():
                 public_count += 1
 
             # Create site code
-            site_code = f"RES-{slugify(station_name)}-001"
-            site = Site.query.filter_by(site_code=site_code).first()
+            site_code = site_codes[station_name]
+            site = sites_by_code.get(site_code)
 
             if not site:
                 # Get coordinates and metadata
-                lat = clean_import_value(station_data.iloc[0].get('Latitude'))
-                lng = clean_import_value(station_data.iloc[0].get('Longitude'))
-
-                # Detect state column
-                state = 'Unknown'
-                for col in ['State Name ', 'State Name', 'State']:
-                    if col in station_data.columns:
-                        val = station_data.iloc[0].get(col)
-                        if pd.notna(val):
-                            state = str(val).strip()
-                            break
-
-                # Detect district column
-                district = 'Unknown'
-                for col in ['District Name', 'District']:
-                    if col in station_data.columns:
-                        val = station_data.iloc[0].get(col)
-                        if pd.notna(val):
-                            district = str(val).strip()
-                            break
-
-                # Detect site type
-                site_type = 'tank'
-                for col in ['Site Type', 'site_type', 'Type']:
-                    if col in station_data.columns:
-                        val = station_data.iloc[0].get(col)
-                        if pd.notna(val):
-                            site_type = str(val).strip().lower()
-                            break
+                lat = clean_import_value(first_row.get('Latitude'))
+                lng = clean_import_value(first_row.get('Longitude'))
+                state = _first_present(first_row, state_cols, 'Unknown')
+                district = _first_present(first_row, district_cols, 'Unknown')
+                site_type = _first_present(first_row, site_type_cols, 'tank').lower()
 
                 site = Site(
                     site_code=site_code,
@@ -1849,157 +2452,123 @@ def upload_residential_data():
                 db.session.add(site)
                 db.session.flush()
 
-            # Import samples
+            # Import samples; rows are collected here and written with COPY below
             samples_imported = 0
             analyses_created = 0
             contaminated_count = 0
+            sample_rows = []
+            test_rows = []
+            analysis_rows = []
 
-            for sample_num, (idx, row) in enumerate(station_data.iterrows(), 1):
-                date_val = row.get('Date')
-                if pd.isna(date_val):
-                    continue
-
-                # Parse date
-                if isinstance(date_val, str):
-                    try:
-                        if len(date_val) == 7:
-                            collection_date = datetime.strptime(date_val + '-01', '%Y-%m-%d').date()
-                        else:
-                            collection_date = datetime.strptime(date_val, '%Y-%m-%d').date()
-                    except ValueError:
-                        try:
-                            collection_date = pd.to_datetime(date_val).date()
-                        except:
-                            continue
-                else:
-                    try:
-                        collection_date = pd.to_datetime(date_val).date()
-                    except:
-                        continue
+            # Try both CPCB and Residential column mappings
+            import_columns = _import_columns(
+                station_data, {**IMPORT_COLUMN_MAPPING, **RESIDENTIAL_COLUMN_MAPPING}
+            )
+            # Collection dates parsed in one pass (NaT where missing or unparseable)
+            parsed_dates = _parse_sample_dates(station_data['Date'])
+            collection_dates = parsed_dates.dt.date.to_numpy()
 
-                sample_id = f"RES-{site.site_code[-8:]}-{collection_date.strftime('%Y%m%d')}-{sample_num:03d}"
+            # Candidate sample ids, checked against the database in one query
+            sample_prefix = f"RES-{site.site_code[-8:]}-"
+            sample_ids = _build_sample_ids(sample_prefix, parsed_dates, '%Y%m%d')
+            existing_ids = _existing_sample_ids([sid for sid in sample_ids if sid])
 
-                existing = WaterSample.query.filter_by(sample_id=sample_id).first()
-                if existing:
+            for i, (collection_date, sample_id) in enumerate(zip(collection_dates, sample_ids)):
+                if sample_id is None or sample_id in existing_ids:
                     continue
 
-                sample = WaterSample(
-                    sample_id=sample_id,
-                    site_id=site.id,
-                    collection_date=collection_date,
-                    collected_by_id=analyst.id,
-                    source_point='tank',
-                    weather_condition='sunny',
-                    status='analyzed'
-                )
-                db.session.add(sample)
-                db.session.flush()
+                sample_kwargs = {
+                    'sample_id': sample_id,
+                    'site_id': site.id,
+                    'collection_date': collection_date,
+                    'collected_by_id': analyst.id,
+                    'source_point': 'tank',
+                    'weather_condition': 'sunny',
+                    'status': 'analyzed'
+                }
 
                 # Build test result using column mappings
                 test_kwargs = {
-                    'sample_id': sample.id,
                     'tested_by_id': analyst.id,
                     'tested_date': datetime.combine(collection_date, datetime.min.time()),
                     'lab_name': 'Residential Monitoring'
                 }
 
-                # Try both CPCB and Residential column mappings
-                combined_mapping = {**IMPORT_COLUMN_MAPPING, **RESIDENTIAL_COLUMN_MAPPING}
-                for excel_col, db_field in combined_mapping.items():
-                    if excel_col in row.index:
-                        value = clean_import_value(row[excel_col])
-                        if value is not None:
-                            test_kwargs[db_field] = value
+                for db_field, values in import_columns:
+                    if not np.isnan(values[i]):
+                        test_kwargs[db_field] = float(values[i])
 
-                test_result = TestResult(**test_kwargs)
-                db.session.add(test_result)
-                db.session.flush()
+                sample_rows.append(sample_kwargs)
+                test_rows.append(test_kwargs)
                 samples_imported += 1
 
-                # Run analysis
-                try:
-                    analysis_result = analyzer.analyze(test_result, sample, site)
-                    analysis = Analysis(
-                        sample_id=sample.id,
-                        test_result_id=test_result.id,
-                        is_contaminated=analysis_result['is_contaminated'],
-                        contamination_type=analysis_result['contamination_type_key'],
-                        severity_level=analysis_result['severity_level'],
-                        confidence_score=analysis_result['confidence_score'],
-                        wqi_score=analysis_result['wqi_score'],
-                        wqi_class=analysis_result['wqi_class'],
-                        runoff_sediment_score=analysis_result['runoff_sediment_score'],
-                        sewage_ingress_score=analysis_result['sewage_ingress_score'],
-                        salt_intrusion_score=analysis_result['salt_intrusion_score'],
-                        pipe_corrosion_score=analysis_result['pipe_corrosion_score'],
-                        disinfectant_decay_score=analysis_result['disinfectant_decay_score'],
-                        is_compliant_who=analysis_result['is_compliant_who'],
-                        is_compliant_bis=analysis_result['is_compliant_bis'],
-                        who_violations=analysis_result.get('who_violations', '[]'),
-                        bis_violations=analysis_result.get('bis_violations', '[]'),
-                        primary_recommendation=analysis_result['primary_recommendation'],
-                        estimated_treatment_cost_inr=analysis_result['estimated_treatment_cost_inr'],
-                        analysis_method='rule_based'
-                    )
-                    db.session.add(analysis)
-                    analyses_created += 1
-                    if analysis.is_contaminated:
-                        contaminated_count += 1
-                except Exception:
-                    pass
-
-            db.session.commit()
+            # Rule-based analysis for every imported row at once
+            if test_rows:
+                results_df = analyzer.analyze_batch(pd.DataFrame(test_rows), site, pd.DataFrame(sample_rows))
+                analysis_rows = list(enumerate(map(_analysis_kwargs, results_df.to_dict('records'))))
+                analyses_created = len(analysis_rows)
+                contaminated_count = int(results_df['is_contaminated'].sum())
 
-            # Update site risk
+            # Reserve ids so child rows can point at their parents, then COPY each table
             try:
-                contamination_rate = (contaminated_count / analyses_created * 100) if analyses_created > 0 else 0
-                features = {
-                    'site_type': site.site_type or 'tank',
-                    'is_coastal': site.is_coastal or False,
-                    'is_industrial_nearby': site.is_industrial_nearby or False,
-                    'is_agricultural_nearby': site.is_agricultural_nearby or False,
-                    'is_urban': site.is_urban or True,
-                    'contamination_rate_30d': contamination_rate,
-                    'days_since_last_test': 0
-                }
-                risk_result = ml_pipeline.predict_site_risk(features)
-                site.current_risk_level = risk_result['risk_level']
-                site.risk_score = risk_result['risk_score']
-                db.session.commit()
-            except Exception:
-                pass
+                with _station_import():
+                    sample_ids = _reserve_ids(WaterSample, len(sample_rows))
+                    test_ids = _reserve_ids(TestResult, len(test_rows))
+                    for sample_row, test_row, sample_pk, test_pk in zip(sample_rows, test_rows, sample_ids, test_ids):
+                        sample_row['id'] = sample_pk
+                        test_row['id'] = test_pk
+                        test_row['sample_id'] = sample_pk
+                    for row_index, analysis_row in analysis_rows:
+                        analysis_row['sample_id'] = sample_ids[row_index]
+                        analysis_row['test_result_id'] = test_ids[row_index]
+
+                    _copy_insert(WaterSample, sample_rows)
+                    _copy_insert(TestResult, test_rows)
+                    _copy_insert(Analysis, [row for _, row in analysis_rows])
+            except Exception as e:
+                db.session.commit()  # keep the site record
+                failed_stations.append({'name': station_name, 'error': str(e)})
+                continue
+
+            # Site risk features; all sites are scored together after the loop
+            contamination_rate = (contaminated_count / analyses_created * 100) if analyses_created > 0 else 0
+            risk_pending.append((site, {
+                'site_type': site.site_type or 'tank',
+                'is_coastal': site.is_coastal or False,
+                'is_industrial_nearby': site.is_industrial_nearby or False,
+                'is_agricultural_nearby': site.is_agricultural_nearby or False,
+                'is_urban': site.is_urban or True,
+                'contamination_rate_30d': contamination_rate,
+                'days_since_last_test': 0
+            }))
 
             total_samples += samples_imported
             total_analyses += analyses_created
 
             imported_stations.append({
                 'name': station_name,
+                'site_id': site.id,
                 'site_code': site_code,
                 'site_category': site_category,
                 'samples': samples_imported,
                 'analyses': analyses_created,
-                'contaminated': contaminated_count,
-                'risk_level': site.current_risk_level
+                'contaminated': contaminated_count
             })
 
-        # Clean up temp file
-        try:
-            os.remove(temp_path)
-            os.rmdir(temp_dir)
-        except:
-            pass
+        # Update site risk
+        risk_levels = _apply_site_risks(ml_pipeline, risk_pending, record_prediction=False)
+        for station, risk_level in zip(imported_stations, risk_levels):
+            station['risk_level'] = risk_level
 
         # Run ML analysis on imported sites
         ml_analysis_results = []
         for station in imported_stations:
             try:
-                site = Site.query.filter_by(site_code=station['site_code']).first()
-                if site:
-                    ml_result = run_ml_on_site(site.id)
-                    ml_analysis_results.append({
-                        'site_name': station['name'],
-                        'models_run': ml_result.get('models_run', 0) if ml_result else 0
-                    })
+                ml_result = run_ml_on_site(station['site_id'])
+                ml_analysis_results.append({
+                    'site_name': station['name'],
+                    'models_run': ml_result.get('models_run', 0) if ml_result else 0
+                })
             except Exception:
                 pass
 
@@ -2007,13 +2576,11 @@ def upload_residential_data():
         anomaly_results = []
         for station in imported_stations:
             try:
-                site = Site.query.filter_by(site_code=station['site_code']).first()
-                if site:
-                    anomaly_result = run_anomaly_detection(site.id)
-                    anomaly_results.append({
-                        'site_name': station['name'],
-                        'anomalies_found': anomaly_result.get('anomalies_detected', 0) if anomaly_result else 0
-                    })
+                anomaly_result = run_anomaly_detection(station['site_id'])
+                anomaly_results.append({
+                    'site_name': station['name'],
+                    'anomalies_found': anomaly_result.get('anomalies_detected', 0) if anomaly_result else 0
+                })
             except Exception:
                 pass
 
@@ -2025,6 +2592,7 @@ def upload_residential_data():
             'residential_sites': residential_count,
             'public_sites': public_count,
             'stations': imported_stations,
+            'failed_stations': failed_stations,
             'ml_analysis': {
                 'stations_analyzed': len(ml_analysis_results),
                 'results': ml_analysis_results
@@ -2057,15 +2625,12 @@ def import_station_data(station_name):
         if station_data is None:
             return jsonify({'success': False, 'error': station_info}), 400
 
-        # Sort by date to ensure chronological order
-        station_data = station_data.sort_values('Date')
-
         # Get or create analyst user
         analyst = User.query.filter_by(id=current_user.id).first()
 
         # Initialize services
         analyzer = ContaminationAnalyzer()
-        ml_pipeline = MLPipeline()
+        ml_pipeline = get_ml_pipeline()
 
         # Create or get Site record
         site_code = f"CPCB-{slugify(station_name)}-001"
@@ -2133,111 +2698,78 @@ def import_station_data(station_name):
         db.session.add(import_batch)
         db.session.flush()
 
-        # Import samples
+        # Import samples; rows are collected here and written with COPY below
         samples_imported = 0
         analyses_created = 0
         contaminated_count = 0
-        imported_sample_ids = []
-
-        for sample_num, (idx, row) in enumerate(station_data.iterrows(), 1):
-            # Parse date
-            date_val = row.get('Date')
-            if pd.isna(date_val):
+        sample_rows = []
+        test_rows = []
+        analysis_rows = []
+
+        import_columns = _import_columns(station_data, IMPORT_COLUMN_MAPPING)
+        # Collection dates parsed in one pass (NaT where missing or unparseable)
+        parsed_dates = _parse_sample_dates(station_data['Date'])
+        collection_dates = parsed_dates.dt.date.to_numpy()
+
+        # Generate unique sample IDs up front and check which already exist in one query
+        sample_prefix = f"CPCB-{site.site_code[-8:]}-"
+        sample_ids = _build_sample_ids(sample_prefix, parsed_dates, '%Y%m')
+        existing_ids = _existing_sample_ids([sid for sid in sample_ids if sid])
+
+        for i, (collection_date, sample_id) in enumerate(zip(collection_dates, sample_ids)):
+            if sample_id is None or sample_id in existing_ids:
                 continue
 
-            # Handle different date formats
-            if isinstance(date_val, str):
-                try:
-                    if len(date_val) == 7:
-                        collection_date = datetime.strptime(date_val + '-01', '%Y-%m-%d').date()
-                    else:
-                        collection_date = datetime.strptime(date_val, '%Y-%m-%d').date()
-                except ValueError:
-                    try:
-                        collection_date = pd.to_datetime(date_val).date()
-                    except:
-                        continue
-            else:
-                try:
-                    collection_date = pd.to_datetime(date_val).date()
-                except:
-                    continue
-
-            # Generate unique sample ID
-            sample_id = f"CPCB-{site.site_code[-8:]}-{collection_date.strftime('%Y%m')}-{sample_num:03d}"
-
-            # Check if sample already exists
-            existing = WaterSample.query.filter_by(sample_id=sample_id).first()
-            if existing:
-                continue
-
-            # Create WaterSample
-            sample = WaterSample(
-                sample_id=sample_id,
-                site_id=site.id,
-                collection_date=collection_date,
-                collected_by_id=analyst.id,
-                source_point='center',
-                weather_condition='sunny',
-                status='analyzed'
-            )
-            db.session.add(sample)
-            db.session.flush()
-            imported_sample_ids.append(sample.id)
+            # WaterSample row
+            sample_kwargs = {
+                'sample_id': sample_id,
+                'site_id': site.id,
+                'collection_date': collection_date,
+                'collected_by_id': analyst.id,
+                'source_point': 'center',
+                'weather_condition': 'sunny',
+                'status': 'analyzed'
+            }
 
-            # Create TestResult
+            # TestResult row
             test_kwargs = {
-                'sample_id': sample.id,
                 'tested_by_id': analyst.id,
                 'tested_date': datetime.combine(collection_date, datetime.min.time()),
                 'lab_name': 'CPCB Monitoring'
             }
 
-            for excel_col, db_field in IMPORT_COLUMN_MAPPING.items():
-                if excel_col in row.index:
-                    value = clean_import_value(row[excel_col])
-                    if value is not None:
-                        test_kwargs[db_field] = value
+            for db_field, values in import_columns:
+                if not np.isnan(values[i]):
+                    test_kwargs[db_field] = float(values[i])
 
-            test_result = TestResult(**test_kwargs)
-            db.session.add(test_result)
-            db.session.flush()
+            sample_rows.append(sample_kwargs)
+            test_rows.append(test_kwargs)
             samples_imported += 1
 
-            # Run analysis
-            try:
-                analysis_result = analyzer.analyze(test_result, sample, site)
-                analysis = Analysis(
-                    sample_id=sample.id,
-                    test_result_id=test_result.id,
-                    is_contaminated=analysis_result['is_contaminated'],
-                    contamination_type=analysis_result['contamination_type_key'],
-                    severity_level=analysis_result['severity_level'],
-                    confidence_score=analysis_result['confidence_score'],
-                    wqi_score=analysis_result['wqi_score'],
-                    wqi_class=analysis_result['wqi_class'],
-                    runoff_sediment_score=analysis_result['runoff_sediment_score'],
-                    sewage_ingress_score=analysis_result['sewage_ingress_score'],
-                    salt_intrusion_score=analysis_result['salt_intrusion_score'],
-                    pipe_corrosion_score=analysis_result['pipe_corrosion_score'],
-                    disinfectant_decay_score=analysis_result['disinfectant_decay_score'],
-                    is_compliant_who=analysis_result['is_compliant_who'],
-                    is_compliant_bis=analysis_result['is_compliant_bis'],
-                    who_violations=analysis_result.get('who_violations', '[]'),
-                    bis_violations=analysis_result.get('bis_violations', '[]'),
-                    primary_recommendation=analysis_result['primary_recommendation'],
-                    estimated_treatment_cost_inr=analysis_result['estimated_treatment_cost_inr'],
-                    analysis_method='rule_based'
-                )
-                db.session.add(analysis)
-                analyses_created += 1
-                if analysis.is_contaminated:
-                    contaminated_count += 1
-            except Exception as e:
-                pass  # Skip analysis errors
+        # Rule-based analysis for every imported row at once
+        if test_rows:
+            results_df = analyzer.analyze_batch(pd.DataFrame(test_rows), site, pd.DataFrame(sample_rows))
+            analysis_rows = list(enumerate(map(_analysis_kwargs, results_df.to_dict('records'))))
+            analyses_created = len(analysis_rows)
+            contaminated_count = int(results_df['is_contaminated'].sum())
+
+        # Reserve ids so child rows can point at their parents, then COPY each table
+        imported_sample_ids = _reserve_ids(WaterSample, len(sample_rows))
+        test_ids = _reserve_ids(TestResult, len(test_rows))
+        for sample_row, test_row, sample_pk, test_pk in zip(sample_rows, test_rows, imported_sample_ids, test_ids):
+            sample_row['id'] = sample_pk
+            test_row['id'] = test_pk
+            test_row['sample_id'] = sample_pk
+        for row_index, analysis_row in analysis_rows:
+            analysis_row['sample_id'] = imported_sample_ids[row_index]
+            analysis_row['test_result_id'] = test_ids[row_index]
+
+        _copy_insert(WaterSample, sample_rows)
+        _copy_insert(TestResult, test_rows)
+        _copy_insert(Analysis, [row for _, row in analysis_rows])
 
         # Commit all samples
-        db.session.commit()
+        _commit_import()
 
         # Update ImportBatch with final counts
         import_batch.status = 'completed'
@@ -2309,6 +2841,14 @@ def import_station_data(station_name):
         }), 500
 
 
+def _table_counts(models):
+    """Row counts for a {key: model} mapping, as {key: count}, in a single statement"""
+    return db.session.execute(db.select(*(
+        db.select(db.func.count()).select_from(model).scalar_subquery().label(key)
+        for key, model in models.items()
+    ))).one()._asdict()
+
+
 @rolling_poc_data_bp.route('/reset-all', methods=['POST'])
 @login_required
 def reset_all_data():
@@ -2335,113 +2875,109 @@ def reset_all_data():
         }
 
         if include_demo:
-            # FULL RESET - Delete everything in correct order (child tables first)
-            # Step 1: Clear all ML prediction tables first (they reference sites/samples)
-            deleted_counts['risk_predictions'] = SiteRiskPrediction.query.delete(synchronize_session=False)
-            deleted_counts['contamination_predictions'] = ContaminationPrediction.query.delete(synchronize_session=False)
-            deleted_counts['wqi_readings'] = WQIReading.query.delete(synchronize_session=False)
-            deleted_counts['forecasts'] = WaterQualityForecast.query.delete(synchronize_session=False)
-            deleted_counts['cost_results'] = CostOptimizationResult.query.delete(synchronize_session=False)
-            deleted_counts['anomalies'] = AnomalyDetection.query.delete(synchronize_session=False)
-
-            # Step 2: Clear IoT tables (sensor_alert -> sensor_reading -> iot_sensor -> site)
-            deleted_counts['sensor_alerts'] = SensorAlert.query.delete(synchronize_session=False)
-            deleted_counts['sensor_readings'] = SensorReading.query.delete(synchronize_session=False)
-            deleted_counts['iot_sensors'] = IoTSensor.query.delete(synchronize_session=False)
-
-            # Step 3: Clear interventions (references both sites and samples)
-            deleted_counts['interventions'] = Intervention.query.delete(synchronize_session=False)
-
-            # Step 4: Clear analysis data (references samples and test_results)
-            deleted_counts['analyses'] = Analysis.query.delete(synchronize_session=False)
-
-            # Step 5: Clear test results (references samples)
-            deleted_counts['test_results'] = TestResult.query.delete(synchronize_session=False)
-
-            # Step 6: Clear samples (references sites)
-            deleted_counts['samples'] = WaterSample.query.delete(synchronize_session=False)
-
-            # Step 7: Clear sites
-            deleted_counts['sites'] = Site.query.delete(synchronize_session=False)
+            # FULL RESET - count every table in one query, then empty them all with a
+            # single TRUNCATE. CASCADE also empties the remaining tables that reference
+            # sites or samples (drift detections, validation results, visual observations).
+            reset_tables = {
+                'risk_predictions': SiteRiskPrediction,
+                'contamination_predictions': ContaminationPrediction,
+                'wqi_readings': WQIReading,
+                'forecasts': WaterQualityForecast,
+                'cost_results': CostOptimizationResult,
+                'anomalies': AnomalyDetection,
+                'sensor_alerts': SensorAlert,
+                'sensor_readings': SensorReading,
+                'iot_sensors': IoTSensor,
+                'interventions': Intervention,
+                'analyses': Analysis,
+                'test_results': TestResult,
+                'samples': WaterSample,
+                'sites': Site
+            }
+            deleted_counts.update(_table_counts(reset_tables))
+            db.session.execute(db.text(
+                f"TRUNCATE TABLE {', '.join(model.__tablename__ for model in reset_tables.values())} "
+                "RESTART IDENTITY CASCADE"
+            ))
 
         else:
-            # PARTIAL RESET - Only delete CPCB-prefixed sites (imported from Excel)
-            sites_to_delete = Site.query.filter(Site.site_code.like('CPCB-%')).all()
-            site_ids = [s.id for s in sites_to_delete]
-
-            if site_ids:
-                # Delete ML predictions for these sites
-                deleted_counts['risk_predictions'] = SiteRiskPrediction.query.filter(
-                    SiteRiskPrediction.site_id.in_(site_ids)
-                ).delete(synchronize_session=False)
-
-                deleted_counts['wqi_readings'] = WQIReading.query.filter(
-                    WQIReading.site_id.in_(site_ids)
-                ).delete(synchronize_session=False)
-
-                deleted_counts['forecasts'] = WaterQualityForecast.query.filter(
-                    WaterQualityForecast.site_id.in_(site_ids)
-                ).delete(synchronize_session=False)
-
-                deleted_counts['cost_results'] = CostOptimizationResult.query.filter(
-                    CostOptimizationResult.site_id.in_(site_ids)
-                ).delete(synchronize_session=False)
-
-                deleted_counts['anomalies'] = AnomalyDetection.query.filter(
-                    AnomalyDetection.site_id.in_(site_ids)
-                ).delete(synchronize_session=False)
-
-                # Delete IoT sensors and related data for these sites
-                iot_sensors = IoTSensor.query.filter(IoTSensor.site_id.in_(site_ids)).all()
-                sensor_ids = [s.id for s in iot_sensors]
-                if sensor_ids:
-                    deleted_counts['sensor_alerts'] = SensorAlert.query.filter(
-                        SensorAlert.sensor_id.in_(sensor_ids)
-                    ).delete(synchronize_session=False)
-                    deleted_counts['sensor_readings'] = SensorReading.query.filter(
-                        SensorReading.sensor_id.in_(sensor_ids)
-                    ).delete(synchronize_session=False)
-                deleted_counts['iot_sensors'] = IoTSensor.query.filter(
-                    IoTSensor.site_id.in_(site_ids)
-                ).delete(synchronize_session=False)
-
-                # Get sample IDs for these sites
-                samples = WaterSample.query.filter(WaterSample.site_id.in_(site_ids)).all()
-                sample_ids = [s.id for s in samples]
-
-                # Delete interventions (references both sites and samples)
-                deleted_counts['interventions'] = Intervention.query.filter(
-                    Intervention.site_id.in_(site_ids)
-                ).delete(synchronize_session=False)
-
-                if sample_ids:
-                    # Delete contamination predictions for these samples
-                    deleted_counts['contamination_predictions'] = ContaminationPrediction.query.filter(
-                        ContaminationPrediction.sample_id.in_(sample_ids)
-                    ).delete(synchronize_session=False)
-
-                    # Delete analyses for these samples
-                    deleted_counts['analyses'] = Analysis.query.filter(
-                        Analysis.sample_id.in_(sample_ids)
-                    ).delete(synchronize_session=False)
-
-                    # Delete test results for these samples
-                    deleted_counts['test_results'] = TestResult.query.filter(
-                        TestResult.sample_id.in_(sample_ids)
-                    ).delete(synchronize_session=False)
-
-                    # Delete samples
-                    deleted_counts['samples'] = WaterSample.query.filter(
-                        WaterSample.id.in_(sample_ids)
-                    ).delete(synchronize_session=False)
-
-                # Delete sites
-                deleted_counts['sites'] = Site.query.filter(
-                    Site.id.in_(site_ids)
-                ).delete(synchronize_session=False)
+            # PARTIAL RESET - Only delete CPCB-prefixed sites (imported from Excel).
+            # Ids are selected inside each DELETE, so no id lists round-trip through Python;
+            # sites go last, so the subqueries still see them.
+            site_ids = db.select(Site.id).where(Site.site_code.like('CPCB-%'))
+            sensor_ids = db.select(IoTSensor.id).where(IoTSensor.site_id.in_(site_ids))
+            sample_ids = db.select(WaterSample.id).where(WaterSample.site_id.in_(site_ids))
+
+            # Delete ML predictions for these sites
+            deleted_counts['risk_predictions'] = SiteRiskPrediction.query.filter(
+                SiteRiskPrediction.site_id.in_(site_ids)
+            ).delete(synchronize_session=False)
+
+            deleted_counts['wqi_readings'] = WQIReading.query.filter(
+                WQIReading.site_id.in_(site_ids)
+            ).delete(synchronize_session=False)
+
+            deleted_counts['forecasts'] = WaterQualityForecast.query.filter(
+                WaterQualityForecast.site_id.in_(site_ids)
+            ).delete(synchronize_session=False)
+
+            deleted_counts['cost_results'] = CostOptimizationResult.query.filter(
+                CostOptimizationResult.site_id.in_(site_ids)
+            ).delete(synchronize_session=False)
+
+            deleted_counts['anomalies'] = AnomalyDetection.query.filter(
+                AnomalyDetection.site_id.in_(site_ids)
+            ).delete(synchronize_session=False)
+
+            # Delete IoT sensors and related data for these sites
+            deleted_counts['sensor_alerts'] = SensorAlert.query.filter(
+                SensorAlert.sensor_id.in_(sensor_ids)
+            ).delete(synchronize_session=False)
+            deleted_counts['sensor_readings'] = SensorReading.query.filter(
+                SensorReading.sensor_id.in_(sensor_ids)
+            ).delete(synchronize_session=False)
+            deleted_counts['iot_sensors'] = IoTSensor.query.filter(
+                IoTSensor.site_id.in_(site_ids)
+            ).delete(synchronize_session=False)
+
+            # Delete interventions (references both sites and samples)
+            deleted_counts['interventions'] = Intervention.query.filter(
+                Intervention.site_id.in_(site_ids)
+            ).delete(synchronize_session=False)
+
+            # Delete contamination predictions for these samples
+            deleted_counts['contamination_predictions'] = ContaminationPrediction.query.filter(
+                ContaminationPrediction.sample_id.in_(sample_ids)
+            ).delete(synchronize_session=False)
+
+            # Delete analyses for these samples
+            deleted_counts['analyses'] = Analysis.query.filter(
+                Analysis.sample_id.in_(sample_ids)
+            ).delete(synchronize_session=False)
+
+            # Delete test results for these samples
+            deleted_counts['test_results'] = TestResult.query.filter(
+                TestResult.sample_id.in_(sample_ids)
+            ).delete(synchronize_session=False)
+
+            # Delete samples
+            deleted_counts['samples'] = WaterSample.query.filter(
+                WaterSample.site_id.in_(site_ids)
+            ).delete(synchronize_session=False)
+
+            # Delete sites
+            deleted_counts['sites'] = Site.query.filter(
+                Site.site_code.like('CPCB-%')
+            ).delete(synchronize_session=False)
 
         db.session.commit()
 
+        # Cached rolling runs report predictions that no longer exist, and the
+        # cached POC rolling data holds samples that may have been deleted
+        with _rolling_run_cache_lock:
+            _rolling_run_cache.clear()
+        _cached_rolling_data.cache_clear()
+
         return jsonify({
             'success': True,
             'message': 'All imported data and ML predictions have been reset',
@@ -2459,188 +2995,195 @@ def reset_all_data():
         }), 500
 
 
+@lru_cache(maxsize=1)
+def _template_workbook_bytes():
+    """The import template workbook, built once per process
+
+    Its content only depends on constants in this module, so every download
+    after the first is served from these bytes.
+    """
+    # Create template DataFrame with required columns
+    # Site information columns (header row)
+    site_columns = [
+        'Station Name',      # Required - unique identifier for the monitoring station
+        'State Name ',       # Required - state name (note: has trailing space like CPCB data)
+        'District Name',     # Required - district name
+        'Latitude',          # Optional - decimal latitude
+        'Longitude',         # Optional - decimal longitude
+        'Basin Name ',       # Optional - river basin name
+        'Agency Name ',      # Optional - monitoring agency
+    ]
+
+    # Sample/Date column
+    date_column = ['Date']  # Required - format: YYYY-MM or YYYY-MM-DD
+
+    # Test result columns (from IMPORT_COLUMN_MAPPING)
+    test_columns = list(IMPORT_COLUMN_MAPPING.keys())
+
+    # Combine all columns
+    all_columns = site_columns + date_column + test_columns
+
+    # Create sample data rows with example values
+    sample_data = [
+        {
+            'Station Name': 'Example River Station 1',
+            'State Name ': 'Maharashtra',
+            'District Name': 'Pune',
+            'Latitude': 18.5204,
+            'Longitude': 73.8567,
+            'Basin Name ': 'Krishna',
+            'Agency Name ': 'State PCB',
+            'Date': '2024-01',
+            'Temperature': 25.5,
+            'Total Dissolved Solids (mg/L)': 450,
+            'Electrical Conductivity Field': 680,
+            'pH': 7.2,
+            'Turbidity (NTU)': 8.5,
+            'Total Alkalinity (mg/L)': 180,
+            'Chloride (mg/L)': 120,
+            'Total Hardness (mg/L)': 250,
+            'Calcium (mg/L)': 65,
+            'Magnesium (mg/L)': 22,
+            'Dissolved Oxygen (mg/L)': 6.8,
+            'Biochemical Oxygen Demand (mg/L)': 3.2,
+            'COD (Chemical Oxygen Demand) (mg/L)': 12,
+            'Nitrate (mg/L)': 18,
+            'Fluoride (mg/L)': 0.8,
+            'Iron (mg/L)': 0.15,
+            'Total Coliforms (MPN/100 ml)': 50,
+            'Fecal Coliforms (MPN/100 ml)': 5
+        },
+        {
+            'Station Name': 'Example River Station 1',
+            'State Name ': 'Maharashtra',
+            'District Name': 'Pune',
+            'Latitude': 18.5204,
+            'Longitude': 73.8567,
+            'Basin Name ': 'Krishna',
+            'Agency Name ': 'State PCB',
+            'Date': '2024-02',
+            'Temperature': 26.0,
+            'Total Dissolved Solids (mg/L)': 480,
+            'Electrical Conductivity Field': 720,
+            'pH': 7.4,
+            'Turbidity (NTU)': 6.2,
+            'Total Alkalinity (mg/L)': 175,
+            'Chloride (mg/L)': 115,
+            'Total Hardness (mg/L)': 240,
+            'Calcium (mg/L)': 62,
+            'Magnesium (mg/L)': 20,
+            'Dissolved Oxygen (mg/L)': 7.1,
+            'Biochemical Oxygen Demand (mg/L)': 2.8,
+            'COD (Chemical Oxygen Demand) (mg/L)': 10,
+            'Nitrate (mg/L)': 15,
+            'Fluoride (mg/L)': 0.75,
+            'Iron (mg/L)': 0.12,
+            'Total Coliforms (MPN/100 ml)': 40,
+            'Fecal Coliforms (MPN/100 ml)': 3
+        },
+        {
+            'Station Name': 'Example Lake Station 2',
+            'State Name ': 'Karnataka',
+            'District Name': 'Bangalore Urban',
+            'Latitude': 12.9716,
+            'Longitude': 77.5946,
+            'Basin Name ': 'Cauvery',
+            'Agency Name ': 'State PCB',
+            'Date': '2024-01',
+            'Temperature': 24.0,
+            'Total Dissolved Solids (mg/L)': 520,
+            'Electrical Conductivity Field': 780,
+            'pH': 7.8,
+            'Turbidity (NTU)': 12.5,
+            'Total Alkalinity (mg/L)': 200,
+            'Chloride (mg/L)': 140,
+            'Total Hardness (mg/L)': 280,
+            'Calcium (mg/L)': 70,
+            'Magnesium (mg/L)': 25,
+            'Dissolved Oxygen (mg/L)': 5.5,
+            'Biochemical Oxygen Demand (mg/L)': 4.5,
+            'COD (Chemical Oxygen Demand) (mg/L)': 18,
+            'Nitrate (mg/L)': 25,
+            'Fluoride (mg/L)': 1.1,
+            'Iron (mg/L)': 0.25,
+            'Total Coliforms (MPN/100 ml)': 120,
+            'Fecal Coliforms (MPN/100 ml)': 15
+        }
+    ]
+
+    # Create DataFrame
+    df = pd.DataFrame(sample_data, columns=all_columns)
+
+    # Create instructions sheet data
+    instructions_data = [
+        ['Jal Sarovar Water Quality Data Import Template'],
+        [''],
+        ['INSTRUCTIONS:'],
+        ['1. This template matches the CPCB (Central Pollution Control Board) Excel format'],
+        ['2. Data should start at row 7 (after 5 header rows) - this template has 5 blank rows followed by headers'],
+        ['3. Each row represents one water sample from a monitoring station'],
+        ['4. Multiple samples from the same station should have the same Station Name'],
+        ['5. Minimum 40 samples per station are required for ML analysis'],
+        [''],
+        ['REQUIRED COLUMNS:'],
+        ['- Station Name: Unique identifier for the monitoring location'],
+        ['- State Name : State where the station is located (note: column name has trailing space)'],
+        ['- District Name: District where the station is located'],
+        ['- Date: Sample collection date (format: YYYY-MM or YYYY-MM-DD)'],
+        [''],
+        ['OPTIONAL BUT RECOMMENDED:'],
+        ['- Latitude/Longitude: GPS coordinates for mapping'],
+        ['- Basin Name : River basin name'],
+        ['- All water quality parameters (pH, TDS, Turbidity, etc.)'],
+        [''],
+        ['WATER QUALITY PARAMETERS:'],
+        ['- Temperature: Water temperature in Celsius'],
+        ['- pH: pH value (6.5-8.5 normal range)'],
+        ['- Total Dissolved Solids (mg/L): TDS concentration'],
+        ['- Turbidity (NTU): Water clarity measurement'],
+        ['- Electrical Conductivity Field: Conductivity in µS/cm'],
+        ['- Dissolved Oxygen (mg/L): DO level (>5 mg/L is healthy)'],
+        ['- Total Coliforms (MPN/100 ml): Bacterial indicator'],
+        ['- Fecal Coliforms (MPN/100 ml): Fecal contamination indicator'],
+        ['- And other chemical parameters as listed in the Data sheet'],
+        [''],
+        ['NOTES:'],
+        ['- Use "-" or leave blank for missing values'],
+        ['- Numeric values only for all measurement columns'],
+        ['- Date format: YYYY-MM (e.g., 2024-01) or YYYY-MM-DD (e.g., 2024-01-15)'],
+    ]
+    instructions_df = pd.DataFrame(instructions_data, columns=['Instructions'])
+
+    # Create Excel file in memory
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        # Write instructions sheet
+        instructions_df.to_excel(writer, sheet_name='Instructions', index=False, header=False)
+
+        # Write data template with 5 blank rows before header (to match CPCB format)
+        # Create blank rows DataFrame
+        blank_rows = pd.DataFrame([[''] * len(all_columns)] * 5, columns=all_columns)
+        # Combine blank rows with sample data
+        template_df = pd.concat([blank_rows, df], ignore_index=True)
+        template_df.to_excel(writer, sheet_name='Data', index=False)
+
+    return output.getvalue()
+
+
 @rolling_poc_data_bp.route('/download-template', methods=['GET'])
 @login_required
 def download_template():
     """Download Excel template with required fields for data import"""
     from flask import Response
-    import io
 
     # Check admin access
     if not current_user.is_admin():
         return jsonify({'success': False, 'error': 'Admin access required'}), 403
 
     try:
-        # Create template DataFrame with required columns
-        # Site information columns (header row)
-        site_columns = [
-            'Station Name',      # Required - unique identifier for the monitoring station
-            'State Name ',       # Required - state name (note: has trailing space like CPCB data)
-            'District Name',     # Required - district name
-            'Latitude',          # Optional - decimal latitude
-            'Longitude',         # Optional - decimal longitude
-            'Basin Name ',       # Optional - river basin name
-            'Agency Name ',      # Optional - monitoring agency
-        ]
-
-        # Sample/Date column
-        date_column = ['Date']  # Required - format: YYYY-MM or YYYY-MM-DD
-
-        # Test result columns (from IMPORT_COLUMN_MAPPING)
-        test_columns = list(IMPORT_COLUMN_MAPPING.keys())
-
-        # Combine all columns
-        all_columns = site_columns + date_column + test_columns
-
-        # Create sample data rows with example values
-        sample_data = [
-            {
-                'Station Name': 'Example River Station 1',
-                'State Name ': 'Maharashtra',
-                'District Name': 'Pune',
-                'Latitude': 18.5204,
-                'Longitude': 73.8567,
-                'Basin Name ': 'Krishna',
-                'Agency Name ': 'State PCB',
-                'Date': '2024-01',
-                'Temperature': 25.5,
-                'Total Dissolved Solids (mg/L)': 450,
-                'Electrical Conductivity Field': 680,
-                'pH': 7.2,
-                'Turbidity (NTU)': 8.5,
-                'Total Alkalinity (mg/L)': 180,
-                'Chloride (mg/L)': 120,
-                'Total Hardness (mg/L)': 250,
-                'Calcium (mg/L)': 65,
-                'Magnesium (mg/L)': 22,
-                'Dissolved Oxygen (mg/L)': 6.8,
-                'Biochemical Oxygen Demand (mg/L)': 3.2,
-                'COD (Chemical Oxygen Demand) (mg/L)': 12,
-                'Nitrate (mg/L)': 18,
-                'Fluoride (mg/L)': 0.8,
-                'Iron (mg/L)': 0.15,
-                'Total Coliforms (MPN/100 ml)': 50,
-                'Fecal Coliforms (MPN/100 ml)': 5
-            },
-            {
-                'Station Name': 'Example River Station 1',
-                'State Name ': 'Maharashtra',
-                'District Name': 'Pune',
-                'Latitude': 18.5204,
-                'Longitude': 73.8567,
-                'Basin Name ': 'Krishna',
-                'Agency Name ': 'State PCB',
-                'Date': '2024-02',
-                'Temperature': 26.0,
-                'Total Dissolved Solids (mg/L)': 480,
-                'Electrical Conductivity Field': 720,
-                'pH': 7.4,
-                'Turbidity (NTU)': 6.2,
-                'Total Alkalinity (mg/L)': 175,
-                'Chloride (mg/L)': 115,
-                'Total Hardness (mg/L)': 240,
-                'Calcium (mg/L)': 62,
-                'Magnesium (mg/L)': 20,
-                'Dissolved Oxygen (mg/L)': 7.1,
-                'Biochemical Oxygen Demand (mg/L)': 2.8,
-                'COD (Chemical Oxygen Demand) (mg/L)': 10,
-                'Nitrate (mg/L)': 15,
-                'Fluoride (mg/L)': 0.75,
-                'Iron (mg/L)': 0.12,
-                'Total Coliforms (MPN/100 ml)': 40,
-                'Fecal Coliforms (MPN/100 ml)': 3
-            },
-            {
-                'Station Name': 'Example Lake Station 2',
-                'State Name ': 'Karnataka',
-                'District Name': 'Bangalore Urban',
-                'Latitude': 12.9716,
-                'Longitude': 77.5946,
-                'Basin Name ': 'Cauvery',
-                'Agency Name ': 'State PCB',
-                'Date': '2024-01',
-                'Temperature': 24.0,
-                'Total Dissolved Solids (mg/L)': 520,
-                'Electrical Conductivity Field': 780,
-                'pH': 7.8,
-                'Turbidity (NTU)': 12.5,
-                'Total Alkalinity (mg/L)': 200,
-                'Chloride (mg/L)': 140,
-                'Total Hardness (mg/L)': 280,
-                'Calcium (mg/L)': 70,
-                'Magnesium (mg/L)': 25,
-                'Dissolved Oxygen (mg/L)': 5.5,
-                'Biochemical Oxygen Demand (mg/L)': 4.5,
-                'COD (Chemical Oxygen Demand) (mg/L)': 18,
-                'Nitrate (mg/L)': 25,
-                'Fluoride (mg/L)': 1.1,
-                'Iron (mg/L)': 0.25,
-                'Total Coliforms (MPN/100 ml)': 120,
-                'Fecal Coliforms (MPN/100 ml)': 15
-            }
-        ]
-
-        # Create DataFrame
-        df = pd.DataFrame(sample_data, columns=all_columns)
-
-        # Create instructions sheet data
-        instructions_data = [
-            ['Jal Sarovar Water Quality Data Import Template'],
-            [''],
-            ['INSTRUCTIONS:'],
-            ['1. This template matches the CPCB (Central Pollution Control Board) Excel format'],
-            ['2. Data should start at row 7 (after 5 header rows) - this template has 5 blank rows followed by headers'],
-            ['3. Each row represents one water sample from a monitoring station'],
-            ['4. Multiple samples from the same station should have the same Station Name'],
-            ['5. Minimum 40 samples per station are required for ML analysis'],
-            [''],
-            ['REQUIRED COLUMNS:'],
-            ['- Station Name: Unique identifier for the monitoring location'],
-            ['- State Name : State where the station is located (note: column name has trailing space)'],
-            ['- District Name: District where the station is located'],
-            ['- Date: Sample collection date (format: YYYY-MM or YYYY-MM-DD)'],
-            [''],
-            ['OPTIONAL BUT RECOMMENDED:'],
-            ['- Latitude/Longitude: GPS coordinates for mapping'],
-            ['- Basin Name : River basin name'],
-            ['- All water quality parameters (pH, TDS, Turbidity, etc.)'],
-            [''],
-            ['WATER QUALITY PARAMETERS:'],
-            ['- Temperature: Water temperature in Celsius'],
-            ['- pH: pH value (6.5-8.5 normal range)'],
-            ['- Total Dissolved Solids (mg/L): TDS concentration'],
-            ['- Turbidity (NTU): Water clarity measurement'],
-            ['- Electrical Conductivity Field: Conductivity in µS/cm'],
-            ['- Dissolved Oxygen (mg/L): DO level (>5 mg/L is healthy)'],
-            ['- Total Coliforms (MPN/100 ml): Bacterial indicator'],
-            ['- Fecal Coliforms (MPN/100 ml): Fecal contamination indicator'],
-            ['- And other chemical parameters as listed in the Data sheet'],
-            [''],
-            ['NOTES:'],
-            ['- Use "-" or leave blank for missing values'],
-            ['- Numeric values only for all measurement columns'],
-            ['- Date format: YYYY-MM (e.g., 2024-01) or YYYY-MM-DD (e.g., 2024-01-15)'],
-        ]
-        instructions_df = pd.DataFrame(instructions_data, columns=['Instructions'])
-
-        # Create Excel file in memory
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Write instructions sheet
-            instructions_df.to_excel(writer, sheet_name='Instructions', index=False, header=False)
-
-            # Write data template with 5 blank rows before header (to match CPCB format)
-            # Create blank rows DataFrame
-            blank_rows = pd.DataFrame([[''] * len(all_columns)] * 5, columns=all_columns)
-            # Combine blank rows with sample data
-            template_df = pd.concat([blank_rows, df], ignore_index=True)
-            template_df.to_excel(writer, sheet_name='Data', index=False)
-
-        output.seek(0)
-
         # Return as downloadable Excel file
         return Response(
-            output.getvalue(),
+            _template_workbook_bytes(),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
             headers={
                 'Content-Disposition': 'attachment; filename=jal_sarovar_import_template.xlsx'
@@ -2668,90 +3211,38 @@ def export_data():
         return jsonify({'success': False, 'error': 'Admin access required'}), 403
 
     try:
-        # Get all Public (CPCB) and Residential sites
+        # All samples of Public (CPCB) and Residential sites, with their site joined in
+        # and test results loaded in one more query per batch, instead of querying per site and sample
+        from openpyxl import Workbook
         from sqlalchemy import or_
-        all_sites = Site.query.filter(
-            or_(
-                Site.site_code.like('CPCB-%'),
-                Site.site_code.like('RES-%')
-            )
-        ).all()
+        from sqlalchemy.orm import contains_eager, selectinload
+        imported_sites = or_(
+            Site.site_code.like('CPCB-%'),
+            Site.site_code.like('RES-%')
+        )
 
-        if not all_sites:
+        # Every imported site with its sample count, for the Summary sheet; sites
+        # without samples are listed too, with a count of 0
+        site_sample_counts = db.session.query(Site, db.func.count(WaterSample.id)).outerjoin(
+            WaterSample, WaterSample.site_id == Site.id
+        ).filter(imported_sites).group_by(Site.id).order_by(Site.id).all()
+        if not site_sample_counts:
             return jsonify({
                 'success': False,
                 'error': 'No imported Public or Residential data found in database'
             }), 404
-
-        # Build reverse mapping from DB field to Excel column
-        db_to_excel = {v: k for k, v in IMPORT_COLUMN_MAPPING.items()}
-
-        # Collect all data rows (both formatted for Data sheet and raw with IDs)
-        export_rows = []
-        raw_data_rows = []
-
-        for site in all_sites:
-            # Get all samples for this site with their test results
-            samples = WaterSample.query.filter_by(site_id=site.id).order_by(
-                WaterSample.collection_date
-            ).all()
-
-            for sample in samples:
-                # Get test result for this sample
-                test_result = TestResult.query.filter_by(sample_id=sample.id).first()
-
-                # Data sheet row (CPCB format)
-                row = {
-                    'Station Name': site.site_name,
-                    'State Name ': site.state or '',
-                    'District Name': site.district or '',
-                    'Latitude': site.latitude,
-                    'Longitude': site.longitude,
-                    'Basin Name ': '',  # Not stored in Site model
-                    'Agency Name ': '',  # Not stored in Site model
-                    'Date': sample.collection_date.strftime('%Y-%m') if sample.collection_date else '',
-                }
-
-                # Raw Data sheet row (with database IDs and details)
-                raw_row = {
-                    'Site ID': site.id,
-                    'Site Code': site.site_code,
-                    'Sample ID': sample.id,
-                    'Sample Code': sample.sample_id,
-                    'Test Result ID': test_result.id if test_result else '',
-                    'Station Name': site.site_name,
-                    'State': site.state or '',
-                    'District': site.district or '',
-                    'Latitude': site.latitude,
-                    'Longitude': site.longitude,
-                    'Site Type': site.site_type or '',
-                    'Site Category': site.site_category or '',
-                    'Water Source': site.water_source or '',
-                    'Collection Date': sample.collection_date.strftime('%Y-%m-%d') if sample.collection_date else '',
-                    'Collection Time': sample.collection_time.strftime('%H:%M:%S') if sample.collection_time else '',
-                    'Source Point': sample.source_point or '',
-                    'Weather Condition': sample.weather_condition or '',
-                    'Sample Status': sample.status or '',
-                    'Created At': sample.created_at.strftime('%Y-%m-%d %H:%M:%S') if sample.created_at else '',
-                }
-
-                # Add test result parameters if available
-                if test_result:
-                    for db_field, excel_col in db_to_excel.items():
-                        value = getattr(test_result, db_field, None)
-                        row[excel_col] = value if value is not None else ''
-                        # Also add to raw data with DB field name
-                        raw_row[db_field] = value if value is not None else ''
-
-                export_rows.append(row)
-                raw_data_rows.append(raw_row)
-
-        if not export_rows:
+        total_samples = sum(sample_count for _, sample_count in site_sample_counts)
+        if not total_samples:
             return jsonify({
                 'success': False,
                 'error': 'No sample data found for exported sites'
             }), 404
 
+        samples = WaterSample.query.join(WaterSample.site).filter(imported_sites).options(
+            contains_eager(WaterSample.site),
+            selectinload(WaterSample.test_result_list)
+        ).order_by(Site.id, WaterSample.collection_date).yield_per(EXPORT_BATCH_SIZE)
+
         # Define column order (same as import template)
         site_columns = [
             'Station Name',
@@ -2765,50 +3256,92 @@ def export_data():
         date_column = ['Date']
         test_columns = list(IMPORT_COLUMN_MAPPING.keys())
         all_columns = site_columns + date_column + test_columns
-
-        # Create DataFrame with correct column order
-        df = pd.DataFrame(export_rows)
-
-        # Reorder columns to match template (and add any missing columns)
-        for col in all_columns:
-            if col not in df.columns:
-                df[col] = ''
-        df = df[all_columns]
-
-        # Create summary sheet
-        summary_data = [
+        test_fields = list(IMPORT_COLUMN_MAPPING.values())
+        raw_columns = [
+            'Site ID', 'Site Code', 'Sample ID', 'Sample Code', 'Test Result ID',
+            'Station Name', 'State', 'District', 'Latitude', 'Longitude',
+            'Site Type', 'Site Category', 'Water Source', 'Collection Date', 'Collection Time',
+            'Source Point', 'Weather Condition', 'Sample Status', 'Created At'
+        ] + test_fields
+
+        # Rows are streamed into a write-only workbook as samples arrive, so memory
+        # stays bounded by the query batch rather than the size of the export
+        workbook = Workbook(write_only=True)
+        summary_sheet = workbook.create_sheet('Summary')
+        data_sheet = workbook.create_sheet('Data')
+        raw_sheet = workbook.create_sheet('Raw Data')
+
+        # Data sheet: header, then 5 blank rows (to match CPCB format)
+        data_sheet.append(all_columns)
+        for _ in range(5):
+            data_sheet.append([''] * len(all_columns))
+        # Raw Data sheet with Site ID, Sample ID, and all details
+        raw_sheet.append(raw_columns)
+
+        for sample in samples:
+            site = sample.site
+            test_result = sample.test_result_list[0] if sample.test_result_list else None
+
+            # Test result parameters, in IMPORT_COLUMN_MAPPING order, if available
+            if test_result:
+                test_values = [getattr(test_result, db_field, None) for db_field in test_fields]
+                test_values = ['' if value is None else value for value in test_values]
+            else:
+                test_values = [''] * len(test_fields)
+
+            # Data sheet row (CPCB format)
+            data_sheet.append([
+                site.site_name,
+                site.state or '',
+                site.district or '',
+                site.latitude,
+                site.longitude,
+                '',  # Basin Name - not stored in Site model
+                '',  # Agency Name - not stored in Site model
+                sample.collection_date.strftime('%Y-%m') if sample.collection_date else '',
+            ] + test_values)
+
+            # Raw Data sheet row (with database IDs and details)
+            raw_sheet.append([
+                site.id,
+                site.site_code,
+                sample.id,
+                sample.sample_id,
+                test_result.id if test_result else '',
+                site.site_name,
+                site.state or '',
+                site.district or '',
+                site.latitude,
+                site.longitude,
+                site.site_type or '',
+                site.site_category or '',
+                site.water_source or '',
+                sample.collection_date.strftime('%Y-%m-%d') if sample.collection_date else '',
+                sample.collection_time.strftime('%H:%M:%S') if sample.collection_time else '',
+                sample.source_point or '',
+                sample.weather_condition or '',
+                sample.status or '',
+                sample.created_at.strftime('%Y-%m-%d %H:%M:%S') if sample.created_at else '',
+            ] + test_values)
+
+        # Summary sheet
+        summary_rows = [
             ['Jal Sarovar Exported Water Quality Data'],
             [''],
             [f'Export Date: {datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")} UTC'],
-            [f'Total Sites: {len(cpcb_sites)}'],
-            [f'Total Samples: {len(export_rows)}'],
+            [f'Total Sites: {len(site_sample_counts)}'],
+            [f'Total Samples: {total_samples}'],
             [''],
             ['Site Summary:'],
         ]
-        for site in cpcb_sites:
-            sample_count = WaterSample.query.filter_by(site_id=site.id).count()
-            summary_data.append([f'  - {site.site_name} ({site.state}): {sample_count} samples'])
-
-        summary_df = pd.DataFrame(summary_data, columns=['Summary'])
-
-        # Create Raw Data DataFrame
-        raw_df = pd.DataFrame(raw_data_rows)
+        for site, sample_count in site_sample_counts:
+            summary_rows.append([f'  - {site.site_name} ({site.state}): {sample_count} samples'])
+        for summary_row in summary_rows:
+            summary_sheet.append(summary_row)
 
         # Create Excel file in memory
         output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Write summary sheet
-            summary_df.to_excel(writer, sheet_name='Summary', index=False, header=False)
-
-            # Write data with 5 blank rows before header (to match CPCB format)
-            blank_rows = pd.DataFrame([[''] * len(all_columns)] * 5, columns=all_columns)
-            export_df = pd.concat([blank_rows, df], ignore_index=True)
-            export_df.to_excel(writer, sheet_name='Data', index=False)
-
-            # Write Raw Data sheet with Site ID, Sample ID, and all details
-            raw_df.to_excel(writer, sheet_name='Raw Data', index=False)
-
-        output.seek(0)
+        workbook.save(output)
 
         # Generate filename with timestamp
         filename = f'jal_sarovar_exported_data_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.xlsx'
@@ -2836,61 +3369,49 @@ def export_data():
 def get_stats():
     """Get current database statistics for imported data"""
     try:
-        # Count Public (CPCB) sites
-        cpcb_sites = Site.query.filter(Site.site_code.like('CPCB-%')).count()
-
-        # Count Residential sites
-        residential_sites = Site.query.filter(Site.site_code.like('RES-%')).count()
-
-        total_sites = Site.query.count()
-
-        # Count samples from Public sites
-        cpcb_site_ids = [s.id for s in Site.query.filter(Site.site_code.like('CPCB-%')).all()]
-        cpcb_samples = WaterSample.query.filter(WaterSample.site_id.in_(cpcb_site_ids)).count() if cpcb_site_ids else 0
-
-        # Count samples from Residential sites
-        residential_site_ids = [s.id for s in Site.query.filter(Site.site_code.like('RES-%')).all()]
-        residential_samples = WaterSample.query.filter(WaterSample.site_id.in_(residential_site_ids)).count() if residential_site_ids else 0
-
-        total_samples = WaterSample.query.count()
-
-        # Count analyses for Public sites
-        cpcb_sample_ids = [s.id for s in WaterSample.query.filter(WaterSample.site_id.in_(cpcb_site_ids)).all()] if cpcb_site_ids else []
-        cpcb_analyses = Analysis.query.filter(Analysis.sample_id.in_(cpcb_sample_ids)).count() if cpcb_sample_ids else 0
-
-        # Count analyses for Residential sites
-        residential_sample_ids = [s.id for s in WaterSample.query.filter(WaterSample.site_id.in_(residential_site_ids)).all()] if residential_site_ids else []
-        residential_analyses = Analysis.query.filter(Analysis.sample_id.in_(residential_sample_ids)).count() if residential_sample_ids else 0
-
-        total_analyses = Analysis.query.count()
-
-        # Count ML predictions
-        ml_stats = {
-            'risk_predictions': SiteRiskPrediction.query.count(),
-            'contamination_predictions': ContaminationPrediction.query.count(),
-            'wqi_readings': WQIReading.query.count(),
-            'forecasts': WaterQualityForecast.query.count(),
-            'cost_results': CostOptimizationResult.query.count(),
-            'anomalies': AnomalyDetection.query.count()
+        # Sites, samples and analyses per source (Public = CPCB-, Residential = RES-)
+        # in one grouped query; every sample has a site and every analysis a sample,
+        # so the totals are the sums over the groups
+        source = db.case(
+            (Site.site_code.like('CPCB-%'), 'cpcb'),
+            (Site.site_code.like('RES-%'), 'residential'),
+            else_='other'
+        ).label('source')
+        counts = {
+            'cpcb': {'sites': 0, 'samples': 0, 'analyses': 0},
+            'residential': {'sites': 0, 'samples': 0, 'analyses': 0},
+            'other': {'sites': 0, 'samples': 0, 'analyses': 0}
         }
+        for row in db.session.execute(
+            db.select(
+                source,
+                db.func.count(db.distinct(Site.id)),
+                db.func.count(db.distinct(WaterSample.id)),
+                db.func.count(Analysis.id)
+            ).select_from(Site)
+            .outerjoin(WaterSample, WaterSample.site_id == Site.id)
+            .outerjoin(Analysis, Analysis.sample_id == WaterSample.id)
+            .group_by(source)
+        ):
+            counts[row[0]] = {'sites': row[1], 'samples': row[2], 'analyses': row[3]}
+        totals = {key: sum(group[key] for group in counts.values()) for key in ('sites', 'samples', 'analyses')}
+
+        # Count ML predictions in a single statement
+        ml_models = {
+            'risk_predictions': SiteRiskPrediction,
+            'contamination_predictions': ContaminationPrediction,
+            'wqi_readings': WQIReading,
+            'forecasts': WaterQualityForecast,
+            'cost_results': CostOptimizationResult,
+            'anomalies': AnomalyDetection
+        }
+        ml_stats = _table_counts(ml_models)
 
         return jsonify({
             'success': True,
-            'cpcb': {
-                'sites': cpcb_sites,
-                'samples': cpcb_samples,
-                'analyses': cpcb_analyses
-            },
-            'residential': {
-                'sites': residential_sites,
-                'samples': residential_samples,
-                'analyses': residential_analyses
-            },
-            'total': {
-                'sites': total_sites,
-                'samples': total_samples,
-                'analyses': total_analyses
-            },
+            'cpcb': counts['cpcb'],
+            'residential': counts['residential'],
+            'total': totals,
             'ml_predictions': ml_stats
         })
 
@@ -2949,15 +3470,24 @@ def import_residential_data():
                 'error': 'Excel file is empty'
             }), 400
 
-        # Get qualifying stations
-        qualifying_stations = []
-        for station_name, group in df.groupby('Station Name'):
-            if len(group) >= RESIDENTIAL_CONFIG['min_samples']:
-                qualifying_stations.append({
-                    'name': station_name,
-                    'samples': len(group),
-                    'state': group['State'].iloc[0] if 'State' in group.columns else 'Unknown'
-                })
+        # Sort once; each station's rows stay in date order
+        df = df.sort_values('Date', kind='mergesort')
+
+        # Get qualifying stations from the group sizes
+        grouped = df.groupby('Station Name')
+        sizes = grouped.size()
+        sizes = sizes[sizes >= RESIDENTIAL_CONFIG['min_samples']]
+
+        # Each station's state is taken from its first row
+        states = df.drop_duplicates('Station Name').set_index('Station Name')['State'] if 'State' in df.columns else None
+        qualifying_stations = [
+            {
+                'name': station_name,
+                'samples': int(sample_count),
+                'state': states[station_name] if states is not None else 'Unknown'
+            }
+            for station_name, sample_count in sizes.items()
+        ]
 
         if not qualifying_stations:
             return jsonify({
@@ -2965,23 +3495,34 @@ def import_residential_data():
                 'error': f'No stations found with {RESIDENTIAL_CONFIG["min_samples"]}+ samples'
             }), 400
 
+        # Only the qualifying stations' frames are needed from here on
+        station_groups = {s['name']: grouped.get_group(s['name']) for s in qualifying_stations}
+
         # Import all qualifying stations
         analyst = User.query.filter_by(id=current_user.id).first()
         analyzer = ContaminationAnalyzer()
-        ml_pipeline = MLPipeline()
+        ml_pipeline = get_ml_pipeline()
 
         imported_stations = []
+        risk_pending = []
+        failed_stations = []
         total_samples = 0
         total_analyses = 0
 
+        # Load the stations' existing Site records in one query
+        site_codes = {s['name']: f"RES-{slugify(s['name'])}-001" for s in qualifying_stations}
+        sites_by_code = {
+            site.site_code: site
+            for site in Site.query.filter(Site.site_code.in_(list(site_codes.values()))).all()
+        }
+
         for station_info in qualifying_stations:
             station_name = station_info['name']
-            station_data = df[df['Station Name'] == station_name].copy()
-            station_data = station_data.sort_values('Date')
+            station_data = station_groups[station_name]
 
             # Create site code from station name
-            site_code = f"RES-{slugify(station_name)}-001"
-            site = Site.query.filter_by(site_code=site_code).first()
+            site_code = site_codes[station_name]
+            site = sites_by_code.get(site_code)
 
             if not site:
                 # Get coordinates and metadata from first row
@@ -3017,185 +3558,106 @@ def import_residential_data():
             samples_imported = 0
             analyses_created = 0
             contaminated_count = 0
+            pending_analyses = []
 
-            for sample_num, (idx, row) in enumerate(station_data.iterrows(), 1):
-                date_val = row.get('Date')
-                if pd.isna(date_val):
-                    continue
+            import_columns = _import_columns(station_data, RESIDENTIAL_COLUMN_MAPPING)
+            # Collection dates parsed in one pass (NaT where missing or unparseable)
+            parsed_dates = _parse_sample_dates(station_data['Date'])
+            collection_dates = parsed_dates.dt.date.to_numpy()
 
-                # Parse date
-                if isinstance(date_val, str):
-                    try:
-                        collection_date = datetime.strptime(date_val, '%Y-%m-%d').date()
-                    except ValueError:
-                        try:
-                            collection_date = pd.to_datetime(date_val).date()
-                        except:
-                            continue
-                else:
-                    try:
-                        collection_date = pd.to_datetime(date_val).date()
-                    except:
-                        continue
+            # Candidate sample ids, checked against the database in one query
+            sample_prefix = f"RES-{site.site_code[-8:]}-"
+            sample_ids = _build_sample_ids(sample_prefix, parsed_dates, '%Y%m%d')
+            existing_ids = _existing_sample_ids([sid for sid in sample_ids if sid])
 
-                sample_id = f"RES-{site.site_code[-8:]}-{collection_date.strftime('%Y%m%d')}-{sample_num:03d}"
-
-                existing = WaterSample.query.filter_by(sample_id=sample_id).first()
-                if existing:
-                    continue
-
-                sample = WaterSample(
-                    sample_id=sample_id,
-                    site_id=site.id,
-                    collection_date=collection_date,
-                    collected_by_id=analyst.id,
-                    source_point='tank',
-                    weather_condition='sunny',
-                    status='analyzed'
-                )
-                db.session.add(sample)
-                db.session.flush()
-
-                # Build test result
-                test_kwargs = {
-                    'sample_id': sample.id,
-                    'tested_by_id': analyst.id,
-                    'tested_date': datetime.combine(collection_date, datetime.min.time()),
-                    'lab_name': 'Residential Monitoring'
-                }
-
-                for excel_col, db_field in RESIDENTIAL_COLUMN_MAPPING.items():
-                    if excel_col in row.index:
-                        value = clean_import_value(row[excel_col])
-                        if value is not None:
-                            test_kwargs[db_field] = value
-
-                test_result = TestResult(**test_kwargs)
-                db.session.add(test_result)
-                db.session.flush()
-                samples_imported += 1
-
-                # Run analysis
-                try:
-                    analysis_result = analyzer.analyze(test_result, sample, site)
-                    analysis = Analysis(
-                        sample_id=sample.id,
-                        test_result_id=test_result.id,
-                        is_contaminated=analysis_result['is_contaminated'],
-                        contamination_type=analysis_result['contamination_type_key'],
-                        severity_level=analysis_result['severity_level'],
-                        confidence_score=analysis_result['confidence_score'],
-                        wqi_score=analysis_result['wqi_score'],
-                        wqi_class=analysis_result['wqi_class'],
-                        runoff_sediment_score=analysis_result['runoff_sediment_score'],
-                        sewage_ingress_score=analysis_result['sewage_ingress_score'],
-                        salt_intrusion_score=analysis_result['salt_intrusion_score'],
-                        pipe_corrosion_score=analysis_result['pipe_corrosion_score'],
-                        disinfectant_decay_score=analysis_result['disinfectant_decay_score'],
-                        is_compliant_who=analysis_result['is_compliant_who'],
-                        is_compliant_bis=analysis_result['is_compliant_bis'],
-                        who_violations=analysis_result.get('who_violations', '[]'),
-                        bis_violations=analysis_result.get('bis_violations', '[]'),
-                        primary_recommendation=analysis_result['primary_recommendation'],
-                        estimated_treatment_cost_inr=analysis_result['estimated_treatment_cost_inr'],
-                        analysis_method='rule_based'
-                    )
-                    db.session.add(analysis)
-                    analyses_created += 1
-                    if analysis.is_contaminated:
-                        contaminated_count += 1
-                except Exception:
-                    pass
-
-            db.session.commit()
-
-            # Update site risk
             try:
-                contamination_rate = (contaminated_count / analyses_created * 100) if analyses_created > 0 else 0
-                features = {
-                    'site_type': site.site_type or 'tank',
-                    'is_coastal': site.is_coastal or False,
-                    'is_industrial_nearby': site.is_industrial_nearby or False,
-                    'is_agricultural_nearby': site.is_agricultural_nearby or False,
-                    'is_urban': site.is_urban or True,
-                    'population_served': site.population_served or 500,
-                    'contamination_rate_30d': contamination_rate,
-                    'days_since_last_test': 0
-                }
-                risk_result = ml_pipeline.predict_site_risk(features)
-
-                prediction = SiteRiskPrediction(
-                    site_id=site.id,
-                    risk_level=risk_result['risk_level'],
-                    risk_score=risk_result['risk_score'],
-                    confidence=risk_result['confidence'],
-                    recommended_frequency=risk_result['recommended_frequency'],
-                    tests_per_year=risk_result['tests_per_year'],
-                    model_version='rule_based_v1'
-                )
-                db.session.add(prediction)
+                with _station_import():
+                    for i, (collection_date, sample_id) in enumerate(zip(collection_dates, sample_ids)):
+                        if sample_id is None or sample_id in existing_ids:
+                            continue
 
-                site.current_risk_level = risk_result['risk_level']
-                site.risk_score = risk_result['risk_score']
-                site.last_risk_assessment = datetime.utcnow()
-                site.testing_frequency = risk_result['recommended_frequency']
-                site.last_tested = datetime.utcnow()
+                        sample = WaterSample(
+                            sample_id=sample_id,
+                            site_id=site.id,
+                            collection_date=collection_date,
+                            collected_by_id=analyst.id,
+                            source_point='tank',
+                            weather_condition='sunny',
+                            status='analyzed'
+                        )
+                        db.session.add(sample)
+
+                        # Build test result; rows are linked through relationships, so
+                        # ids are only needed when the batch is flushed
+                        test_kwargs = {
+                            'sample': sample,
+                            'tested_by_id': analyst.id,
+                            'tested_date': datetime.combine(collection_date, datetime.min.time()),
+                            'lab_name': 'Residential Monitoring'
+                        }
+
+                        for db_field, values in import_columns:
+                            if not np.isnan(values[i]):
+                                test_kwargs[db_field] = float(values[i])
+
+                        test_result = TestResult(**test_kwargs)
+                        db.session.add(test_result)
+                        samples_imported += 1
+
+                        # Run analysis
+                        try:
+                            analysis_result = analyzer.analyze(test_result, sample, site)
+                            pending_analyses.append((sample, test_result, _analysis_kwargs(analysis_result)))
+                            analyses_created += 1
+                            if analysis_result['is_contaminated']:
+                                contaminated_count += 1
+                        except Exception:
+                            pass
+
+                        if samples_imported % IMPORT_COMMIT_BATCH_SIZE == 0:
+                            _insert_analyses(pending_analyses)
+
+                    _insert_analyses(pending_analyses)
+            except Exception as e:
+                db.session.commit()  # keep the site record
+                failed_stations.append({'name': station_name, 'error': str(e)})
+                continue
 
-                db.session.commit()
-            except Exception:
-                pass
+            # Site risk features; all sites are scored together after the loop
+            contamination_rate = (contaminated_count / analyses_created * 100) if analyses_created > 0 else 0
+            risk_pending.append((site, {
+                'site_type': site.site_type or 'tank',
+                'is_coastal': site.is_coastal or False,
+                'is_industrial_nearby': site.is_industrial_nearby or False,
+                'is_agricultural_nearby': site.is_agricultural_nearby or False,
+                'is_urban': site.is_urban or True,
+                'population_served': site.population_served or 500,
+                'contamination_rate_30d': contamination_rate,
+                'days_since_last_test': 0
+            }))
 
             imported_stations.append({
                 'name': station_name,
                 'site_id': site.id,
                 'samples': samples_imported,
-                'analyses': analyses_created,
-                'risk_level': site.current_risk_level or 'medium'
+                'analyses': analyses_created
             })
             total_samples += samples_imported
             total_analyses += analyses_created
 
-        # Run all ML models for each imported station (rolling prediction)
-        ml_analysis_results = []
-        for station_info in qualifying_stations:
-            station_name = station_info['name']
-            station_data = df[df['Station Name'] == station_name].copy()
-            station_data = station_data.sort_values('Date')
+        # Update site risk
+        for station, risk_level in zip(imported_stations, _apply_site_risks(ml_pipeline, risk_pending)):
+            station['risk_level'] = risk_level or 'medium'
 
-            # Convert column names to match CPCB format for run_all_models_for_station
-            station_data_renamed = station_data.rename(columns={
+        # Run all ML models (rolling prediction) and anomaly detection for each
+        # imported station; column names are converted to match CPCB format first
+        analysis = run_station_analysis([
+            (station['name'], station['site_id'], station_groups[station['name']].rename(columns={
                 'Temperature (C)': 'Temperature',
                 'TDS (ppm)': 'Total Dissolved Solids (mg/L)',
-                'Total Coliforms (MPN/100 ml)': 'Total Coliforms (MPN/100 ml)',
-                'Free Chlorine (mg/L)': 'Free Chlorine (mg/L)',
-            })
-
-            ml_result = run_all_models_for_station(station_name, station_data_renamed)
-            ml_analysis_results.append({
-                'station': station_name,
-                'models_run': len([m for m in ml_result['models_run'] if m['success']]),
-                'errors': len(ml_result['errors'])
-            })
-
-        # Run anomaly detection
-        anomaly_results = []
-        for station_info in imported_stations:
-            station_name = station_info['name']
-            site_id = station_info['site_id']
-            station_data = df[df['Station Name'] == station_name].copy()
-            station_data = station_data.sort_values('Date')
-
-            station_data_renamed = station_data.rename(columns={
-                'Temperature (C)': 'Temperature',
-                'TDS (ppm)': 'Total Dissolved Solids (mg/L)',
-            })
-
-            anomaly_result = run_anomaly_detection_for_station(station_name, station_data_renamed, site_id)
-            anomaly_results.append({
-                'station': station_name,
-                'anomalies_found': anomaly_result.get('anomalies_detected', 0),
-                'parameters_checked': anomaly_result.get('parameters_analyzed', 0)
-            })
+            }))
+            for station in imported_stations
+        ])
 
         return jsonify({
             'success': True,
@@ -3203,15 +3665,8 @@ def import_residential_data():
             'total_samples': total_samples,
             'total_analyses': total_analyses,
             'stations': imported_stations,
-            'ml_analysis': {
-                'stations_analyzed': len(ml_analysis_results),
-                'results': ml_analysis_results
-            },
-            'anomaly_detection': {
-                'stations_analyzed': len(anomaly_results),
-                'total_anomalies': sum(r['anomalies_found'] for r in anomaly_results),
-                'results': anomaly_results
-            }
+            'failed_stations': failed_stations,
+            **analysis
         })
 
     except Exception as e:
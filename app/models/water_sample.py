@@ -52,6 +52,11 @@ class WaterSample(db.Model):
     analyses = db.relationship('Analysis', backref='sample', lazy='dynamic')
     interventions = db.relationship('Intervention', backref='sample', lazy='dynamic')
 
+    # Plain list views of the above, ordered by id, so bulk reads can eager load
+    # them (selectinload) instead of issuing one query per sample
+    test_result_list = db.relationship('TestResult', order_by='TestResult.id', viewonly=True)
+    analysis_list = db.relationship('Analysis', order_by='Analysis.id', viewonly=True)
+
     def get_latest_test(self):
         """Get most recent test result"""
         return self.test_results.order_by(TestResult.tested_date.desc()).first()
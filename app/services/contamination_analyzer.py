@@ -6,6 +6,12 @@ import json
 from datetime import datetime
 from typing import Dict, Tuple, List, Optional
 
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+from app.models.test_result import KEY_PARAMETERS, ALL_WQI_PARAMETERS
+
 
 class ContaminationAnalyzer:
     """
@@ -161,6 +167,222 @@ class ContaminationAnalyzer:
 
         return result
 
+    def analyze_batch(self, test_df: pd.DataFrame, site, sample_df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Vectorized form of analyze() for many samples of one site
+
+        Args:
+            test_df: One row per test result, columns named like TestResult fields
+            site: Site model instance shared by all rows
+            sample_df: Optional WaterSample fields, aligned with test_df
+
+        Returns:
+            DataFrame with the same columns as analyze() returns, one row per input row
+        """
+        n = len(test_df)
+        if sample_df is None:
+            sample_df = pd.DataFrame(index=test_df.index)
+
+        def num(name):
+            # Missing columns and None become NaN, which fails every comparison below
+            if name not in test_df:
+                return np.full(n, np.nan)
+            return pd.to_numeric(test_df[name], errors='coerce').to_numpy(dtype=float)
+
+        def given(values):
+            # Same as a truthiness check on the scalar attribute (None and 0 are absent)
+            return ~np.isnan(values) & (values != 0)
+
+        def text_in(name, choices, lower=True):
+            # lower=False compares the raw values, for fields analyze() matches case-sensitively
+            if name not in sample_df:
+                return np.zeros(n, dtype=bool)
+            values = sample_df[name]
+            if lower:
+                values = values.fillna('').astype(str).str.lower()
+            return values.isin(choices).to_numpy()
+
+        def flag(name):
+            if name not in sample_df:
+                return np.zeros(n, dtype=bool)
+            return sample_df[name].fillna(False).astype(bool).to_numpy()
+
+        turbidity = num('turbidity_ntu')
+        color = num('color_hazen')
+        coliform = num('total_coliform_mpn')
+        e_coli = num('e_coli_mpn')
+        ammonia = num('ammonia_mg_l')
+        chlorine = num('free_chlorine_mg_l')
+        tds = num('tds_ppm')
+        conductivity = num('conductivity_us_cm')
+        chloride = num('chloride_mg_l')
+        sodium = num('sodium_mg_l')
+        iron = num('iron_mg_l')
+        manganese = num('manganese_mg_l')
+        copper = num('copper_mg_l')
+        ph = num('ph')
+        temperature = num('temperature_celsius')
+        toc = num('toc_mg_l')
+        rainfall = pd.to_numeric(sample_df['rainfall_mm_24h'], errors='coerce').to_numpy(dtype=float) \
+            if 'rainfall_mm_24h' in sample_df else np.full(n, np.nan)
+        low_chlorine = chlorine < 0.2
+
+        # Scores, same thresholds as the _score_* methods
+        runoff = (
+            np.select([turbidity > 10, turbidity > 5], [0.4, 0.2], 0.0)
+            + np.select([color > 25, color > 15], [0.2, 0.1], 0.0)
+            + 0.25 * flag('rained_recently')
+            + 0.15 * (rainfall > 20)
+            + (0.1 if site.is_agricultural_nearby else 0.0)
+            + 0.1 * text_in('weather_condition', ['rainy', 'stormy'], lower=False)
+        )
+        sewage = (
+            np.select([coliform > 100, coliform > 10, coliform > 0], [0.5, 0.35, 0.2], 0.0)
+            + 0.4 * (e_coli > 0)
+            + np.select([ammonia > 1.5, ammonia > 0.5], [0.2, 0.1], 0.0)
+            + 0.15 * low_chlorine
+            + 0.2 * text_in('odor', ['sewage', 'foul', 'septic'])
+            + (0.05 if site.is_urban else 0.0)
+        )
+        salt = (
+            np.select([tds > 2000, tds > 1000, tds > 500], [0.5, 0.35, 0.15], 0.0)
+            + np.select([conductivity > 3000, conductivity > 1500], [0.25, 0.15], 0.0)
+            + np.select([chloride > 600, chloride > 250], [0.3, 0.15], 0.0)
+            + (0.25 if site.is_coastal else 0.0)
+            + 0.1 * (sodium > 200)
+        )
+        corrosion = (
+            np.select([iron > 1.0, iron > 0.3, iron > 0.1], [0.4, 0.25, 0.1], 0.0)
+            + np.select([manganese > 0.4, manganese > 0.1], [0.25, 0.1], 0.0)
+            + 0.15 * (copper > 1.0)
+            + 0.2 * text_in('apparent_color', ['brown', 'rust', 'orange', 'red'])
+            + 0.15 * (given(ph) & (ph < 6.5))
+        )
+        decay = (
+            np.select([chlorine < 0.1, chlorine < 0.2, chlorine < 0.5], [0.4, 0.25, 0.1], 0.0)
+            + 0.25 * ((coliform > 0) & low_chlorine)
+            + 0.1 * (temperature > 30)
+            + 0.1 * (toc > 4)
+            + (0.1 if site.site_type in ['tank', 'reservoir'] and not site.is_urban else 0.0)
+        )
+
+        type_keys = list(self.CONTAMINATION_TYPES)
+        scores = np.minimum(1.0, np.vstack([runoff, sewage, salt, corrosion, decay]))
+        max_score = scores.max(axis=0)
+        is_contaminated = max_score >= 0.3
+        # argmax keeps the first maximum, matching max() over the scores dict
+        primary = np.where(is_contaminated, np.array(type_keys, dtype=object)[scores.argmax(axis=0)], None)
+        confidence = np.where(is_contaminated, np.minimum(100, max_score * 100), 100 - max_score * 100)
+        severity = np.select([max_score >= 0.7, max_score >= 0.5, max_score >= 0.3],
+                             ['critical', 'high', 'medium'], 'low')
+
+        # WQI, same penalties and coverage rules as TestResult.calculate_wqi()
+        wqi = (
+            100.0
+            - np.select([ph < 6.5, ph > 8.5], [np.minimum(20, (6.5 - ph) * 10), np.minimum(20, (ph - 8.5) * 10)], 0.0)
+            - np.where(tds > 500, np.minimum(30, (tds - 500) / 50), 0.0)
+            - np.where(turbidity > 5, np.minimum(20, (turbidity - 5) * 2), 0.0)
+            - np.select([chlorine < 0.2, chlorine > 5.0], [15, 10], 0)
+            - np.where(coliform > 0, np.minimum(25, coliform * 0.5), 0.0)
+        )
+        wqi = np.clip(wqi, 0, 100)
+        parameters_measured = sum(~np.isnan(num(param)) for param in ALL_WQI_PARAMETERS)
+        key_measured = sum(~np.isnan(num(param)) for param in KEY_PARAMETERS)
+        coverage_pct = np.round(parameters_measured / len(ALL_WQI_PARAMETERS) * 100, 1)
+        has_sufficient = key_measured >= 3
+        tier = np.select([has_sufficient, key_measured >= 1], ['full', 'partial'], 'insufficient')
+        wqi_class = np.select(
+            [tier == 'insufficient', tier == 'partial', wqi >= 90, wqi >= 70, wqi >= 50],
+            ['Insufficient Data', 'Partial Assessment', 'Excellent', 'Compliant', 'Warning'], 'Unsafe'
+        )
+        wqi_status = np.select(
+            [tier == 'insufficient', wqi >= 90, wqi >= 70, wqi >= 50],
+            ['Cannot assess - no key parameters measured', 'Safe to drink',
+             'Safe with minor treatment', 'Treatment required'], 'Not safe for consumption'
+        ).astype(object)
+        partial = tier == 'partial'
+        wqi_status[partial] = [f'Limited reliability - {pct:.0f}% coverage' for pct in coverage_pct[partial]]
+
+        who_compliant, who_violations = self._batch_compliance(num, n, current_app.config.get('WHO_STANDARDS', {}))
+        bis_compliant, bis_violations = self._batch_compliance(num, n, current_app.config.get('BIS_STANDARDS', {}))
+
+        # Recommendations, looked up per contamination type and severity
+        fallback = self._get_recommendations(None, 'low')
+        primary_recommendation = np.array(
+            [self.TREATMENT_RECOMMENDATIONS[key]['primary'] if key else fallback['primary'] for key in primary],
+            dtype=object
+        )
+        secondary_recommendations = np.array(
+            [json.dumps(self.TREATMENT_RECOMMENDATIONS[key]['secondary'] if key else fallback['secondary'])
+             for key in primary],
+            dtype=object
+        )
+        midpoint = np.array(
+            [sum(self.TREATMENT_RECOMMENDATIONS[key]['cost_range']) / 2 if key else 0 for key in primary]
+        )
+        multiplier = np.select([severity == 'critical', severity == 'high', severity == 'medium'], [1.5, 1.2, 1.0], 0.7)
+        urgency = np.select([severity == 'critical', severity == 'high', severity == 'medium'],
+                            ['immediate', 'within_week', 'within_month'], 'routine')
+
+        return pd.DataFrame({
+            'is_contaminated': is_contaminated,
+            'contamination_type': [self.CONTAMINATION_TYPES[key] if key else 'None Detected' for key in primary],
+            'contamination_type_key': primary,
+            'severity_level': severity,
+            'confidence_score': np.round(confidence, 1),
+
+            # Individual scores
+            'runoff_sediment_score': np.round(scores[0], 3),
+            'sewage_ingress_score': np.round(scores[1], 3),
+            'salt_intrusion_score': np.round(scores[2], 3),
+            'pipe_corrosion_score': np.round(scores[3], 3),
+            'disinfectant_decay_score': np.round(scores[4], 3),
+
+            # WQI with data quality metrics
+            'wqi_score': np.round(wqi, 1),
+            'wqi_class': wqi_class,
+            'wqi_status': wqi_status,
+            'data_coverage_pct': coverage_pct,
+            'parameters_measured': parameters_measured,
+            'key_parameters_measured': key_measured,
+            'has_sufficient_data': has_sufficient,
+            'data_quality_tier': tier,
+
+            # Compliance
+            'is_compliant_who': who_compliant,
+            'is_compliant_bis': bis_compliant,
+            'who_violations': who_violations,
+            'bis_violations': bis_violations,
+
+            # Recommendations
+            'primary_recommendation': primary_recommendation,
+            'secondary_recommendations': secondary_recommendations,
+            'estimated_treatment_cost_inr': np.round(midpoint * multiplier, 0),
+            'treatment_urgency': urgency,
+
+            # Metadata
+            'analysis_method': 'rule_based',
+            'analysis_date': datetime.utcnow()
+        }, index=test_df.index)
+
+    @staticmethod
+    def _batch_compliance(num, n, standards: Dict) -> Tuple[np.ndarray, List[str]]:
+        """Compliance flags and JSON violation lists for analyze_batch()"""
+        # Walking standards in order, min before max, keeps each row's list in check_*_compliance() order
+        violations = [[] for _ in range(n)]
+        for param, limits in standards.items():
+            values = num(param)
+            checks = []
+            if 'min' in limits:
+                checks.append((values < limits['min'], f"< {limits['min']}"))
+            if 'max' in limits:
+                checks.append((values > limits['max'], f"> {limits['max']}"))
+            for mask, label in checks:
+                for i in np.flatnonzero(mask):
+                    violations[i].append((param, float(values[i]), label))
+        compliant = np.array([not found for found in violations], dtype=bool)
+        return compliant, [json.dumps(found) for found in violations]
+
     def _score_runoff_sediment(self, test_result, sample, site) -> float:
         """Score for runoff/sediment contamination"""
         score = 0.0
@@ -146,8 +146,12 @@ class DataProcessor:
 
     # ========== Site Risk Processing ==========
 
-    def _update_site_risk(self, site: Site) -> Dict:
-        """Update site risk assessment"""
+    def _update_site_risk(self, site: Site, commit: bool = True) -> Dict:
+        """Update site risk assessment
+
+        Pass commit=False to leave committing to the caller, e.g. to update
+        many sites in one transaction.
+        """
         # Get site features for prediction
         features = self._extract_site_features(site)
 
@@ -178,7 +182,8 @@ class DataProcessor:
         site.last_risk_assessment = datetime.utcnow()
         site.testing_frequency = risk_result['recommended_frequency']
 
-        db.session.commit()
+        if commit:
+            db.session.commit()
 
         return risk_result
 
@@ -3,16 +3,35 @@ ML Pipeline Service - UPDATED WITH ACTUAL ML TRAINING
 Integrates all 6 ML models with ModelTrainer support
 """
 import os
+import copy
 import sys
 import json
+import hashlib
 import joblib
 import numpy as np
 import pandas as pd
+from collections import OrderedDict
+from threading import Lock
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from flask import current_app
 from app.services.model_trainer import ModelTrainer
 
+# Memoized contamination classifications, shared across MLPipeline instances
+CONTAMINATION_CACHE_SIZE = 1024
+_contamination_cache = OrderedDict()
+_contamination_cache_lock = Lock()
+
+
+def _feature_key(features: Dict, model_tag: str) -> bytes:
+    """Deterministic cache key for a feature dict and the model that scores it"""
+    items = tuple(sorted(
+        (k, float(v) if isinstance(v, (int, float)) else v)
+        for k, v in features.items() if k != 'sample_id'
+    ))
+    return hashlib.blake2b(repr((model_tag, items)).encode(), digest_size=16).digest()
+
 
 class MLPipeline:
     """
@@ -136,37 +155,73 @@ class MLPipeline:
                     site_features,
                     self.loaded_models['site_risk']
                 )
-                # Convert probabilities dict to individual prob fields
-                probs = result.get('probabilities', {})
-                result['prob_critical'] = probs.get('critical', 0.0)
-                result['prob_high'] = probs.get('high', 0.0)
-                result['prob_medium'] = probs.get('medium', 0.0)
-                result['prob_low'] = probs.get('low', 0.0)
-
-                # Add missing fields expected by data_processor
-                risk_score = result['risk_score']
-                if risk_score >= 70:
-                    recommended_freq = 'weekly'
-                    tests_per_year = 52
-                elif risk_score >= 50:
-                    recommended_freq = 'bi-weekly'
-                    tests_per_year = 26
-                elif risk_score >= 30:
-                    recommended_freq = 'monthly'
-                    tests_per_year = 12
-                else:
-                    recommended_freq = 'quarterly'
-                    tests_per_year = 4
-
-                result['recommended_frequency'] = recommended_freq
-                result['tests_per_year'] = tests_per_year
-                result['top_features'] = json.dumps(self._get_top_risk_features(site_features))
-
-                return result
+                return self._complete_site_risk(result, site_features)
             except Exception as e:
                 print(f"Error using trained site risk model, falling back to rule-based: {e}")
 
         # Fallback to rule-based calculation if model not loaded
+        return self._rule_based_site_risk(site_features)
+
+    def predict_site_risks_batch(self, site_features_list: List[Dict]) -> List[Dict]:
+        """
+        Predict site risk for many sites at once, with one call into the trained model
+
+        Args:
+            site_features_list: Dictionaries with site characteristics
+
+        Returns:
+            Risk predictions as predict_site_risk() returns, in input order
+        """
+        if not site_features_list:
+            return []
+
+        if 'site_risk' in self.loaded_models:
+            try:
+                results = self.model_trainer.predict_site_risks(
+                    site_features_list,
+                    self.loaded_models['site_risk']
+                )
+                return [
+                    self._complete_site_risk(result, site_features)
+                    for result, site_features in zip(results, site_features_list)
+                ]
+            except Exception as e:
+                print(f"Error using trained site risk model, falling back to rule-based: {e}")
+
+        return self._rule_based_site_risks(site_features_list)
+
+    def _complete_site_risk(self, result: Dict, site_features: Dict) -> Dict:
+        """Add the probability and schedule fields to a trained-model risk prediction"""
+        # Convert probabilities dict to individual prob fields
+        probs = result.get('probabilities', {})
+        result['prob_critical'] = probs.get('critical', 0.0)
+        result['prob_high'] = probs.get('high', 0.0)
+        result['prob_medium'] = probs.get('medium', 0.0)
+        result['prob_low'] = probs.get('low', 0.0)
+
+        # Add missing fields expected by data_processor
+        risk_score = result['risk_score']
+        if risk_score >= 70:
+            recommended_freq = 'weekly'
+            tests_per_year = 52
+        elif risk_score >= 50:
+            recommended_freq = 'bi-weekly'
+            tests_per_year = 26
+        elif risk_score >= 30:
+            recommended_freq = 'monthly'
+            tests_per_year = 12
+        else:
+            recommended_freq = 'quarterly'
+            tests_per_year = 4
+
+        result['recommended_frequency'] = recommended_freq
+        result['tests_per_year'] = tests_per_year
+        result['top_features'] = json.dumps(self._get_top_risk_features(site_features))
+
+        return result
+
+    def _rule_based_site_risk(self, site_features: Dict) -> Dict:
+        """Risk prediction from site characteristics alone, used when no trained model is available"""
         risk_score = self._calculate_rule_based_risk(site_features)
 
         # Determine risk level
@@ -201,6 +256,63 @@ class MLPipeline:
             'model_version': 'rule_based_v1'
         }
 
+    def _rule_based_site_risks(self, site_features_list: List[Dict]) -> List[Dict]:
+        """
+        Rule-based risk predictions for many sites, as _rule_based_site_risk() gives each
+
+        The features are gathered into arrays once and every site is scored,
+        classified and given probabilities in a single NumPy pass.
+        """
+        site_type_risk = {
+            'stepwell': 45, 'tank': 35, 'pond': 25,
+            'lake': 20, 'reservoir': 15
+        }
+        flag_weights = {
+            'is_industrial_nearby': 15, 'is_agricultural_nearby': 10,
+            'is_coastal': 12, 'is_urban': 8
+        }
+
+        type_risk = np.array([site_type_risk.get(f.get('site_type', '').lower(), 20)
+                              for f in site_features_list], dtype=float)
+        flags = np.array([[bool(f.get(name)) for name in flag_weights] for f in site_features_list],
+                         dtype=float).reshape(len(site_features_list), len(flag_weights))
+        contamination_rate = np.array([f.get('contamination_rate_30d', 0) for f in site_features_list], dtype=float)
+        days_since_test = np.array([f.get('days_since_last_test', 30) for f in site_features_list], dtype=float)
+
+        scores = (20 + type_risk + flags @ np.array(list(flag_weights.values()), dtype=float)
+                  + contamination_rate * 0.3
+                  + np.select([days_since_test > 60, days_since_test > 30], [10, 5], 0))
+        scores = np.clip(scores, 0, 100)
+
+        levels = np.select([scores >= 70, scores >= 50, scores >= 30], ['critical', 'high', 'medium'], 'low')
+        schedules = {
+            'critical': ('weekly', 52), 'high': ('bi-weekly', 26),
+            'medium': ('monthly', 12), 'low': ('quarterly', 4)
+        }
+        prob_critical = np.where(scores > 70, (scores - 70) / 30, 0)
+        prob_high = np.where((scores >= 50) & (scores < 70), np.clip((scores - 50) / 20, 0, 1), 0)
+        prob_medium = np.where((scores >= 30) & (scores < 50), np.clip((scores - 30) / 20, 0, 1), 0)
+        prob_low = np.where(scores < 30, (30 - scores) / 30, 0)
+
+        return [
+            {
+                'risk_level': level,
+                'risk_score': round(score, 2),
+                'confidence': 85.0,  # Rule-based confidence
+                'prob_critical': critical,
+                'prob_high': high,
+                'prob_medium': medium,
+                'prob_low': low,
+                'recommended_frequency': schedules[level][0],
+                'tests_per_year': schedules[level][1],
+                'top_features': json.dumps(self._get_top_risk_features(site_features)),
+                'model_version': 'rule_based_v1'
+            }
+            for site_features, level, score, critical, high, medium, low in zip(
+                site_features_list, levels.tolist(), scores.tolist(), prob_critical.tolist(),
+                prob_high.tolist(), prob_medium.tolist(), prob_low.tolist())
+        ]
+
     def _calculate_rule_based_risk(self, features: Dict) -> float:
         """Calculate risk score based on site characteristics"""
         score = 20  # Base score
@@ -269,12 +381,36 @@ class MLPipeline:
         # Select appropriate model based on site country
         model_data = self._select_contamination_model(site)
 
+        # Identical payloads (e.g. UI refreshes) reuse the previous result;
+        # the model version and training timestamp invalidate it on reload
+        if model_data:
+            model_tag = (f"{model_data.get('model_version', 'xgb_v1')}_{getattr(site, 'country', None)}"
+                         f"_{model_data.get('training_timestamp', '')}")
+        else:
+            model_tag = 'rule_based_v1'
+        key = _feature_key(features, model_tag)
+        with _contamination_cache_lock:
+            cached = _contamination_cache.get(key)
+            if cached is not None:
+                _contamination_cache.move_to_end(key)
+        if cached is not None:
+            # Deep copies, so callers mutating nested values never touch the cache
+            return copy.deepcopy(cached)
+
         if model_data:
             # Use trained ML model for prediction
-            return self._predict_with_model(features, model_data, site)
+            result, from_model = self._predict_with_model(features, model_data, site)
         else:
             # Fallback to rule-based logic if no model loaded
-            return self._predict_with_rules(features)
+            result, from_model = self._predict_with_rules(features), True
+
+        # A rule-based fallback after a model failure is not cached under the model's tag
+        if from_model:
+            with _contamination_cache_lock:
+                _contamination_cache[key] = copy.deepcopy(result)
+                if len(_contamination_cache) > CONTAMINATION_CACHE_SIZE:
+                    _contamination_cache.popitem(last=False)
+        return result
 
     def _select_contamination_model(self, site) -> Optional[Dict]:
         """
@@ -300,8 +436,12 @@ class MLPipeline:
         # No model available
         return None
 
-    def _predict_with_model(self, features: Dict, model_data: Dict, site) -> Dict:
-        """Use trained XGBoost model to predict contamination"""
+    def _predict_with_model(self, features: Dict, model_data: Dict, site) -> Tuple[Dict, bool]:
+        """Use trained XGBoost model to predict contamination
+
+        Returns (result, from_model); from_model is False when the model failed
+        and the result came from the rule-based fallback.
+        """
         try:
             # Prepare feature vector matching training format
             from app.services.model_trainer import ModelTrainer
@@ -341,11 +481,11 @@ class MLPipeline:
                 'shap_explanations': json.dumps([]),  # TODO: Implement SHAP
                 'model_version': f"{model_data.get('model_version', 'xgb_v1')}_{site.country}",
                 'f1_score': model_data.get('training_f1', 0.0)
-            }
+            }, True
 
         except Exception as e:
             print(f"Warning: Model prediction failed: {e}. Falling back to rules.")
-            return self._predict_with_rules(features)
+            return self._predict_with_rules(features), False
 
     def _predict_with_rules(self, features: Dict) -> Dict:
         """Fallback rule-based prediction when no model available"""
@@ -761,3 +901,9 @@ class MLPipeline:
             'site_results': results,
             'model_version': 'bayesian_v1'
         }
+
+
+@lru_cache(maxsize=1)
+def get_ml_pipeline() -> MLPipeline:
+    """Process-wide MLPipeline, so the trained models are loaded from disk once per worker"""
+    return MLPipeline()
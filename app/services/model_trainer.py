@@ -454,6 +454,40 @@ class ModelTrainer:
             }
         }
 
+    def predict_site_risks(self, site_features_list: List[Dict], model_data: Dict) -> List[Dict]:
+        """Predict site risk for many sites with one Random Forest call
+
+        Args:
+            site_features_list: Site feature dictionaries
+            model_data: Loaded model data from load_model()
+
+        Returns:
+            Prediction dicts as predict_site_risk() returns, in input order
+        """
+        model = model_data['model']
+        label_encoder = model_data['label_encoder']
+
+        X, _ = self._prepare_site_features(site_features_list)
+        y_proba = model.predict_proba(X)
+
+        # A forest predicts the class with the highest mean probability
+        risk_levels = label_encoder.inverse_transform(model.classes_[np.argmax(y_proba, axis=1)])
+        risk_score_map = {'low': 25, 'medium': 50, 'high': 75, 'critical': 95}
+
+        return [
+            {
+                'risk_level': risk_level,
+                'risk_score': risk_score_map.get(risk_level, 50),
+                'confidence': np.max(proba),
+                'model_version': model_data['model_version'],
+                'probabilities': {
+                    label: float(prob)
+                    for label, prob in zip(label_encoder.classes_, proba)
+                }
+            }
+            for risk_level, proba in zip(risk_levels, y_proba)
+        ]
+
     def predict_contamination(self, test_result: Dict, model_data: Dict) -> Dict:
         """Predict contamination type using trained XGBoost
 
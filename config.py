@@ -50,6 +50,10 @@ class Config:
     ML_MODELS_PATH = os.environ.get('ML_MODELS_PATH') or \
         os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ALL_MODELS')
 
+    # Processes each gunicorn worker keeps for post-import model simulations
+    # (the service units run 4 workers, so each gets a quarter of the cores)
+    SIMULATION_POOL_WORKERS = int(os.environ.get('SIMULATION_POOL_WORKERS', max(1, (os.cpu_count() or 1) // 4)))
+
     # Water Quality Standards (WHO/BIS)
     WHO_STANDARDS = {
         'ph': {'min': 6.5, 'max': 8.5},
@@ -236,7 +236,8 @@ ExecStart=${VENV_DIR}/bin/gunicorn \\
     --config ${WEB_DIR}/gunicorn_config.py \\
     --bind 0.0.0.0:8001 \\
     --workers 4 \\
-    --worker-class sync \\
+    --worker-class gthread \\
+    --threads 8 \\
     --timeout 120 \\
     --access-logfile ${LOG_DIR}/access.log \\
     --error-logfile ${LOG_DIR}/error.log \\